@@ -3,11 +3,15 @@ from tkinter import ttk, messagebox
 import sqlite3
 from datetime import datetime, timedelta
 import json
+from data_layer import get_data_connection, get_patient, readings_since, compliance_summary, glucose_after_doses
+from glycemic_metrics import glycemic_metrics, format_metrics, BANDS
 
 class AIAnalysis:
     def __init__(self, parent):
         self.parent = parent
         self.analysis_window = None
+        self.after_dose = {}
+        self.metrics = {}
         
     def analyze_patient_health(self, patient_id):
         """Analyseer patiënt gezondheid en geef aanbevelingen"""
@@ -18,54 +22,33 @@ class AIAnalysis:
         self.analysis_window.title("AI Gezondheidsanalyse")
         self.analysis_window.geometry("800x600")
         
-        # Haal patiënt data op
-        conn = sqlite3.connect('patient_data.db')
-        cursor = conn.cursor()
+        # Patiënt, bloedwaarden en compliance via één connectie met beide databases
+        conn = get_data_connection()
         
-        cursor.execute('''
-            SELECT first_name, last_name, weight, blood_group FROM patients WHERE id = ?
-        ''', (patient_id,))
-        
-        patient_data = cursor.fetchone()
+        patient_data = get_patient(conn, patient_id)
         if not patient_data:
             messagebox.showerror("Fout", "Patiënt niet gevonden")
             return
             
         patient_name = f"{patient_data[0]} {patient_data[1]}"
         
-        # Haal bloedwaarden op
-        blood_conn = sqlite3.connect('diabetes_data.db')
-        blood_cursor = blood_conn.cursor()
-        
         # Laatste 30 dagen
         thirty_days_ago = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
         
-        blood_cursor.execute('''
-            SELECT bloedwaarde, datum, insuline_ingenomen, insuline_vergeten
-            FROM bloedwaarden 
-            WHERE datum >= ? 
-            ORDER BY datum DESC
-        ''', (thirty_days_ago,))
+        blood_data = readings_since(conn, thirty_days_ago)
         
-        blood_data = blood_cursor.fetchall()
+        # Glykemische metrieken in één gevectoriseerde stap (readings_since geeft nieuwste eerst)
+        self.metrics = glycemic_metrics([row[0] for row in reversed(blood_data)])
         
         # Haal medicatie compliance op
-        cursor.execute('''
-            SELECT COUNT(*) as total, 
-                   SUM(CASE WHEN taken = 1 THEN 1 ELSE 0 END) as taken,
-                   SUM(CASE WHEN missed = 1 THEN 1 ELSE 0 END) as missed
-            FROM medication_schedule 
-            WHERE patient_id = ? AND date >= ?
-        ''', (patient_id, thirty_days_ago))
+        compliance_data = compliance_summary(conn, patient_id, thirty_days_ago)
         
-        compliance_data = cursor.fetchone()
+        # Glucose in de 4 uur na genomen en gemiste doses (join over beide databases)
+        self.after_dose = glucose_after_doses(conn, patient_id, thirty_days_ago)
         
         # Maak analyse
         self.create_analysis_gui(patient_name, blood_data, compliance_data, patient_data)
         
-        conn.close()
-        blood_conn.close()
-        
     def create_analysis_gui(self, patient_name, blood_data, compliance_data, patient_data):
         """Maak GUI voor analyse resultaten"""
         
@@ -86,7 +69,7 @@ class AIAnalysis:
         blood_frame = ttk.Frame(notebook)
         notebook.add(blood_frame, text="Bloedwaarden Analyse")
         
-        if blood_data:
+        if blood_data and self.metrics:
             self.analyze_blood_values(blood_frame, blood_data)
         else:
             ttk.Label(blood_frame, text="Geen bloedwaarden data beschikbaar voor analyse").pack(pady=20)
@@ -109,16 +92,16 @@ class AIAnalysis:
     def analyze_blood_values(self, parent, blood_data):
         """Analyseer bloedwaarden en geef aanbevelingen"""
         
-        # Bereken statistieken
+        # Statistieken uit de glykemische metrieken (zie analyze_patient_health)
+        metrics = self.metrics
         values = [row[0] for row in blood_data]
-        avg_value = sum(values) / len(values)
+        avg_value = metrics['mean']
         max_value = max(values)
         min_value = min(values)
         
-        # Tel hoge en lage waarden
-        high_count = sum(1 for v in values if v > 180)
-        low_count = sum(1 for v in values if v < 80)
-        normal_count = len(values) - high_count - low_count
+        # Aandeel hoge en lage waarden
+        high_share = metrics['high'] + metrics['very_high']
+        low_share = metrics['low'] + metrics['very_low']
         
         # Maak analyse frame
         analysis_frame = ttk.LabelFrame(parent, text="Bloedwaarden Analyse (Laatste 30 dagen)", padding="10")
@@ -134,11 +117,13 @@ class AIAnalysis:
         ttk.Label(stats_frame, text=f"Laagste waarde: {min_value:.1f} mg/dL").pack(anchor=tk.W)
         ttk.Label(stats_frame, text=f"Aantal metingen: {len(values)}").pack(anchor=tk.W)
         
-        # Distributie
+        # Distributie over de consensus banden
         ttk.Label(stats_frame, text=f"\nDistributie:").pack(anchor=tk.W)
-        ttk.Label(stats_frame, text=f"• Normale waarden (80-180): {normal_count} ({normal_count/len(values)*100:.1f}%)").pack(anchor=tk.W)
-        ttk.Label(stats_frame, text=f"• Hoge waarden (>180): {high_count} ({high_count/len(values)*100:.1f}%)").pack(anchor=tk.W)
-        ttk.Label(stats_frame, text=f"• Lage waarden (<80): {low_count} ({low_count/len(values)*100:.1f}%)").pack(anchor=tk.W)
+        for band, label in BANDS.items():
+            ttk.Label(stats_frame, text=f"• {label}: {metrics[band]:.1f}%").pack(anchor=tk.W)
+        
+        for line in format_metrics(metrics):
+            ttk.Label(stats_frame, text=line).pack(anchor=tk.W)
         
         # Aanbevelingen
         recommendations_frame = ttk.LabelFrame(analysis_frame, text="Aanbevelingen", padding="10")
@@ -160,13 +145,13 @@ class AIAnalysis:
                      foreground='green', font=('Arial', 10, 'bold')).pack(anchor=tk.W)
             ttk.Label(recommendations_frame, text="• Blijf huidige regime volhouden").pack(anchor=tk.W, padx=(20, 0))
         
-        if high_count > len(values) * 0.3:
+        if high_share > 30:
             ttk.Label(recommendations_frame, text="⚠️ Te veel hoge bloedwaarden", 
                      foreground='red').pack(anchor=tk.W, pady=(10, 0))
             ttk.Label(recommendations_frame, text="• Controleer medicatie timing").pack(anchor=tk.W, padx=(20, 0))
             ttk.Label(recommendations_frame, text="• Overweeg insuline aanpassing").pack(anchor=tk.W, padx=(20, 0))
         
-        if low_count > len(values) * 0.2:
+        if low_share > 20:
             ttk.Label(recommendations_frame, text="⚠️ Te veel lage bloedwaarden", 
                      foreground='orange').pack(anchor=tk.W, pady=(10, 0))
             ttk.Label(recommendations_frame, text="• Verminder medicatie dosering").pack(anchor=tk.W, padx=(20, 0))
@@ -213,6 +198,10 @@ class AIAnalysis:
             ttk.Label(recommendations_frame, text="• Gebruik pillendoosje").pack(anchor=tk.W, padx=(20, 0))
             ttk.Label(recommendations_frame, text="• Overleg met arts over vereenvoudiging").pack(anchor=tk.W, padx=(20, 0))
         
+        # Glucose na doses
+        if self.after_dose:
+            self.show_glucose_after_doses(analysis_frame)
+        
         # Praktische tips
         tips_frame = ttk.LabelFrame(analysis_frame, text="Praktische Tips", padding="10")
         tips_frame.pack(fill=tk.X, pady=(10, 0))
@@ -222,6 +211,27 @@ class AIAnalysis:
         ttk.Label(tips_frame, text="• Gebruik smartphone herinneringen").pack(anchor=tk.W)
         ttk.Label(tips_frame, text="• Houd medicatie logboek bij").pack(anchor=tk.W)
         
+    def show_glucose_after_doses(self, parent):
+        """Toon gemiddelde glucose in de 4 uur na genomen en gemiste doses"""
+        after_frame = ttk.LabelFrame(parent, text="Glucose 4 uur na dosis", padding="10")
+        after_frame.pack(fill=tk.X, pady=(10, 0))
+        
+        for key, label in (('taken', "Na genomen dosis"), ('missed', "Na gemiste dosis")):
+            stats = self.after_dose.get(key)
+            if not stats or not stats['readings']:
+                ttk.Label(after_frame, text=f"{label}: geen metingen").pack(anchor=tk.W)
+                continue
+            ttk.Label(after_frame, text=f"{label}: gemiddeld {stats['mean']:.1f} mg/dL "
+                                        f"({stats['readings']} metingen bij {stats['doses']} doses, "
+                                        f"{stats['high']} boven 180)").pack(anchor=tk.W)
+        
+        taken = self.after_dose.get('taken')
+        missed = self.after_dose.get('missed')
+        if taken and missed and taken['readings'] and missed['readings'] and missed['mean'] - taken['mean'] > 20:
+            ttk.Label(after_frame, text=f"⚠️ Na gemiste doses ligt de glucose gemiddeld "
+                                        f"{missed['mean'] - taken['mean']:.0f} mg/dL hoger",
+                     foreground='red').pack(anchor=tk.W, pady=(5, 0))
+        
     def generate_general_recommendations(self, parent, blood_data, compliance_data, patient_data):
         """Genereer algemene aanbevelingen"""
         
@@ -260,9 +270,8 @@ class AIAnalysis:
         ttk.Label(monitoring_frame, text="• Ga regelmatig naar controles").pack(anchor=tk.W)
         
         # Specifieke aanbevelingen op basis van data
-        if blood_data:
-            values = [row[0] for row in blood_data]
-            avg_value = sum(values) / len(values)
+        if self.metrics:
+            avg_value = self.metrics['mean']
             
             if avg_value > 150:
                 specific_frame = ttk.LabelFrame(recommendations_frame, text="Specifieke Aanbevelingen", padding="5")
@@ -3,6 +3,7 @@ import sqlite3
 import tkinter as tk
 from tkinter import ttk, messagebox
 import json
+from connection_manager import get_connection, PATIENT_DB
 
 class AIMedicationFiller:
     def __init__(self, api_key):
@@ -270,8 +271,8 @@ class MedicationFillerGUI:
             return
         
         try:
-            # Verbind met database
-            conn = sqlite3.connect('patient_data.db')
+            # Gedeelde connectie uit de connection manager
+            conn = get_connection(PATIENT_DB)
             cursor = conn.cursor()
             
             # Voeg medicatie toe
@@ -293,7 +294,6 @@ class MedicationFillerGUI:
             ))
             
             conn.commit()
-            conn.close()
             
             messagebox.showinfo("Succes", f"Medicatie '{medication_name}' succesvol opgeslagen in de database!")
             
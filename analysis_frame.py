@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Analyse Frame voor Diabetes Tracker
+Eén gedeelde, getypeerde DataFrame met alle metingen voor statistieken en AI analytics:
+Tijdstip als datetime64, bloedwaarde en gewicht als float32, medicatie en activiteit als
+category. De frame wordt één keer opgebouwd, nieuwe metingen worden achteraan toegevoegd en
+na verwijderen, bewerken, importeren of herstellen wordt hij opnieuw opgebouwd.
+"""
+
+import numpy as np
+import pandas as pd
+
+from archive import readings_between
+
+# Kolommen uit bloedwaarden (id en ts komen als sorteersleutel mee)
+FRAME_COLUMNS = "id, ts, bloedwaarde, medicatie, activiteit, gewicht"
+
+GLUCOSE = 'Bloedwaarde (mg/dL)'
+WEIGHT = 'Gewicht (kg)'
+CATEGORICAL = ('Medicatie', 'Activiteit')
+
+
+def _float32(values):
+    """float32 array; lege of ongeldige waarden worden NaN"""
+    return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype='float32')
+
+
+def build_frame(rows):
+    """Getypeerde DataFrame (index id) uit (id, ts, bloedwaarde, medicatie, activiteit, gewicht) rijen"""
+    ids, ts, glucose, medication, activity, weight = zip(*rows) if rows else ([],) * 6
+    frame = pd.DataFrame({
+        'Tijdstip': pd.to_datetime(np.asarray(ts, dtype='int64'), unit='s'),
+        GLUCOSE: _float32(glucose),
+        'Medicatie': pd.Categorical(medication),
+        'Activiteit': pd.Categorical(activity),
+        WEIGHT: _float32(weight),
+    }, index=pd.Index(np.asarray(ids, dtype='int64'), name='id'))
+    return frame
+
+
+def _concat(frame, extra):
+    """Voeg twee frames samen zonder dat de category kolommen naar object terugvallen"""
+    for column in CATEGORICAL:
+        categories = frame[column].cat.categories.union(extra[column].cat.categories)
+        frame[column] = frame[column].cat.set_categories(categories)
+        extra[column] = extra[column].cat.set_categories(categories)
+    return pd.concat([frame, extra])
+
+
+class AnalysisFrameCache:
+    """Houdt de analyse frame bij voor alle analytics schermen
+
+    Gebruik alleen vanuit de UI thread: get() bouwt zo nodig op via de gegeven connectie,
+    append() zet nieuwe metingen klaar en invalidate() laat de volgende get() opnieuw laden.
+    """
+
+    def __init__(self):
+        self.frame = None
+        self.pending = []  # toegevoegde rijen die nog niet in de frame staan
+
+    def get(self, conn):
+        """De actuele frame, oplopend op (Tijdstip, id)"""
+        if self.frame is None:
+            self.frame = build_frame(readings_between(conn, FRAME_COLUMNS, descending=False))
+            self.pending = []
+            print(f"📊 Analyse frame opgebouwd: {len(self.frame)} metingen, "
+                  f"{self.frame.memory_usage(deep=True).sum() / 1024:.0f} kB")
+        elif self.pending:
+            extra = build_frame(self.pending)
+            self.pending = []
+            extra = extra[~extra.index.isin(self.frame.index)]
+            if len(extra):
+                last = self.frame['Tijdstip'].iloc[-1] if len(self.frame) else None
+                self.frame = _concat(self.frame, extra)
+                # Achteraf ingevoerde metingen: opnieuw sorteren zoals readings_between
+                if last is not None and extra['Tijdstip'].min() < last:
+                    self.frame = (self.frame.rename_axis('id').reset_index()
+                                  .sort_values(['Tijdstip', 'id'], kind='stable').set_index('id'))
+        return self.frame
+
+    def append(self, rows):
+        """Zet nieuwe (id, ts, bloedwaarde, medicatie, activiteit, gewicht) rijen klaar"""
+        if self.frame is not None:
+            self.pending.extend(row for row in rows if row[1] is not None)
+
+    def invalidate(self):
+        """Laat de volgende get() de frame opnieuw uit de database opbouwen"""
+        self.frame = None
+        self.pending = []
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Jaararchieven voor Diabetes Tracker
+Metingen ouder dan een instelbare leeftijd verhuizen in bulk naar één bestand per jaar
+(diabetes_archive_2024.db). Query functies koppelen alleen de jaren die een bereik raakt
+met ATTACH en combineren ze met UNION ALL, zodat diabetes_data.db klein blijft.
+"""
+
+import os
+import re
+import glob
+import heapq
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from timestamps import to_ts, TS_MAX
+from rollups import suspend_delete_trigger, resume_delete_trigger, record_archived_extremes
+from change_journal import has_change_journal, suspend_journal_trigger, resume_journal_trigger, record_bulk_changes
+
+ARCHIVE_PREFIX = 'diabetes_archive_'
+ARCHIVE_SCHEMA = 'archief_{year}'
+MAX_ATTACHED = 8  # SQLite staat standaard 10 gekoppelde databases toe; patient_data.db is er al één
+
+
+def archive_path(year, directory='.'):
+    """Bestandsnaam van het archief voor een jaar"""
+    return os.path.join(directory, f"{ARCHIVE_PREFIX}{year}.db")
+
+
+def archive_years(directory='.'):
+    """Jaren waarvoor een archiefbestand bestaat, oplopend"""
+    years = []
+    for path in glob.glob(os.path.join(directory, f"{ARCHIVE_PREFIX}*.db")):
+        match = re.match(rf"{ARCHIVE_PREFIX}(\d{{4}})\.db$", os.path.basename(path))
+        if match:
+            years.append(int(match.group(1)))
+    return sorted(years)
+
+
+def year_range(year):
+    """(eerste, laatste) ts van een kalenderjaar"""
+    return to_ts(f"{year}-01-01"), to_ts(f"{year + 1}-01-01") - 1
+
+
+def years_in_range(start_ts, end_ts, directory='.'):
+    """Gearchiveerde jaren die een ts bereik raakt"""
+    return [year for year in archive_years(directory)
+            if year_range(year)[0] <= end_ts and year_range(year)[1] >= start_ts]
+
+
+def _attach(conn, year, directory):
+    schema = ARCHIVE_SCHEMA.format(year=year)
+    conn.execute(f"ATTACH DATABASE ? AS {schema}", (archive_path(year, directory),))
+    return schema
+
+
+@contextmanager
+def attached_archives(conn, years, directory='.'):
+    """Koppel archieven tijdelijk aan conn; geeft de schema namen in dezelfde volgorde"""
+    schemas = []
+    try:
+        for year in years:
+            schemas.append(_attach(conn, year, directory))
+        yield schemas
+    finally:
+        for schema in schemas:
+            conn.execute(f"DETACH DATABASE {schema}")
+
+
+def _ensure_archive_tables(conn, schema):
+    """Maak bloedwaarden en reading_medications in het archief met de kolommen van main"""
+    columns = [(row[1], row[2]) for row in conn.execute("PRAGMA main.table_info(bloedwaarden)")]
+    definitions = ", ".join(
+        "id INTEGER PRIMARY KEY" if name == 'id' else f"{name} {column_type}".strip()
+        for name, column_type in columns)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {schema}.bloedwaarden ({definitions})")
+
+    # Kolommen die later in main zijn toegevoegd
+    existing = {row[1] for row in conn.execute(f"PRAGMA {schema}.table_info(bloedwaarden)")}
+    for name, column_type in columns:
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {schema}.bloedwaarden ADD COLUMN {name} {column_type}")
+
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_ts_covering ON bloedwaarden(ts, bloedwaarde, gewicht)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_ts_id ON bloedwaarden(ts)")
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {schema}.reading_medications (
+            reading_id INTEGER NOT NULL,
+            medication_id INTEGER NOT NULL,
+            amount REAL,
+            unit TEXT,
+            PRIMARY KEY (reading_id, medication_id)
+        ) WITHOUT ROWID
+    ''')
+    return [name for name, column_type in columns]
+
+
+def _table_exists(conn, table):
+    return conn.execute(
+        "SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone() is not None
+
+
+def archive_old_readings(conn, older_than_days, directory='.', today=None, progress=None):
+    """Verplaats metingen ouder dan older_than_days naar jaararchieven
+
+    Per jaar gebeurt kopiëren en verwijderen in één transactie. De daily_rollup houdt de
+    gearchiveerde dagen (de delete trigger staat tijdens het verplaatsen uit), zodat
+    overzichten over de hele geschiedenis blijven kloppen. Het wijzigingsjournaal krijgt
+    'A' regels in plaats van 'D', zodat afnemers verplaatsen van verwijderen kunnen
+    onderscheiden. progress krijgt (jaar, aantal).
+    Geeft {jaar: aantal verplaatste metingen} terug.
+    """
+    today = today or datetime.now().strftime("%Y-%m-%d")
+    cutoff = to_ts((datetime.strptime(today, "%Y-%m-%d") - timedelta(days=older_than_days)).strftime("%Y-%m-%d"))
+
+    first = conn.execute("SELECT MIN(ts) FROM main.bloedwaarden WHERE ts < ?", (cutoff,)).fetchone()[0]
+    if first is None:
+        return {}
+
+    conn.commit()  # ATTACH kan niet binnen een transactie
+    has_rollup = conn.execute(
+        "SELECT 1 FROM main.sqlite_master WHERE type = 'trigger' AND name = 'daily_rollup_delete'"
+    ).fetchone() is not None
+    has_medications = _table_exists(conn, 'reading_medications')
+    has_journal = has_change_journal(conn)
+
+    moved = {}
+    last_year = datetime(1970, 1, 1) + timedelta(seconds=cutoff - 1)
+    for year in range((datetime(1970, 1, 1) + timedelta(seconds=first)).year, last_year.year + 1):
+        start_ts, end_ts = year_range(year)
+        end_ts = min(end_ts, cutoff - 1)
+        count = conn.execute("SELECT COUNT(*) FROM main.bloedwaarden WHERE ts BETWEEN ? AND ?",
+                             (start_ts, end_ts)).fetchone()[0]
+        if not count:
+            continue
+
+        schema = _attach(conn, year, directory)
+        try:
+            columns = ", ".join(_ensure_archive_tables(conn, schema))
+            conn.commit()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if has_rollup:
+                    suspend_delete_trigger(conn)
+                    record_archived_extremes(conn, "ts BETWEEN ? AND ?", (start_ts, end_ts))
+                conn.execute(f'''
+                    INSERT OR REPLACE INTO {schema}.bloedwaarden ({columns})
+                    SELECT {columns} FROM main.bloedwaarden WHERE ts BETWEEN ? AND ?
+                ''', (start_ts, end_ts))
+                if has_medications:
+                    conn.execute(f'''
+                        INSERT OR REPLACE INTO {schema}.reading_medications
+                        SELECT rm.reading_id, rm.medication_id, rm.amount, rm.unit
+                        FROM main.reading_medications rm
+                        JOIN main.bloedwaarden b ON b.id = rm.reading_id
+                        WHERE b.ts BETWEEN ? AND ?
+                    ''', (start_ts, end_ts))
+                if has_journal:
+                    suspend_journal_trigger(conn, 'bloedwaarden', 'delete')
+                    record_bulk_changes(conn, 'bloedwaarden', 'A', "ts BETWEEN ? AND ?", (start_ts, end_ts))
+                # Triggers ruimen zoekindex en medicatie regels in main op
+                conn.execute("DELETE FROM main.bloedwaarden WHERE ts BETWEEN ? AND ?", (start_ts, end_ts))
+                if has_rollup:
+                    resume_delete_trigger(conn)
+                if has_journal:
+                    resume_journal_trigger(conn, 'bloedwaarden', 'delete')
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        finally:
+            conn.execute(f"DETACH DATABASE {schema}")
+
+        moved[year] = count
+        print(f"🗄️ {count} metingen uit {year} gearchiveerd naar {os.path.basename(archive_path(year, directory))}")
+        if progress:
+            progress(year, count)
+    return moved
+
+
+def _keyed(columns):
+    """Kolomlijst met ts en id vooraan als sorteersleutel"""
+    return f"ts, id, {columns}"
+
+
+def readings_between(conn, columns, start_ts=0, end_ts=TS_MAX, descending=True, directory='.'):
+    """Metingen uit main en de geraakte jaararchieven, gesorteerd op (ts, id)
+
+    columns is een kolomlijst zoals HISTORY_COLUMNS. Per groep van MAX_ATTACHED jaren wordt
+    één UNION ALL query uitgevoerd; de gesorteerde delen worden daarna samengevoegd.
+    """
+    direction = "DESC" if descending else "ASC"
+    selected = _keyed(columns)
+    parts = [conn.execute(f'''
+        SELECT {selected} FROM main.bloedwaarden
+        WHERE ts BETWEEN ? AND ?
+        ORDER BY ts {direction}, id {direction}
+    ''', (start_ts, end_ts)).fetchall()]
+
+    years = years_in_range(start_ts, end_ts, directory)
+    for group_start in range(0, len(years), MAX_ATTACHED):
+        with attached_archives(conn, years[group_start:group_start + MAX_ATTACHED], directory) as schemas:
+            union = " UNION ALL ".join(
+                f"SELECT {selected} FROM {schema}.bloedwaarden WHERE ts BETWEEN ? AND ?" for schema in schemas)
+            parts.append(conn.execute(f"{union} ORDER BY 1 {direction}, 2 {direction}",
+                                      [start_ts, end_ts] * len(schemas)).fetchall())
+
+    if len(parts) == 1:
+        return [row[2:] for row in parts[0]]
+    merged = heapq.merge(*parts, key=lambda row: (row[0], row[1]), reverse=descending)
+    return [row[2:] for row in merged]
+
+
+def page_before(conn, columns, key, limit, directory='.'):
+    """Keyset pagina van metingen ouder dan key = (ts, id), nieuwste eerst, over main en archieven"""
+    return _page(conn, columns, key, limit, directory, older=True)
+
+
+def page_after(conn, columns, key, limit, directory='.'):
+    """Keyset pagina van metingen nieuwer dan key = (ts, id), oudste eerst, over archieven en main"""
+    return _page(conn, columns, key, limit, directory, older=False)
+
+
+def _page(conn, columns, key, limit, directory, older):
+    """Keyset pagina over main en de archieven, jaar voor jaar tot de pagina vol is
+
+    Ook main kan oude metingen bevatten (achteraf ingevoerd), dus main wordt altijd
+    meegenomen en de delen worden op (ts, id) samengevoegd.
+    """
+    ts, row_id = key
+    comparison, direction = ("<", "DESC") if older else (">", "ASC")
+    selected = _keyed(columns)
+    query = '''
+        SELECT {selected} FROM {schema}.bloedwaarden
+        WHERE (ts, id) {comparison} (?, ?)
+        ORDER BY ts {direction}, id {direction}
+        LIMIT ?
+    '''
+    sort_key = lambda row: (row[0], row[1])
+    rows = conn.execute(query.format(selected=selected, schema='main', comparison=comparison,
+                                     direction=direction), (ts, row_id, limit)).fetchall()
+
+    years = years_in_range(0, ts, directory) if older else years_in_range(ts, TS_MAX, directory)
+    for year in (reversed(years) if older else years):
+        first_ts, last_ts = year_range(year)
+        # Vol en het volgende jaar ligt volledig voorbij de laatste rij van de pagina
+        if len(rows) >= limit and (rows[-1][0] > last_ts if older else rows[-1][0] < first_ts):
+            break
+        with attached_archives(conn, [year], directory) as (schema,):
+            rows.extend(conn.execute(query.format(selected=selected, schema=schema, comparison=comparison,
+                                                  direction=direction), (ts, row_id, limit)).fetchall())
+        rows = sorted(rows, key=sort_key, reverse=older)[:limit]
+    return [row[2:] for row in rows]
+
+
+def archived_day_extremes(directory='.'):
+    """(dag, min, max) van de bloedwaarden per dag in alle jaararchieven
+
+    Leest elk archief met een eigen connectie, zodat dit ook binnen een transactie op
+    diabetes_data.db kan (ATTACH kan dat niet).
+    """
+    extremes = []
+    for year in archive_years(directory):
+        archive_conn = sqlite3.connect(archive_path(year, directory))
+        try:
+            extremes.extend(archive_conn.execute(
+                "SELECT datum, MIN(bloedwaarde), MAX(bloedwaarde) FROM bloedwaarden GROUP BY datum").fetchall())
+        except sqlite3.OperationalError:
+            pass  # leeg of onvolledig archief
+        finally:
+            archive_conn.close()
+    return extremes
+
+
+def archive_sizes(directory='.'):
+    """{jaar: bestandsgrootte in bytes} van alle archieven"""
+    return {year: os.path.getsize(archive_path(year, directory)) for year in archive_years(directory)}
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Backup Manager voor Diabetes Tracker
+Online backups met de SQLite backup API: veilig tijdens schrijfacties en in stappen van N pagina's.
+Herstellen gaat met dezelfde API in de geopende database.
+"""
+
+import os
+import sqlite3
+import threading
+import queue
+import time
+from datetime import datetime
+
+
+class BackupRestarted(Exception):
+    """De bron is tijdens de backup te vaak gewijzigd door een andere connectie"""
+
+
+def online_backup(source_path, target_path, pages=256, progress=None, step_delay=0.005,
+                  max_restarts=3):
+    """Kopieer een database pagina voor pagina naar target_path en verifieer de kopie
+
+    progress wordt aangeroepen met (gekopieerde_paginas, totaal_paginas).
+    Tussen de stappen wordt step_delay seconden gewacht zodat schrijvers niet
+    geblokkeerd worden. Een schrijfactie van een andere connectie laat SQLite de
+    backup opnieuw beginnen; na max_restarts herstarts wordt de rest in één stap
+    gekopieerd (in WAL modus leest die stap een snapshot en blokkeert schrijvers niet).
+    Geeft een dictionary met het resultaat terug.
+    """
+    started = time.perf_counter()
+    temp_path = f"{target_path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    state = {'remaining': None, 'restarts': 0}
+
+    def on_step(status, remaining, total):
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > max_restarts:
+                raise BackupRestarted()
+        state['remaining'] = remaining
+        if progress:
+            progress(total - remaining, total)
+        if step_delay:
+            time.sleep(step_delay)
+
+    source = sqlite3.connect(source_path, timeout=30)
+    target = sqlite3.connect(temp_path)
+    try:
+        try:
+            source.backup(target, pages=pages, progress=on_step)
+        except BackupRestarted:
+            print(f"⚠️ Backup {state['restarts']}x herstart door schrijfacties, kopie in één stap")
+            source.backup(target, pages=-1)
+            if progress:
+                total = target.execute("PRAGMA page_count").fetchone()[0]
+                progress(total, total)
+        # De kopie neemt de WAL vlag van de bron over; een backup is één zelfstandig bestand
+        target.execute("PRAGMA journal_mode=DELETE")
+        check = verify_backup(target)
+        page_count = target.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        target.close()
+        source.close()
+
+    if check != 'ok':
+        os.remove(temp_path)
+        raise sqlite3.DatabaseError(f"Backup verificatie mislukt: {check}")
+
+    # Pas na een geslaagde controle de definitieve naam geven
+    os.replace(temp_path, target_path)
+    return {
+        'path': target_path,
+        'pages': page_count,
+        'size': os.path.getsize(target_path),
+        'seconds': time.perf_counter() - started,
+        'check': check,
+    }
+
+
+def restore_backup(source_path, target_conn, pages=256):
+    """Zet een backup met de backup API terug in een geopende database
+
+    Het bestand wordt eerst gecontroleerd; daarna worden de pagina's in de open connectie
+    geschreven. Zo blijven WAL bestanden en de andere connecties op de database geldig
+    (die zien na afloop de herstelde inhoud). Geeft een dictionary met het resultaat terug.
+    """
+    started = time.perf_counter()
+    source = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True)
+    try:
+        check = verify_backup(source)
+        if check != 'ok':
+            raise sqlite3.DatabaseError(f"Backup verificatie mislukt: {check}")
+        source.backup(target_conn, pages=pages)
+    finally:
+        source.close()
+    return {
+        'path': source_path,
+        'pages': target_conn.execute("PRAGMA page_count").fetchone()[0],
+        'seconds': time.perf_counter() - started,
+        'check': check,
+    }
+
+
+def verify_backup(conn):
+    """Controleer een backup met PRAGMA quick_check"""
+    rows = conn.execute("PRAGMA quick_check").fetchall()
+    return "; ".join(row[0] for row in rows)
+
+
+def backup_filename(prefix, directory='.'):
+    """Bestandsnaam met tijdstempel, bijvoorbeeld diabetes_backup_20240101_120000.db"""
+    return os.path.join(directory, f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db")
+
+
+class BackupManager:
+    """Voert online backups uit op een achtergrond thread en meldt voortgang aan de Tk thread"""
+
+    def __init__(self, root, db_path='diabetes_data.db', pages=256, step_delay=0.005,
+                 poll_interval=100):
+        self.root = root
+        self.db_path = db_path
+        self.pages = pages
+        self.step_delay = step_delay
+        self.poll_interval = poll_interval
+        self.events = queue.Queue()
+        self.thread = None
+
+    def is_running(self):
+        """Controleer of er een backup bezig is"""
+        return self.thread is not None and self.thread.is_alive()
+
+    def start_backup(self, target_path, progress=None, callback=None, error_callback=None):
+        """Start een backup naar een los bestand op de achtergrond
+
+        progress(gekopieerd, totaal), callback(resultaat) en error_callback(fout)
+        worden op de Tk thread aangeroepen. Geeft False terug als er al een backup loopt.
+        """
+        def run(report):
+            result = online_backup(self.db_path, target_path, pages=self.pages,
+                                   step_delay=self.step_delay, progress=report)
+            print(f"💾 Backup gemaakt: {result['path']} ({result['pages']} pagina's, "
+                  f"{result['seconds']:.1f} s)")
+            return result
+        return self._start(run, progress, callback, error_callback)
+
+    def start_snapshot(self, store, progress=None, callback=None, error_callback=None):
+        """Start een snapshot in een BackupStore op de achtergrond"""
+        def run(report):
+            return store.create_snapshot(self.db_path, progress=report)
+        return self._start(run, progress, callback, error_callback)
+
+    def _start(self, run, progress, callback, error_callback):
+        """Voer run(report) uit op een achtergrond thread"""
+        if self.is_running():
+            return False
+
+        def target():
+            try:
+                result = run(lambda done, total: self.events.put(('progress', (done, total))))
+                self.events.put(('done', result))
+            except Exception as e:
+                print(f"❌ Backup mislukt: {e}")
+                self.events.put(('error', e))
+
+        self.thread = threading.Thread(target=target, name="BackupManager")
+        self.thread.daemon = True
+        self.thread.start()
+        self.root.after(self.poll_interval, self._poll, progress, callback, error_callback)
+        return True
+
+    def _poll(self, progress, callback, error_callback):
+        """Lever voortgang en resultaat af op de Tk thread"""
+        finished = False
+        try:
+            while True:
+                event, value = self.events.get_nowait()
+                if event == 'progress':
+                    if progress:
+                        progress(*value)
+                elif event == 'done':
+                    finished = True
+                    if callback:
+                        callback(value)
+                else:
+                    finished = True
+                    if error_callback:
+                        error_callback(value)
+        except queue.Empty:
+            pass
+
+        if not finished:
+            self.root.after(self.poll_interval, self._poll, progress, callback, error_callback)
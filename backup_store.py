@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Backup Store voor Diabetes Tracker
+Snapshots worden opgeslagen als content-addressed, gecomprimeerde chunks: ongewijzigde pagina's
+worden maar één keer bewaard. Een manifest houdt de snapshots bij en een retentiebeleid ruimt op.
+"""
+
+import os
+import json
+import hashlib
+import sqlite3
+import tempfile
+import threading
+import zlib
+from datetime import datetime
+
+from backup_manager import online_backup
+
+DEFAULT_RETENTION = {'daily': 7, 'weekly': 4, 'monthly': 12}
+
+
+class BackupStore:
+    """Deduplicerende backup opslag met manifest index en retentiebeleid"""
+
+    def __init__(self, directory='backup_store', pages_per_chunk=16, retention=None):
+        self.directory = directory
+        self.chunks_dir = os.path.join(directory, 'chunks')
+        self.snapshots_dir = os.path.join(directory, 'snapshots')
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+        self.pages_per_chunk = pages_per_chunk
+        self.retention = dict(DEFAULT_RETENTION, **(retention or {}))
+        self.lock = threading.Lock()
+
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        self.manifest = self._load_manifest()
+
+    # ---- manifest ----
+
+    def _load_manifest(self):
+        """Laad het manifest, of begin met een lege index"""
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {'latest': None, 'snapshots': {}}
+
+    def _save_manifest(self):
+        """Schrijf het manifest atomair weg"""
+        self._write_json(self.manifest_path, self.manifest)
+
+    @staticmethod
+    def _write_json(path, data):
+        """Schrijf JSON via een tijdelijk bestand zodat een crash geen half bestand achterlaat"""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_path, path)
+
+    def latest(self):
+        """Metadata van de laatste snapshot, of None"""
+        snapshot_id = self.manifest['latest']
+        return self.manifest['snapshots'].get(snapshot_id) if snapshot_id else None
+
+    def list_snapshots(self):
+        """Alle snapshots, nieuwste eerst"""
+        return sorted(self.manifest['snapshots'].values(), key=lambda s: (s['created'], s['id']), reverse=True)
+
+    # ---- chunks ----
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.chunks_dir, digest[:2], digest)
+
+    def _store_chunk(self, data):
+        """Sla een chunk op onder zijn SHA-256; geeft (digest, nieuw_opgeslagen_bytes) terug"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._chunk_path(digest)
+        if os.path.exists(path):
+            return digest, 0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = zlib.compress(data, 6)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(compressed)
+        os.replace(temp_path, path)
+        return digest, len(compressed)
+
+    def _read_chunk(self, digest):
+        with open(self._chunk_path(digest), 'rb') as f:
+            data = zlib.decompress(f.read())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Chunk {digest[:12]} is beschadigd")
+        return data
+
+    # ---- snapshots ----
+
+    def create_snapshot(self, db_path, progress=None):
+        """Maak een consistente kopie met de backup API en sla die op als chunks"""
+        fd, temp_path = tempfile.mkstemp(suffix='.db', dir=self.directory)
+        os.close(fd)
+        try:
+            online_backup(db_path, temp_path, progress=progress)
+            with self.lock:
+                snapshot = self._store_file(temp_path, os.path.basename(db_path))
+                self.apply_retention()
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return snapshot
+
+    def _store_file(self, path, source_name):
+        """Splits een databasebestand in pagina-uitgelijnde chunks"""
+        conn = sqlite3.connect(path)
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        conn.close()
+        chunk_size = page_size * self.pages_per_chunk
+
+        created = datetime.now()
+        snapshot_id = created.strftime('%Y%m%d_%H%M%S_%f')
+        chunks = []
+        file_hash = hashlib.sha256()
+        new_bytes = 0
+        size = 0
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(chunk_size)
+                if not data:
+                    break
+                file_hash.update(data)
+                digest, stored = self._store_chunk(data)
+                chunks.append(digest)
+                new_bytes += stored
+                size += len(data)
+
+        self._write_json(os.path.join(self.snapshots_dir, f"{snapshot_id}.json"), {
+            'id': snapshot_id,
+            'chunks': chunks,
+        })
+
+        snapshot = {
+            'id': snapshot_id,
+            'source': source_name,
+            'created': created.strftime('%Y-%m-%d %H:%M:%S'),
+            'size': size,
+            'sha256': file_hash.hexdigest(),
+            'chunk_count': len(chunks),
+            'new_bytes': new_bytes,
+        }
+        self.manifest['snapshots'][snapshot_id] = snapshot
+        self.manifest['latest'] = snapshot_id
+        self._save_manifest()
+        print(f"💾 Snapshot {snapshot_id}: {len(chunks)} chunks, {new_bytes / 1024:.0f} KB nieuw opgeslagen")
+        return snapshot
+
+    def _snapshot_chunks(self, snapshot_id):
+        with open(os.path.join(self.snapshots_dir, f"{snapshot_id}.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)['chunks']
+
+    def restore_snapshot(self, snapshot_id, target_path):
+        """Zet een snapshot terug naar target_path en controleer de inhoud"""
+        snapshot = self.manifest['snapshots'].get(snapshot_id)
+        if snapshot is None:
+            raise KeyError(f"Snapshot {snapshot_id} bestaat niet")
+
+        file_hash = hashlib.sha256()
+        temp_path = f"{target_path}.tmp"
+        with open(temp_path, 'wb') as f:
+            for digest in self._snapshot_chunks(snapshot_id):
+                data = self._read_chunk(digest)
+                file_hash.update(data)
+                f.write(data)
+
+        if file_hash.hexdigest() != snapshot['sha256']:
+            os.remove(temp_path)
+            raise ValueError(f"Snapshot {snapshot_id} komt niet overeen met de opgeslagen controlesom")
+        os.replace(temp_path, target_path)
+        return target_path
+
+    # ---- retentie ----
+
+    def apply_retention(self):
+        """Bewaar de nieuwste snapshot per dag, week en maand volgens het retentiebeleid"""
+        snapshots = self.list_snapshots()
+        keep = {self.manifest['latest']}
+
+        buckets = {
+            'daily': lambda d: d.strftime('%Y-%m-%d'),
+            'weekly': lambda d: '%d-W%02d' % d.isocalendar()[:2],
+            'monthly': lambda d: d.strftime('%Y-%m'),
+        }
+        for period, bucket_of in buckets.items():
+            seen = []
+            for snapshot in snapshots:
+                bucket = bucket_of(datetime.strptime(snapshot['created'], '%Y-%m-%d %H:%M:%S'))
+                if bucket in seen:
+                    continue
+                if len(seen) >= self.retention[period]:
+                    break
+                seen.append(bucket)
+                keep.add(snapshot['id'])
+
+        removed = [s['id'] for s in snapshots if s['id'] not in keep]
+        if not removed:
+            return 0
+
+        for snapshot_id in removed:
+            del self.manifest['snapshots'][snapshot_id]
+        self._save_manifest()
+        for snapshot_id in removed:
+            os.remove(os.path.join(self.snapshots_dir, f"{snapshot_id}.json"))
+
+        freed = self._collect_garbage()
+        print(f"🧹 {len(removed)} oude snapshots verwijderd, {freed / 1024:.0f} KB vrijgemaakt")
+        return len(removed)
+
+    def _collect_garbage(self):
+        """Verwijder chunks waar geen enkele bewaarde snapshot meer naar verwijst"""
+        referenced = set()
+        for snapshot_id in self.manifest['snapshots']:
+            referenced.update(self._snapshot_chunks(snapshot_id))
+
+        freed = 0
+        for prefix in os.listdir(self.chunks_dir):
+            prefix_dir = os.path.join(self.chunks_dir, prefix)
+            for name in os.listdir(prefix_dir):
+                if name not in referenced:
+                    path = os.path.join(prefix_dir, name)
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+        return freed
+
+    def disk_usage(self):
+        """Totale grootte van de opgeslagen chunks in bytes"""
+        total = 0
+        for prefix in os.listdir(self.chunks_dir):
+            prefix_dir = os.path.join(self.chunks_dir, prefix)
+            total += sum(os.path.getsize(os.path.join(prefix_dir, name)) for name in os.listdir(prefix_dir))
+        return total
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Wijzigingsjournaal voor Diabetes Tracker
+Triggers schrijven elke insert, update en delete op bloedwaarden en medication_schedule weg
+in change_journal met een oplopend volgnummer (seq). Afnemers (exports, webweergave, backup)
+vragen de wijzigingen na hun laatst verwerkte seq op en bewaren die als watermerk.
+"""
+
+from timestamps import TS_SQL
+
+JOURNAL_TABLE = '''
+    CREATE TABLE IF NOT EXISTS change_journal (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        tabel TEXT NOT NULL,
+        rij_id INTEGER NOT NULL,
+        actie TEXT NOT NULL,
+        ts INTEGER,
+        gewijzigd_op INTEGER NOT NULL
+    )
+'''
+
+JOURNAL_INDEX = '''
+    CREATE INDEX IF NOT EXISTS idx_change_journal_tabel ON change_journal(tabel, seq)
+'''
+
+WATERMARK_TABLE = '''
+    CREATE TABLE IF NOT EXISTS sync_watermarks (
+        afnemer TEXT PRIMARY KEY,
+        seq INTEGER NOT NULL,
+        bijgewerkt_op TEXT NOT NULL
+    )
+'''
+
+# actie: I = insert, U = update, D = delete, A = naar een jaararchief verplaatst
+_NOW = "CAST(strftime('%s', 'now') AS INTEGER)"
+
+# Per tabel de ts die in het journaal komt (None = geen ts). bloedwaarden.ts wordt pas na de
+# schrijfactie door de ts triggers bijgewerkt, daarom komt de ts uit datum en tijd.
+JOURNALED_TABLES = {
+    'bloedwaarden': "COALESCE(" + TS_SQL.format(datum='{row}.datum', tijd='{row}.tijd') + ", {row}.ts)",
+    'medication_schedule': None,
+}
+
+# Kolommen waarvan een update in het journaal komt. Voor bloedwaarden niet ts: die wordt door
+# bloedwaarden_ts_insert/_update achteraf gezet en zou anders een tweede 'U' regel geven.
+_UPDATE_OF = {
+    'bloedwaarden': ("OF datum, tijd, bloedwaarde, medicatie, activiteit, gewicht, opmerkingen, "
+                     "medicatie_hoeveelheid, insuline_ingenomen, insuline_vergeten"),
+}
+
+
+def _ts_value(table, row):
+    """SQL voor de ts van row ('NEW', 'OLD' of een tabelnaam) in het journaal"""
+    expression = JOURNALED_TABLES.get(table)
+    return expression.format(row=row) if expression else "NULL"
+
+
+def journal_triggers(table):
+    """CREATE TRIGGER statements (insert, update, delete) die wijzigingen van table in het journaal zetten"""
+    return [
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_journal_insert
+        AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO change_journal (tabel, rij_id, actie, ts, gewijzigd_op)
+            VALUES ('{table}', NEW.id, 'I', {_ts_value(table, 'NEW')}, {_NOW});
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_journal_update
+        AFTER UPDATE {_UPDATE_OF.get(table, '')} ON {table}
+        BEGIN
+            INSERT INTO change_journal (tabel, rij_id, actie, ts, gewijzigd_op)
+            VALUES ('{table}', NEW.id, 'U', {_ts_value(table, 'NEW')}, {_NOW});
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_journal_delete
+        AFTER DELETE ON {table}
+        BEGIN
+            INSERT INTO change_journal (tabel, rij_id, actie, ts, gewijzigd_op)
+            VALUES ('{table}', OLD.id, 'D', {_ts_value(table, 'OLD')}, {_NOW});
+        END
+        ''',
+    ]
+
+
+def ensure_change_journal(conn, table):
+    """Maak journaal, watermerken en de triggers voor table aan"""
+    conn.execute(JOURNAL_TABLE)
+    conn.execute(JOURNAL_INDEX)
+    conn.execute(WATERMARK_TABLE)
+    for trigger in journal_triggers(table):
+        conn.execute(trigger)
+    conn.commit()
+
+
+def refresh_update_trigger(conn, table):
+    """Vervang de update trigger van table door de huidige definitie (zie _UPDATE_OF)"""
+    conn.execute(f"DROP TRIGGER IF EXISTS main.{table}_journal_update")
+    conn.execute(journal_triggers(table)[1])
+
+
+def has_change_journal(conn, table='bloedwaarden'):
+    """Controleer of het journaal voor table actief is"""
+    return conn.execute(
+        "SELECT 1 FROM main.sqlite_master WHERE type = 'trigger' AND name = ?", (f"{table}_journal_insert",)
+    ).fetchone() is not None
+
+
+def suspend_journal_trigger(conn, table, action):
+    """Verwijder één journaal trigger ('insert' of 'delete') voor een bulk bewerking binnen een transactie"""
+    conn.execute(f"DROP TRIGGER IF EXISTS main.{table}_journal_{action}")
+
+
+def resume_journal_trigger(conn, table, action, after_id=None):
+    """Herstel een journaal trigger na een bulk bewerking
+
+    Met after_id (na een bulk insert) krijgen alle rijen met id > after_id in één
+    INSERT ... SELECT een 'I' regel. Bij archiveren zijn de 'A' regels al vooraf
+    vastgelegd met record_bulk_changes.
+    """
+    if after_id is not None:
+        record_bulk_changes(conn, table, 'I', "id > ?", (after_id,))
+    index = {'insert': 0, 'update': 1, 'delete': 2}[action]
+    conn.execute(journal_triggers(table)[index])
+
+
+def record_bulk_changes(conn, table, action, where, params=()):
+    """Zet één journaalregel per rij van main.table die aan where voldoet (voor bulk bewerkingen)"""
+    conn.execute(f'''
+        INSERT INTO change_journal (tabel, rij_id, actie, ts, gewijzigd_op)
+        SELECT '{table}', id, '{action}', {_ts_value(table, table)}, {_NOW} FROM main.{table} WHERE {where} ORDER BY id
+    ''', params)
+
+
+def current_seq(conn):
+    """Hoogste ooit uitgedeelde volgnummer (blijft staan als prune_journal het journaal leegmaakt)"""
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_journal'").fetchone()
+    return row[0] if row else 0
+
+
+def iter_changes(conn, after_seq=0, table=None, batch_size=1000):
+    """Stream journaalregels (seq, tabel, rij_id, actie, ts, gewijzigd_op) na after_seq, in batches"""
+    last_seq = after_seq
+    while True:
+        if table:
+            rows = conn.execute('''
+                SELECT seq, tabel, rij_id, actie, ts, gewijzigd_op FROM change_journal
+                WHERE tabel = ? AND seq > ? ORDER BY seq LIMIT ?
+            ''', (table, last_seq, batch_size)).fetchall()
+        else:
+            rows = conn.execute('''
+                SELECT seq, tabel, rij_id, actie, ts, gewijzigd_op FROM change_journal
+                WHERE seq > ? ORDER BY seq LIMIT ?
+            ''', (last_seq, batch_size)).fetchall()
+        if not rows:
+            return
+        yield from rows
+        last_seq = rows[-1][0]
+
+
+def changes_since(conn, after_seq=0, table=None, limit=None):
+    """Journaalregels na after_seq als lijst (hooguit limit)"""
+    changes = []
+    for change in iter_changes(conn, after_seq, table):
+        changes.append(change)
+        if limit and len(changes) >= limit:
+            break
+    return changes
+
+
+def net_changes(conn, table, columns, after_seq=0):
+    """Netto wijzigingen van table na after_seq
+
+    Geeft (gewijzigde_rijen, verwijderde_ids, laatste_seq): gewijzigde_rijen bevat de huidige
+    inhoud (columns) van rijen die nog bestaan, verwijderde_ids de rijen die verwijderd zijn
+    (gearchiveerde rijen bestaan nog in een jaararchief en tellen niet mee).
+    Meerdere wijzigingen van één rij tellen één keer.
+    """
+    last_seq = conn.execute("SELECT COALESCE(MAX(seq), ?) FROM change_journal WHERE tabel = ? AND seq > ?",
+                            (after_seq, table, after_seq)).fetchone()[0]
+    changed = conn.execute(f'''
+        SELECT {columns} FROM main.{table}
+        WHERE id IN (SELECT rij_id FROM change_journal WHERE tabel = ? AND seq > ? AND seq <= ?)
+        ORDER BY id
+    ''', (table, after_seq, last_seq)).fetchall()
+    deleted = [row[0] for row in conn.execute(f'''
+        SELECT DISTINCT j.rij_id FROM change_journal j
+        WHERE j.tabel = ? AND j.seq > ? AND j.seq <= ? AND j.actie = 'D'
+          AND NOT EXISTS (SELECT 1 FROM main.{table} t WHERE t.id = j.rij_id)
+        ORDER BY j.rij_id
+    ''', (table, after_seq, last_seq))]
+    return changed, deleted, last_seq
+
+
+def get_watermark(conn, consumer):
+    """Laatst verwerkte seq van een afnemer (0 als die nog niets verwerkt heeft)"""
+    row = conn.execute("SELECT seq FROM sync_watermarks WHERE afnemer = ?", (consumer,)).fetchone()
+    return row[0] if row else 0
+
+
+def set_watermark(conn, consumer, seq):
+    """Leg de laatst verwerkte seq van een afnemer vast"""
+    conn.execute('''
+        INSERT INTO sync_watermarks (afnemer, seq, bijgewerkt_op) VALUES (?, ?, datetime('now', 'localtime'))
+        ON CONFLICT(afnemer) DO UPDATE SET seq = excluded.seq, bijgewerkt_op = excluded.bijgewerkt_op
+    ''', (consumer, seq))
+    conn.commit()
+
+
+def prune_journal(conn):
+    """Verwijder journaalregels die alle geregistreerde afnemers al verwerkt hebben"""
+    lowest = conn.execute("SELECT MIN(seq) FROM sync_watermarks").fetchone()[0]
+    if lowest is None:
+        return 0
+    removed = conn.execute("DELETE FROM change_journal WHERE seq <= ?", (lowest,)).rowcount
+    conn.commit()
+    return removed
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Medicatie Compliance voor Diabetes Tracker
+Unieke sleutel en indexen op medication_schedule, upsert van de dosis status en een
+compliance_rollup tabel per patiënt, dag en medicatie die door triggers actueel blijft
+"""
+
+from datetime import datetime, timedelta
+
+# Eén rij per dosis: de unieke index dient ook voor filters op (patient_id, date)
+SCHEDULE_UNIQUE_INDEX = '''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_schedule_dose
+    ON medication_schedule(patient_id, date, medication_id, scheduled_time)
+'''
+
+SCHEDULE_MEDICATION_INDEX = '''
+    CREATE INDEX IF NOT EXISTS idx_schedule_medication
+    ON medication_schedule(medication_id, date)
+'''
+
+COMPLIANCE_ROLLUP_TABLE = '''
+    CREATE TABLE IF NOT EXISTS compliance_rollup (
+        patient_id INTEGER NOT NULL,
+        dag TEXT NOT NULL,
+        medication_id INTEGER NOT NULL,
+        aantal INTEGER NOT NULL,
+        genomen INTEGER NOT NULL,
+        gemist INTEGER NOT NULL,
+        PRIMARY KEY (patient_id, dag, medication_id)
+    ) WITHOUT ROWID
+'''
+
+_ADD_DOSE = '''
+    INSERT INTO compliance_rollup (patient_id, dag, medication_id, aantal, genomen, gemist)
+    VALUES (COALESCE(NEW.patient_id, 0), COALESCE(NEW.date, ''), COALESCE(NEW.medication_id, 0),
+            1, NEW.taken = 1, NEW.missed = 1)
+    ON CONFLICT(patient_id, dag, medication_id) DO UPDATE SET
+        aantal = aantal + 1,
+        genomen = genomen + excluded.genomen,
+        gemist = gemist + excluded.gemist;
+'''
+
+_REMOVE_DOSE = '''
+    UPDATE compliance_rollup SET
+        aantal = aantal - 1,
+        genomen = genomen - (OLD.taken = 1),
+        gemist = gemist - (OLD.missed = 1)
+    WHERE patient_id = COALESCE(OLD.patient_id, 0) AND dag = COALESCE(OLD.date, '')
+      AND medication_id = COALESCE(OLD.medication_id, 0);
+    DELETE FROM compliance_rollup
+    WHERE patient_id = COALESCE(OLD.patient_id, 0) AND dag = COALESCE(OLD.date, '')
+      AND medication_id = COALESCE(OLD.medication_id, 0) AND aantal <= 0;
+'''
+
+COMPLIANCE_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS compliance_rollup_insert
+    AFTER INSERT ON medication_schedule
+    BEGIN
+        {_ADD_DOSE}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS compliance_rollup_delete
+    AFTER DELETE ON medication_schedule
+    BEGIN
+        {_REMOVE_DOSE}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS compliance_rollup_update
+    AFTER UPDATE ON medication_schedule
+    BEGIN
+        {_REMOVE_DOSE}
+        {_ADD_DOSE}
+    END
+    ''',
+]
+
+ADHERENCE_WINDOWS = (30, 90, 365)
+
+
+def ensure_schedule_indexes(conn):
+    """Verwijder dubbele doses (de nieuwste blijft) en maak de unieke en gewone indexen aan"""
+    removed = conn.execute('''
+        DELETE FROM medication_schedule
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM medication_schedule
+            GROUP BY patient_id, date, medication_id, scheduled_time
+        )
+    ''').rowcount
+    if removed > 0:
+        print(f"🧹 {removed} dubbele medicatie registraties verwijderd")
+    conn.execute(SCHEDULE_UNIQUE_INDEX)
+    conn.execute(SCHEDULE_MEDICATION_INDEX)
+    conn.commit()
+
+
+def ensure_compliance_rollup(conn):
+    """Maak de rollup tabel en triggers aan en vul de tabel vanuit medication_schedule"""
+    conn.execute(COMPLIANCE_ROLLUP_TABLE)
+    for trigger in COMPLIANCE_TRIGGERS:
+        conn.execute(trigger)
+    rebuild_compliance_rollup(conn)
+
+
+def rebuild_compliance_rollup(conn):
+    """Bereken alle rollup rijen opnieuw uit medication_schedule"""
+    conn.execute("DELETE FROM compliance_rollup")
+    conn.execute('''
+        INSERT INTO compliance_rollup (patient_id, dag, medication_id, aantal, genomen, gemist)
+        SELECT COALESCE(patient_id, 0), COALESCE(date, ''), COALESCE(medication_id, 0),
+               COUNT(*), TOTAL(taken = 1), TOTAL(missed = 1)
+        FROM medication_schedule
+        GROUP BY 1, 2, 3
+    ''')
+    conn.commit()
+    rows = conn.execute("SELECT COUNT(*) FROM compliance_rollup").fetchone()[0]
+    print(f"📊 Compliance rollup opgebouwd ({rows} rijen)")
+
+
+def record_dose(conn, patient_id, medication_id, date, scheduled_time, taken, missed):
+    """Sla de status van één dosis op met één upsert op de unieke sleutel"""
+    conn.execute('''
+        INSERT INTO medication_schedule (patient_id, medication_id, scheduled_time, taken, missed, date)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(patient_id, date, medication_id, scheduled_time) DO UPDATE SET
+            taken = excluded.taken,
+            missed = excluded.missed
+    ''', (patient_id, medication_id, scheduled_time, bool(taken), bool(missed), date))
+    conn.commit()
+
+
+def clear_dose(conn, patient_id, medication_id, date, scheduled_time):
+    """Verwijder de registratie van één dosis"""
+    conn.execute('''
+        DELETE FROM medication_schedule
+        WHERE patient_id = ? AND date = ? AND medication_id = ? AND scheduled_time = ?
+    ''', (patient_id, date, medication_id, scheduled_time))
+    conn.commit()
+
+
+def adherence(conn, patient_id, start_date, end_date, schema='main'):
+    """(geregistreerd, genomen, gemist) doses van een patiënt in een datumbereik uit de rollup"""
+    return conn.execute(f'''
+        SELECT COALESCE(SUM(aantal), 0), COALESCE(SUM(genomen), 0), COALESCE(SUM(gemist), 0)
+        FROM {schema}.compliance_rollup
+        WHERE patient_id = ? AND dag BETWEEN ? AND ?
+    ''', (patient_id, start_date, end_date)).fetchone()
+
+
+def adherence_windows(conn, patient_id, windows=ADHERENCE_WINDOWS, today=None, schema='main'):
+    """Percentage genomen doses over de laatste 30/90/365 dagen: {dagen: percentage of None}"""
+    today = today or datetime.now().strftime("%Y-%m-%d")
+    end = datetime.strptime(today, "%Y-%m-%d")
+    result = {}
+    for days in windows:
+        start = (end - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+        total, taken, missed = adherence(conn, patient_id, start, today, schema)
+        result[days] = (taken / total * 100) if total else None
+    return result
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Connection Manager voor Diabetes Tracker
+Langlevende connecties per thread voor diabetes_data.db en patient_data.db, met pragmas die
+één keer per connectie gezet worden en de sqlite3 statement cache die over aanroepen heen blijft.
+Alle connecties zijn geïnstrumenteerd (zie query_stats).
+"""
+
+import sqlite3
+import threading
+
+from database_worker import apply_storage_mode
+from query_stats import InstrumentedConnection
+
+DIABETES_DB = 'diabetes_data.db'
+PATIENT_DB = 'patient_data.db'
+
+
+class ConnectionManager:
+    """Deelt per thread één connectie per database uit en houdt open/sluit tellers bij"""
+
+    def __init__(self, storage_mode='wal', statement_cache=256, timeout=30):
+        self.storage_mode = storage_mode
+        self.statement_cache = statement_cache  # sqlite3 LRU cache van voorbereide statements
+        self.timeout = timeout
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.connections = {}  # (thread id, pad) -> connectie
+        self.attachments = {}  # pad -> {schema naam: pad van de gekoppelde database}
+        self.opened = 0
+        self.closed = 0
+        self.requests = 0
+
+    def get(self, db_path=PATIENT_DB):
+        """Geef de connectie van deze thread voor db_path, open die zo nodig"""
+        connections = getattr(self.local, 'connections', None)
+        if connections is None:
+            connections = self.local.connections = {}
+
+        conn = connections.get(db_path)
+        if conn is None:
+            conn = self._open(db_path)
+            connections[db_path] = conn
+            with self.lock:
+                self.connections[(threading.get_ident(), db_path)] = conn
+                self.opened += 1
+        with self.lock:
+            self.requests += 1
+        return conn
+
+    def attach(self, db_path, schema, other_path):
+        """Koppel other_path als schema aan elke connectie naar db_path die hierna geopend wordt"""
+        self.attachments.setdefault(db_path, {})[schema] = other_path
+
+    def cursor(self, db_path=PATIENT_DB):
+        """Nieuwe cursor op de connectie van deze thread"""
+        return self.get(db_path).cursor()
+
+    def _open(self, db_path):
+        """Open een connectie en zet de pragmas één keer"""
+        conn = sqlite3.connect(db_path, timeout=self.timeout, cached_statements=self.statement_cache,
+                               check_same_thread=False, factory=InstrumentedConnection)
+        try:
+            apply_storage_mode(conn, self.storage_mode)
+            conn.execute("PRAGMA temp_store=MEMORY")
+        except sqlite3.Error as e:
+            print(f"⚠️ Kon pragmas niet zetten voor {db_path}: {e}")
+        for schema, other_path in self.attachments.get(db_path, {}).items():
+            try:
+                conn.execute("ATTACH DATABASE ? AS " + schema, (other_path,))
+            except sqlite3.Error as e:
+                print(f"⚠️ Kon {other_path} niet koppelen aan {db_path}: {e}")
+        return conn
+
+    def close(self, db_path):
+        """Sluit de connectie van deze thread voor db_path (bijvoorbeeld voor een restore)"""
+        connections = getattr(self.local, 'connections', {})
+        conn = connections.pop(db_path, None)
+        if conn is not None:
+            self._close(threading.get_ident(), db_path, conn)
+
+    def close_all(self):
+        """Sluit alle connecties van alle threads (bij afsluiten van de applicatie)"""
+        with self.lock:
+            items = list(self.connections.items())
+        for (thread_id, db_path), conn in items:
+            self._close(thread_id, db_path, conn)
+        self.local.connections = {}
+
+    def _close(self, thread_id, db_path, conn):
+        try:
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ Kon connectie naar {db_path} niet sluiten: {e}")
+        with self.lock:
+            if self.connections.pop((thread_id, db_path), None) is not None:
+                self.closed += 1
+
+    def get_stats(self):
+        """Open/sluit tellers en het aantal hergebruikte connecties"""
+        with self.lock:
+            return {
+                'opened': self.opened,
+                'closed': self.closed,
+                'open': len(self.connections),
+                'requests': self.requests,
+                'reused': self.requests - self.opened,
+            }
+
+
+# Gedeelde manager voor de hele applicatie
+connections = ConnectionManager()
+
+
+def get_connection(db_path=PATIENT_DB):
+    """Connectie van de huidige thread uit de gedeelde manager"""
+    return connections.get(db_path)
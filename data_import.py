@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Data Import voor Diabetes Tracker
+Streamt CGM/meter exports (CSV of JSON lines) in batches naar de bloedwaarden tabel:
+vectorized validatie met pandas, dedupe op ts en executemany in grote transacties
+"""
+
+import os
+import json
+import sqlite3
+import threading
+import queue
+import time
+
+import numpy as np
+import pandas as pd
+
+from database_worker import apply_storage_mode
+from rollups import has_rollup_triggers, suspend_insert_trigger, resume_insert_trigger
+from search import has_search_index, suspend_search_trigger, resume_search_trigger
+from change_journal import has_change_journal, suspend_journal_trigger, resume_journal_trigger
+from archive import readings_between
+
+MMOL_TO_MGDL = 18.0182
+
+# Opzoektabel voor HH:MM per minuut van de dag (sneller dan strftime per rij)
+_TIJDEN = np.array([f"{hour:02d}:{minute:02d}" for hour in range(24) for minute in range(60)])
+
+# Kolom indelingen per leverancier. Eigen indelingen kunnen in import_mappings.json staan.
+# - timestamp / timestamp_format: kolom met tijdstip en strftime formaat (None = automatisch)
+# - glucose: kolommen met de waarde; de eerste niet-lege wordt gebruikt
+# - filter: alleen rijen waarvan deze kolom een van de waarden heeft
+# - skip_rows: regels vóór de kolomkoppen
+# - unit: 'mg/dL' of 'mmol/L'
+IMPORT_MAPPINGS = {
+    'libre': {
+        'label': 'FreeStyle Libre (LibreView CSV)',
+        'skip_rows': 1,
+        'timestamp': 'Device Timestamp',
+        'timestamp_format': '%d-%m-%Y %H:%M',
+        'glucose': ['Historic Glucose mg/dL', 'Scan Glucose mg/dL'],
+        'filter': ('Record Type', ['0', '1']),
+        'unit': 'mg/dL',
+    },
+    'dexcom': {
+        'label': 'Dexcom Clarity CSV',
+        'skip_rows': 0,
+        'timestamp': 'Timestamp (YYYY-MM-DDThh:mm:ss)',
+        'timestamp_format': '%Y-%m-%dT%H:%M:%S',
+        'glucose': ['Glucose Value (mg/dL)'],
+        'filter': ('Event Type', ['EGV']),
+        'unit': 'mg/dL',
+    },
+    'generic': {
+        'label': 'Algemeen (timestamp, glucose)',
+        'skip_rows': 0,
+        'timestamp': 'timestamp',
+        'timestamp_format': None,
+        'glucose': ['glucose'],
+        'filter': None,
+        'unit': 'mg/dL',
+    },
+}
+
+
+def load_mappings(path='import_mappings.json'):
+    """Standaard indelingen aangevuld met eigen indelingen uit een JSON bestand"""
+    mappings = dict(IMPORT_MAPPINGS)
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                custom = json.load(f)
+            for name, mapping in custom.items():
+                base = dict(IMPORT_MAPPINGS['generic'])
+                base.update(mapping)
+                if isinstance(base.get('filter'), list):
+                    base['filter'] = tuple(base['filter'])
+                mappings[name] = base
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Kon import indelingen niet laden: {e}")
+    return mappings
+
+
+def read_batches(path, mapping, batch_size):
+    """Lees een export in stukken als DataFrames met alleen de benodigde kolommen (als tekst)"""
+    columns = [mapping['timestamp']] + list(mapping['glucose'])
+    if mapping.get('filter'):
+        columns.append(mapping['filter'][0])
+
+    if path.lower().endswith(('.json', '.jsonl', '.ndjson')):
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            first = f.read(1)
+        if first == '[':
+            # Een JSON array kan niet gestreamd worden; wordt in zijn geheel gelezen
+            frame = pd.read_json(path, dtype=False)
+            for start in range(0, len(frame), batch_size):
+                yield frame.iloc[start:start + batch_size].reindex(columns=columns).astype(object)
+            return
+        for frame in pd.read_json(path, lines=True, chunksize=batch_size, dtype=False):
+            yield frame.reindex(columns=columns).astype(object)
+        return
+
+    for frame in pd.read_csv(path, skiprows=mapping.get('skip_rows', 0), usecols=lambda c: c in columns,
+                             dtype=str, chunksize=batch_size, encoding='utf-8-sig'):
+        yield frame.reindex(columns=columns)
+
+
+def validate_batch(frame, mapping):
+    """Zet een batch om naar (datum, tijd, ts, bloedwaarde) kolommen; ongeldige rijen vallen weg"""
+    if mapping.get('filter'):
+        column, allowed = mapping['filter']
+        frame = frame[frame[column].astype(str).isin([str(value) for value in allowed])]
+
+    # Eerste niet-lege glucose kolom
+    glucose = pd.Series(float('nan'), index=frame.index)
+    for column in mapping['glucose']:
+        glucose = glucose.fillna(pd.to_numeric(frame[column], errors='coerce'))
+    if mapping.get('unit') == 'mmol/L':
+        glucose = glucose * MMOL_TO_MGDL
+
+    timestamps = pd.to_datetime(frame[mapping['timestamp']], format=mapping.get('timestamp_format'),
+                                errors='coerce')
+    if getattr(timestamps.dt, 'tz', None) is not None:
+        timestamps = timestamps.dt.tz_localize(None)
+
+    valid = timestamps.notna() & glucose.notna() & (glucose > 0) & (glucose <= 1000)
+    moments = timestamps[valid].to_numpy().astype('datetime64[m]')
+    # Wandkloktijd als UTC seconden op hele minuten, gelijk aan timestamps.to_ts
+    minutes = moments.astype('int64')
+
+    return pd.DataFrame({
+        'datum': moments.astype('datetime64[D]').astype(str),
+        'tijd': _TIJDEN[minutes % 1440],
+        'ts': minutes * 60,
+        'bloedwaarde': glucose[valid].round(1).to_numpy(),
+    })
+
+
+def insert_batch(conn, batch, source, use_rollup=True, use_search=False, use_journal=False):
+    """Voeg een gevalideerde batch toe in één transactie
+
+    De insert triggers van de rollup, de zoekindex en het wijzigingsjournaal worden binnen
+    dezelfde transactie tijdelijk vervangen door één gegroepeerde update per dag en één
+    INSERT ... SELECT in index en journaal; andere connecties zien de triggers nooit ontbreken.
+    """
+    rows = zip(batch['datum'].tolist(), batch['tijd'].tolist(), batch['ts'].tolist(),
+               batch['bloedwaarde'].tolist())
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if use_rollup or use_search or use_journal:
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM bloedwaarden").fetchone()[0]
+        if use_rollup:
+            suspend_insert_trigger(conn)
+        if use_search:
+            suspend_search_trigger(conn)
+        if use_journal:
+            suspend_journal_trigger(conn, 'bloedwaarden', 'insert')
+        conn.executemany('''
+            INSERT INTO bloedwaarden (datum, tijd, ts, bloedwaarde, opmerkingen)
+            VALUES (?, ?, ?, ?, ?)
+        ''', ((datum, tijd, ts, waarde, source) for datum, tijd, ts, waarde in rows))
+        if use_rollup:
+            resume_insert_trigger(conn, last_id)
+        if use_search:
+            resume_search_trigger(conn, last_id)
+        if use_journal:
+            resume_journal_trigger(conn, 'bloedwaarden', 'insert', last_id)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def import_readings(conn, path, mapping, batch_size=100000, source=None, progress=None, archive_dir='.'):
+    """Importeer een export in de bloedwaarden tabel
+
+    Dubbele metingen (zelfde ts, in het bestand, al in de database of in een jaararchief
+    in archive_dir) worden overgeslagen.
+    progress wordt aangeroepen met (gelezen, toegevoegd, overgeslagen).
+    Geeft een dictionary met totalen terug.
+    """
+    started = time.perf_counter()
+    source = source or f"Import {mapping.get('label', os.path.basename(path))}"
+    read = inserted = skipped = 0
+    use_rollup = has_rollup_triggers(conn)
+    use_search = has_search_index(conn)
+    use_journal = has_change_journal(conn)
+
+    for frame in read_batches(path, mapping, batch_size):
+        read += len(frame)
+        batch = validate_batch(frame, mapping)
+        batch = batch.drop_duplicates('ts')
+
+        if len(batch):
+            # Bestaande tijdstempels in het bereik van deze batch, in main en de jaararchieven
+            # die dat bereik raken (range scan op idx_ts_id)
+            existing = {row[0] for row in readings_between(
+                conn, "ts", int(batch['ts'].min()), int(batch['ts'].max()), directory=archive_dir)}
+            if existing:
+                batch = batch[~batch['ts'].isin(existing)]
+
+        if len(batch):
+            insert_batch(conn, batch, source, use_rollup, use_search, use_journal)
+
+        inserted += len(batch)
+        skipped = read - inserted
+        if progress:
+            progress(read, inserted, skipped)
+
+    seconds = time.perf_counter() - started
+    print(f"📥 Import voltooid: {inserted} metingen toegevoegd, {skipped} overgeslagen ({seconds:.1f} s)")
+    return {'read': read, 'inserted': inserted, 'skipped': skipped, 'seconds': seconds}
+
+
+class ImportManager:
+    """Voert een import uit op een achtergrond thread met een eigen connectie"""
+
+    def __init__(self, root, db_path='diabetes_data.db', storage_mode='wal', poll_interval=100):
+        self.root = root
+        self.db_path = db_path
+        self.storage_mode = storage_mode
+        self.poll_interval = poll_interval
+        self.events = queue.Queue()
+        self.thread = None
+
+    def is_running(self):
+        """Controleer of er een import bezig is"""
+        return self.thread is not None and self.thread.is_alive()
+
+    def start_import(self, path, mapping, progress=None, callback=None, error_callback=None):
+        """Start een import; progress, callback en error_callback lopen op de Tk thread"""
+        if self.is_running():
+            return False
+
+        def run():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                apply_storage_mode(conn, self.storage_mode)
+                result = import_readings(
+                    conn, path, mapping,
+                    progress=lambda *counts: self.events.put(('progress', counts)),
+                    archive_dir=os.path.dirname(os.path.abspath(self.db_path))
+                )
+                self.events.put(('done', result))
+            except Exception as e:
+                print(f"❌ Import mislukt: {e}")
+                self.events.put(('error', e))
+            finally:
+                conn.close()
+
+        self.thread = threading.Thread(target=run, name="ImportManager")
+        self.thread.daemon = True
+        self.thread.start()
+        self.root.after(self.poll_interval, self._poll, progress, callback, error_callback)
+        return True
+
+    def _poll(self, progress, callback, error_callback):
+        """Lever voortgang en resultaat af op de Tk thread"""
+        finished = False
+        try:
+            while True:
+                event, value = self.events.get_nowait()
+                if event == 'progress':
+                    if progress:
+                        progress(*value)
+                elif event == 'done':
+                    finished = True
+                    if callback:
+                        callback(value)
+                else:
+                    finished = True
+                    if error_callback:
+                        error_callback(value)
+        except queue.Empty:
+            pass
+
+        if not finished:
+            self.root.after(self.poll_interval, self._poll, progress, callback, error_callback)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Data Laag voor Diabetes Tracker
+Eén connectie naar diabetes_data.db met patient_data.db gekoppeld als schema 'patient',
+zodat metingen, medicatie en compliance in één SQL join gecombineerd kunnen worden
+"""
+
+from connection_manager import connections, get_connection, DIABETES_DB, PATIENT_DB
+from timestamps import TS_SQL, to_ts
+from compliance import adherence
+
+PATIENT_SCHEMA = 'patient'
+LAST_DAY = '9999-12-31'
+
+# Moment van een dosis als ts (scheduled_time is HH:MM), vergelijkbaar met bloedwaarden.ts
+DOSE_TS = TS_SQL.format(datum='s.date', tijd='s.scheduled_time')
+
+# Elke connectie naar diabetes_data.db die de manager opent krijgt patient_data.db gekoppeld
+connections.attach(DIABETES_DB, PATIENT_SCHEMA, PATIENT_DB)
+
+
+def is_attached(conn, schema=PATIENT_SCHEMA):
+    """Controleer of schema aan deze connectie gekoppeld is"""
+    return any(row[1] == schema for row in conn.execute("PRAGMA database_list"))
+
+
+def get_data_connection():
+    """Connectie van deze thread naar diabetes_data.db met het patient schema gekoppeld"""
+    conn = get_connection(DIABETES_DB)
+    if not is_attached(conn):
+        # Connectie was al geopend voordat de koppeling geregistreerd werd
+        conn.execute(f"ATTACH DATABASE ? AS {PATIENT_SCHEMA}", (PATIENT_DB,))
+    return conn
+
+
+def get_patient(conn, patient_id):
+    """(first_name, last_name, weight, blood_group) van een patiënt, of None"""
+    return conn.execute('''
+        SELECT first_name, last_name, weight, blood_group
+        FROM patient.patients
+        WHERE id = ?
+    ''', (patient_id,)).fetchone()
+
+
+def readings_since(conn, since_date):
+    """(bloedwaarde, datum, insuline_ingenomen, insuline_vergeten) vanaf een datum, nieuwste eerst"""
+    return conn.execute('''
+        SELECT bloedwaarde, datum, insuline_ingenomen, insuline_vergeten
+        FROM bloedwaarden
+        WHERE ts >= ?
+        ORDER BY ts DESC
+    ''', (to_ts(since_date),)).fetchall()
+
+
+def compliance_summary(conn, patient_id, since_date, end_date=LAST_DAY):
+    """(totaal, genomen, gemist) doses van een patiënt in een datumbereik (uit compliance_rollup)"""
+    return adherence(conn, patient_id, since_date, end_date, schema=PATIENT_SCHEMA)
+
+
+def glucose_after_doses(conn, patient_id, start_date, end_date=LAST_DAY, hours=4, high=180):
+    """Glucose in de uren na genomen en gemiste doses, in één join over beide databases
+
+    Per dosis is de join een range scan op idx_ts_covering. Geeft een dictionary met
+    'taken' en 'missed', elk met doses, readings, mean, min, max en high (aantal > high).
+    """
+    rows = conn.execute(f'''
+        WITH doses AS (
+            SELECT s.id, s.missed, {DOSE_TS} AS dose_ts
+            FROM patient.medication_schedule s
+            WHERE s.patient_id = ? AND s.date BETWEEN ? AND ? AND (s.taken = 1 OR s.missed = 1)
+        )
+        SELECT d.missed, COUNT(DISTINCT d.id), COUNT(b.bloedwaarde), AVG(b.bloedwaarde),
+               MIN(b.bloedwaarde), MAX(b.bloedwaarde), TOTAL(b.bloedwaarde > ?)
+        FROM doses d
+        LEFT JOIN main.bloedwaarden b ON b.ts BETWEEN d.dose_ts AND d.dose_ts + ?
+        GROUP BY d.missed
+    ''', (patient_id, start_date, end_date, high, hours * 3600)).fetchall()
+
+    result = {}
+    for missed, doses, readings, mean, minimum, maximum, high_count in rows:
+        result['missed' if missed else 'taken'] = {
+            'doses': doses,
+            'readings': readings,
+            'mean': mean,
+            'min': minimum,
+            'max': maximum,
+            'high': int(high_count),
+        }
+    return result
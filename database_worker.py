@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Database Worker voor Diabetes Tracker
+Voert alle database opdrachten uit op een aparte thread zodat de Tk mainloop niet blokkeert
+"""
+
+import sqlite3
+import threading
+import queue
+import time
+from collections import deque
+
+from query_stats import InstrumentedConnection
+
+# Opslag modi: pragmas per connectie en group commit instellingen voor de worker
+# - default: rollback journal, elke schrijfopdracht wordt direct gecommit
+# - wal: write-ahead log zodat lezers niet blokkeren, synchronous=NORMAL en group commits
+STORAGE_MODES = {
+    'default': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'flush_delay_ms': 0,
+        'max_batch': 1,
+    },
+    'wal': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'flush_delay_ms': 200,  # maximale vertraging voordat een batch gecommit wordt
+        'max_batch': 500,
+    },
+}
+
+
+def apply_storage_mode(conn, mode='wal'):
+    """Zet journal mode en synchronous niveau op een connectie"""
+    settings = STORAGE_MODES.get(mode, STORAGE_MODES['default'])
+    journal_mode = conn.execute(f"PRAGMA journal_mode={settings['journal_mode']}").fetchone()[0]
+    conn.execute(f"PRAGMA synchronous={settings['synchronous']}")
+    if journal_mode.upper() == 'WAL':
+        # Checkpoint regelmatig zodat het WAL bestand klein blijft
+        conn.execute("PRAGMA wal_autocheckpoint=1000")
+    return journal_mode
+
+
+class DatabaseWorker:
+    """Aparte thread die de database connectie bezit en opdrachten uit een wachtrij uitvoert"""
+
+    def __init__(self, root, db_path='diabetes_data.db', poll_interval=50, slow_job_ms=250,
+                 storage_mode='wal'):
+        self.root = root
+        self.db_path = db_path
+        self.poll_interval = poll_interval  # ms tussen controles op resultaten
+        self.slow_job_ms = slow_job_ms  # opdrachten trager dan dit worden gelogd
+        self.storage_mode = storage_mode if storage_mode in STORAGE_MODES else 'default'
+
+        settings = STORAGE_MODES[self.storage_mode]
+        self.flush_delay = settings['flush_delay_ms'] / 1000.0
+        self.max_batch = settings['max_batch']
+
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.conn = None
+        self.thread = None
+        self.running = False
+
+        # Group commit status (alleen op de worker thread gebruikt)
+        self.pending_writes = []  # (callback, error_callback, resultaat) wachtend op commit
+        self.flush_deadline = None
+
+        # Statistieken
+        self.stats_lock = threading.Lock()
+        self.jobs_done = 0
+        self.jobs_failed = 0
+        self.max_queue_depth = 0
+        self.commits = 0
+        self.committed_writes = 0
+        self.latencies = deque(maxlen=500)  # (label, wachttijd ms, uitvoertijd ms)
+
+    def start(self):
+        """Start de worker thread"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="DatabaseWorker")
+        self.thread.daemon = True
+        self.thread.start()
+        self.root.after(self.poll_interval, self._poll_results)
+        print(f"✅ Database worker gestart (opslag modus: {self.storage_mode})")
+
+    def stop(self, timeout=5):
+        """Stop de worker na het afwerken van de wachtrij"""
+        if not self.running:
+            return
+        self.jobs.put(None)
+        self.thread.join(timeout)
+        self.running = False
+
+    def submit(self, job, callback=None, error_callback=None, label=None, kind='job'):
+        """Plaats een opdracht in de wachtrij
+
+        job is een functie die de connectie krijgt en een resultaat teruggeeft.
+        callback en error_callback worden op de Tk thread aangeroepen.
+        kind is 'read' (alleen lezen), 'write' (wordt gebundeld in een group commit)
+        of 'job' (openstaande schrijfopdrachten worden eerst gecommit).
+        """
+        self.jobs.put((job, callback, error_callback, label or getattr(job, '__name__', 'job'),
+                       kind, time.perf_counter()))
+        depth = self.jobs.qsize()
+        with self.stats_lock:
+            if depth > self.max_queue_depth:
+                self.max_queue_depth = depth
+
+    def read(self, sql, params=(), callback=None, error_callback=None, label=None):
+        """Voer een SELECT uit en lever alle rijen af aan de callback"""
+        def job(conn):
+            return conn.execute(sql, params).fetchall()
+        self.submit(job, callback, error_callback, label or "read", kind='read')
+
+    def write(self, sql, params=(), callback=None, error_callback=None, label=None):
+        """Voer een schrijfopdracht uit en lever (lastrowid, rowcount) af na de commit"""
+        def job(conn):
+            cursor = conn.execute(sql, params)
+            return cursor.lastrowid, cursor.rowcount
+        self.submit(job, callback, error_callback, label or "write", kind='write')
+
+    def flush(self, callback=None):
+        """Forceer een commit van alle gebundelde schrijfopdrachten"""
+        self.submit(lambda conn: True, callback, None, "flush")
+
+    def is_idle(self):
+        """Geen opdrachten in de wachtrij en geen schrijfopdrachten die op een commit wachten"""
+        return self.jobs.qsize() == 0 and not self.pending_writes
+
+    def get_stats(self):
+        """Geef wachtrij diepte, group commit en latency statistieken"""
+        with self.stats_lock:
+            latencies = list(self.latencies)
+            stats = {
+                'storage_mode': self.storage_mode,
+                'queue_depth': self.jobs.qsize(),
+                'max_queue_depth': self.max_queue_depth,
+                'jobs_done': self.jobs_done,
+                'jobs_failed': self.jobs_failed,
+                'commits': self.commits,
+                'writes_per_commit': (self.committed_writes / self.commits) if self.commits else 0,
+            }
+
+        if latencies:
+            run_times = sorted(entry[2] for entry in latencies)
+            wait_times = sorted(entry[1] for entry in latencies)
+            stats['avg_run_ms'] = sum(run_times) / len(run_times)
+            stats['max_run_ms'] = run_times[-1]
+            stats['p95_run_ms'] = run_times[min(len(run_times) - 1, int(len(run_times) * 0.95))]
+            stats['avg_wait_ms'] = sum(wait_times) / len(wait_times)
+            stats['max_wait_ms'] = wait_times[-1]
+            stats['last_job'] = latencies[-1][0]
+        return stats
+
+    def _connect(self):
+        """Open de connectie op de worker thread"""
+        # isolation_level=None: de worker beheert zelf BEGIN/COMMIT voor group commits
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, factory=InstrumentedConnection)
+        apply_storage_mode(conn, self.storage_mode)
+        return conn
+
+    def _run(self):
+        """Hoofdlus van de worker thread"""
+        self.conn = self._connect()
+        while True:
+            if self.pending_writes and time.perf_counter() >= self.flush_deadline:
+                # Begrensde vertraging, ook als er continu opdrachten binnenkomen
+                self._commit_pending()
+
+            if self.pending_writes:
+                timeout = max(0.0, self.flush_deadline - time.perf_counter())
+            else:
+                timeout = None
+
+            try:
+                item = self.jobs.get(timeout=timeout)
+            except queue.Empty:
+                # Flush vertraging verstreken
+                self._commit_pending()
+                continue
+
+            if item is None:
+                break
+            self._execute(*item)
+        self._commit_pending()
+        self.conn.close()
+
+    def _execute(self, job, callback, error_callback, label, kind, queued_at):
+        """Voer één opdracht uit en meet wachttijd en uitvoertijd"""
+        if kind == 'job':
+            # Algemene opdrachten kunnen de connectie sluiten of zelf committen
+            self._commit_pending()
+
+        started = time.perf_counter()
+        try:
+            if kind == 'write':
+                result = self._execute_write(job)
+            else:
+                result = job(self.conn)
+            failed = False
+        except Exception as e:
+            if kind != 'write' and not self.pending_writes:
+                self._rollback()
+            result = e
+            failed = True
+        finished = time.perf_counter()
+
+        wait_ms = (started - queued_at) * 1000
+        run_ms = (finished - started) * 1000
+        with self.stats_lock:
+            self.latencies.append((label, wait_ms, run_ms))
+            if failed:
+                self.jobs_failed += 1
+            else:
+                self.jobs_done += 1
+
+        if run_ms > self.slow_job_ms or wait_ms > self.slow_job_ms:
+            print(f"⚠️ Trage database opdracht '{label}': wacht {wait_ms:.0f} ms, uitvoer {run_ms:.0f} ms")
+
+        if failed:
+            self._deliver(None, error_callback, result, label)
+        elif kind == 'write':
+            # Callback pas na de commit afleveren
+            self.pending_writes.append((callback, error_callback, result, label))
+            if len(self.pending_writes) == 1:
+                self.flush_deadline = time.perf_counter() + self.flush_delay
+            if len(self.pending_writes) >= self.max_batch or self.flush_delay <= 0:
+                self._commit_pending()
+        else:
+            self._deliver(callback, None, result, label)
+
+    def _execute_write(self, job):
+        """Voer een schrijfopdracht uit binnen de lopende batch transactie"""
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN IMMEDIATE")
+        # Savepoint per opdracht: een mislukte opdracht maakt de rest van de batch niet ongedaan
+        self.conn.execute("SAVEPOINT worker_write")
+        try:
+            result = job(self.conn)
+        except Exception:
+            self.conn.execute("ROLLBACK TO worker_write")
+            self.conn.execute("RELEASE worker_write")
+            if not self.pending_writes:
+                self._rollback()
+            raise
+        self.conn.execute("RELEASE worker_write")
+        return result
+
+    def _commit_pending(self):
+        """Commit de openstaande batch en lever de callbacks af"""
+        if not self.pending_writes:
+            if self.conn is not None and self.conn.in_transaction:
+                self._rollback()
+            return
+
+        batch = self.pending_writes
+        self.pending_writes = []
+        self.flush_deadline = None
+        try:
+            self.conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            self._rollback()
+            for callback, error_callback, result, label in batch:
+                self._deliver(None, error_callback, e, label)
+            return
+
+        with self.stats_lock:
+            self.commits += 1
+            self.committed_writes += len(batch)
+        for callback, error_callback, result, label in batch:
+            self._deliver(callback, None, result, label)
+
+    def _rollback(self):
+        """Draai een lopende transactie terug"""
+        try:
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+        except sqlite3.Error:
+            pass
+
+    def _deliver(self, callback, error_callback, result, label):
+        """Zet een resultaat klaar voor de Tk thread"""
+        if error_callback is not None:
+            self.results.put((error_callback, result))
+        elif callback is not None:
+            self.results.put((callback, result))
+        elif isinstance(result, Exception):
+            print(f"❌ Database opdracht '{label}' mislukt: {result}")
+
+    def _poll_results(self):
+        """Lever resultaten af op de Tk thread via root.after"""
+        try:
+            while True:
+                callback, result = self.results.get_nowait()
+                try:
+                    callback(result)
+                except Exception as e:
+                    print(f"❌ Fout in database callback: {e}")
+        except queue.Empty:
+            pass
+
+        if self.running:
+            self.root.after(self.poll_interval, self._poll_results)
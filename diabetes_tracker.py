@@ -24,11 +24,34 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from reportlab.lib.units import inch
 import seaborn as sns
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import StandardScaler
 import warnings
+from database_worker import DatabaseWorker
+from connection_manager import connections, get_connection, DIABETES_DB, PATIENT_DB
+from timestamps import to_ts, day_range
+from migrations import MigrationEngine, BLOEDWAARDEN_MIGRATIONS
+from backup_manager import BackupManager, online_backup, restore_backup, backup_filename
+from backup_store import BackupStore
+from history_view import VirtualHistoryView, HISTORY_COLUMNS
+from data_import import ImportManager, load_mappings
+from rollups import summarize, summarize_detailed, SUMMARY_SQL, LAST_DAY
+from data_layer import get_data_connection, glucose_after_doses
+from reading_medications import store_reading_medications, medication_summary
+from search import search_readings
+from archive import archive_old_readings, readings_between
+from compliance import record_dose, clear_dose, adherence, adherence_windows
+from change_journal import net_changes, get_watermark, set_watermark
+from query_stats import query_stats
+from maintenance import MaintenanceScheduler, recent_log, log_step
+from online_model import IncrementalLinearModel, time_features, moment_features
+from model_cache import data_fingerprint, save_model, load_model
+from analysis_frame import AnalysisFrameCache, GLUCOSE, WEIGHT
+from glycemic_metrics import glycemic_metrics, metrics_per_window, format_metrics, STABLE_CV
 warnings.filterwarnings('ignore')
 
+# Kolommen voor export, statistieken en analyse (zelfde volgorde als de geschiedenis tabel)
+EXPORT_COLUMNS = ("datum, tijd, bloedwaarde, medicatie, activiteit, gewicht, opmerkingen, medicatie_hoeveelheid, "
+                  "insuline_ingenomen, insuline_vergeten")
+
 # Import update system
 try:
     from update_system import UpdateSystem
@@ -240,138 +263,156 @@ class NotificationManager:
 class AIAnalytics:
     """Geavanceerde AI analytics voor diabetes tracking"""
     
+    FEATURES = ['Dag_van_week', 'Dag_van_maand', 'Maand', 'Uur', 'Minuten']
+    MODEL_NAME = 'bloedwaarde_tijd'  # naam in de model cache
+    REFIT_AFTER = 500  # incrementele wijzigingen waarna een exacte fit afwijkingen rechtzet
+    
     def __init__(self):
-        self.model = LinearRegression()
-        self.scaler = StandardScaler()
-        self.is_trained = False
-        
-    def prepare_data(self, data):
-        """Bereid data voor voor AI analyse"""
-        if not data:
+        self.model = IncrementalLinearModel(len(self.FEATURES))
+    
+    @property
+    def is_trained(self):
+        return self.model.n >= 5
+    
+    @property
+    def needs_refit(self):
+        return self.model.updates_since_fit >= self.REFIT_AFTER
+    
+    def prepare_data(self, df):
+        """Bereid data voor voor AI analyse (df is de analyse frame, zie analysis_frame.py)"""
+        if df is None or len(df) < 5:
             return None, None
         
-        df = pd.DataFrame(data, columns=[
-            'Datum', 'Tijd', 'Bloedwaarde (mg/dL)', 'Medicatie', 
-            'Activiteit', 'Gewicht (kg)', 'Opmerkingen', 'Insuline Advies', 'Insuline ingenomen', 'Insuline vergeten'
-        ])
-        
-        # Converteer datum naar numerieke waarden
-        df['Datum'] = pd.to_datetime(df['Datum'])
-        df['Dag_van_week'] = df['Datum'].dt.dayofweek
-        df['Dag_van_maand'] = df['Datum'].dt.day
-        df['Maand'] = df['Datum'].dt.month
-        
-        # Converteer tijd naar numerieke waarden
-        df['Tijd'] = pd.to_datetime(df['Tijd'], format='%H:%M')
-        df['Uur'] = df['Tijd'].dt.hour
-        df['Minuten'] = df['Tijd'].dt.minute
-        
-        # Converteer bloedwaarden naar float
-        df['Bloedwaarde (mg/dL)'] = pd.to_numeric(df['Bloedwaarde (mg/dL)'], errors='coerce')
-        
         # Verwijder rijen met ontbrekende bloedwaarden
-        df = df.dropna(subset=['Bloedwaarde (mg/dL)'])
+        df = df.dropna(subset=[GLUCOSE])
         
         if len(df) < 5:
             return None, None
         
-        # Features voor voorspelling
-        features = ['Dag_van_week', 'Dag_van_maand', 'Maand', 'Uur', 'Minuten']
-        X = df[features]
-        y = df['Bloedwaarde (mg/dL)']
+        # Features voor voorspelling uit de datetime64 kolom, zonder strings te parsen
+        moments = df['Tijdstip'].dt
+        X = pd.DataFrame({
+            'Dag_van_week': moments.dayofweek,
+            'Dag_van_maand': moments.day,
+            'Maand': moments.month,
+            'Uur': moments.hour,
+            'Minuten': moments.minute,
+        }, index=df.index)[self.FEATURES]
+        y = df[GLUCOSE].astype(float)
         
         return X, y
     
-    def train_model(self, data):
-        """Train AI model op historische data"""
-        X, y = self.prepare_data(data)
+    def train_model(self, df):
+        """Train AI model op historische data (de analyse frame)"""
+        X, y = self.prepare_data(df)
         
         if X is None or len(X) < 5:
             return False
         
         try:
-            # Scale features
-            X_scaled = self.scaler.fit_transform(X)
-            
-            # Train model
-            self.model.fit(X_scaled, y)
-            self.is_trained = True
-            
+            self.model.fit(X.to_numpy(), y.to_numpy())
             return True
         except Exception as e:
             print(f"AI training error: {e}")
             return False
     
+    @staticmethod
+    def fit_readings(rows):
+        """Nieuw model, exact gefit op (ts, bloedwaarde) rijen (geschikt voor de database worker)"""
+        model = IncrementalLinearModel(len(AIAnalytics.FEATURES))
+        rows = [(ts, value) for ts, value in rows if ts is not None and value is not None]
+        if rows:
+            ts, values = zip(*rows)
+            model.fit(time_features(ts), values)
+        return model
+    
+    def learn_readings(self, rows):
+        """Verwerk nieuwe (ts, bloedwaarde) metingen in O(1) per meting"""
+        rows = [(ts, value) for ts, value in rows if ts is not None and value is not None]
+        if rows:
+            ts, values = zip(*rows)
+            self.model.add(time_features(ts), values)
+    
+    def forget_readings(self, rows):
+        """Haal verwijderde (ts, bloedwaarde) metingen uit het model"""
+        rows = [(ts, value) for ts, value in rows if ts is not None and value is not None]
+        if rows:
+            ts, values = zip(*rows)
+            self.model.remove(time_features(ts), values)
+    
+    def predict_many(self, timestamps):
+        """Voorspel bloedwaarden voor een reeks tijdstippen in één keer
+
+        timestamps zijn datetime waarden (DatetimeIndex, datetime64 array, lijst) of ts gehele
+        getallen (wandklok als UTC, zie timestamps.py). De feature matrix wordt in één
+        gevectoriseerde stap opgebouwd. Geeft een numpy array in mg/dL, nooit negatief.
+        Zonder getraind model volgt een ValueError.
+        """
+        if not self.is_trained:
+            raise ValueError("AI model niet getraind")
+        
+        values = np.atleast_1d(np.asarray(timestamps))
+        if np.issubdtype(values.dtype, np.number):
+            features = time_features(values)
+        else:
+            features = moment_features(pd.DatetimeIndex(pd.to_datetime(values)))
+        
+        # Bloedwaarde kan niet negatief zijn
+        return np.maximum(self.model.predict(features), 0)
+    
+    def forecast(self, start, hours=24, step_minutes=5):
+        """Voorspelde curve vanaf start: (DatetimeIndex, numpy array) met een punt per step_minutes"""
+        moments = pd.date_range(pd.Timestamp(start), periods=hours * 60 // step_minutes, freq=f"{step_minutes}min")
+        return moments, self.predict_many(moments)
+    
     def predict_blood_value(self, date, time):
         """Voorspel bloedwaarde voor gegeven datum/tijd"""
         if not self.is_trained:
             return None
         
         try:
-            # Converteer datum en tijd
-            dt = pd.to_datetime(f"{date} {time}")
-            
-            # Maak features
-            features = np.array([[
-                dt.dayofweek,
-                dt.day,
-                dt.month,
-                dt.hour,
-                dt.minute
-            ]])
-            
-            # Scale features
-            features_scaled = self.scaler.transform(features)
-            
-            # Voorspelling
-            prediction = self.model.predict(features_scaled)[0]
-            
-            return max(0, prediction)  # Bloedwaarde kan niet negatief zijn
-            
+            return float(self.predict_many([pd.to_datetime(f"{date} {time}")])[0])
         except Exception as e:
             print(f"AI prediction error: {e}")
             return None
     
-    def analyze_trends(self, data):
-        """Analyseer trends in bloedwaarden"""
-        if not data:
+    def analyze_trends(self, df):
+        """Analyseer trends in bloedwaarden (df is de analyse frame)"""
+        if df is None or df.empty:
             return {}
         
-        df = pd.DataFrame(data, columns=[
-            'Datum', 'Tijd', 'Bloedwaarde (mg/dL)', 'Medicatie', 
-            'Activiteit', 'Gewicht (kg)', 'Opmerkingen', 'Insuline Advies', 'Insuline ingenomen', 'Insuline vergeten'
-        ])
-        
-        df['Bloedwaarde (mg/dL)'] = pd.to_numeric(df['Bloedwaarde (mg/dL)'], errors='coerce')
-        df = df.dropna(subset=['Bloedwaarde (mg/dL)'])
+        df = df.dropna(subset=[GLUCOSE])
         
         if len(df) < 3:
             return {}
         
-        analysis = {}
+        # Standaard glykemische metrieken over de hele reeks (zie glycemic_metrics.py)
+        values = df[GLUCOSE].to_numpy(dtype=float)
+        metrics = glycemic_metrics(values)
+        if not metrics:
+            return {}
+        analysis = {'metrics': metrics}
         
         # Dagelijkse trends
-        df['Datum'] = pd.to_datetime(df['Datum'])
-        daily_avg = df.groupby(df['Datum'].dt.date)['Bloedwaarde (mg/dL)'].mean()
+        ts = df['Tijdstip'].to_numpy().astype('datetime64[s]').astype('int64')
+        daily_avg = metrics_per_window(ts, values, with_mage=False).get('mean', [])
         if len(daily_avg) > 1:
-            analysis['daily_trend'] = 'stijgend' if daily_avg.iloc[-1] > daily_avg.iloc[0] else 'dalend'
-            analysis['daily_change'] = daily_avg.iloc[-1] - daily_avg.iloc[0]
+            analysis['daily_trend'] = 'stijgend' if daily_avg[-1] > daily_avg[0] else 'dalend'
+            analysis['daily_change'] = daily_avg[-1] - daily_avg[0]
         
         # Risico analyse
-        high_values = df[df['Bloedwaarde (mg/dL)'] > 180]
-        low_values = df[df['Bloedwaarde (mg/dL)'] < 70]
-        
-        analysis['high_risk_percentage'] = (len(high_values) / len(df)) * 100
-        analysis['low_risk_percentage'] = (len(low_values) / len(df)) * 100
+        analysis['high_risk_percentage'] = metrics['high'] + metrics['very_high']
+        analysis['low_risk_percentage'] = metrics['low'] + metrics['very_low']
         
-        # Stabiliteit
-        analysis['stability'] = 'stabiel' if df['Bloedwaarde (mg/dL)'].std() < 30 else 'instabiel'
+        # Stabiliteit op basis van de variatiecoëfficiënt
+        analysis['stability'] = 'stabiel' if metrics['cv'] < STABLE_CV else 'instabiel'
         
         return analysis
     
-    def get_ai_recommendations(self, data):
-        """Krijg AI-gebaseerde aanbevelingen"""
-        analysis = self.analyze_trends(data)
+    def get_ai_recommendations(self, df, analysis=None):
+        """Krijg AI-gebaseerde aanbevelingen (een al berekende analyse wordt hergebruikt)"""
+        if analysis is None:
+            analysis = self.analyze_trends(df)
         recommendations = []
         
         if analysis.get('high_risk_percentage', 0) > 20:
@@ -402,15 +443,29 @@ class DiabetesTracker:
         self.config = {
             'auto_backup': True,
             'backup_interval': 7,  # dagen
+            'backup_retention': {'daily': 7, 'weekly': 4, 'monthly': 12},  # snapshots per periode
             'max_records_display': 100,
+            'archive_after_days': 730,  # oudere metingen naar jaararchieven (0 = uit)
+            'slow_query_ms': 50,  # queries trager dan dit komen met query plan in de log
+            'maintenance_enabled': True,  # optimize, ANALYZE, quick_check en vacuum als de app stil staat
             'auto_save': True,
             'notifications_enabled': True,
-            'ai_analytics_enabled': True
+            'ai_analytics_enabled': True,
+            'storage_mode': 'wal'  # 'wal' (group commits) of 'default'
         }
         
         # Database initialisatie
+        query_stats.slow_query_ms = self.config['slow_query_ms']
         self.init_database()
         
+        # Database worker - alle queries voor de UI lopen via deze thread
+        self.db_worker = DatabaseWorker(self.root, storage_mode=self.config['storage_mode'])
+        self.db_worker.start()
+        self.backup_manager = BackupManager(self.root)
+        self.backup_store = BackupStore(retention=self.config['backup_retention'])
+        self.import_manager = ImportManager(self.root, storage_mode=self.config['storage_mode'])
+        self.maintenance = MaintenanceScheduler(self.root, self.db_worker)
+        
         # Patiënten management - initialiseer database direct
         if PATIENT_MANAGEMENT_AVAILABLE:
             self.patient_profile = PatientProfile(self.root)
@@ -421,6 +476,7 @@ class DiabetesTracker:
         # Nieuwe features initialisatie
         self.notification_manager = NotificationManager(self.root)
         self.ai_analytics = AIAnalytics()
+        self.analysis_cache = AnalysisFrameCache()
         
         # Update systeem
         if UPDATE_SYSTEM_AVAILABLE:
@@ -462,9 +518,32 @@ class DiabetesTracker:
         # Start backup scheduler
         self.schedule_backup()
         
+        # Oude metingen naar jaararchieven
+        self.schedule_archiving()
+        
+        # Database onderhoud tijdens stille periodes
+        self.maintenance.enabled = self.config['maintenance_enabled']
+        self.maintenance.start()
+        
+        # Eerste exacte fit van het AI model; daarna incrementeel
+        self.train_ai_model()
+        
+        # Netjes afsluiten zodat de worker zijn wachtrij kan afwerken
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
         # Welkom bericht
         self.update_status("Applicatie geladen - Klaar voor gebruik")
     
+    def on_close(self):
+        """Sluit de applicatie af na het afwerken van openstaande database opdrachten"""
+        try:
+            self.save_ai_model()
+            self.db_worker.stop()
+        except Exception as e:
+            print(f"⚠️ Database worker stoppen mislukt: {e}")
+        connections.close_all()
+        self.root.destroy()
+    
     def create_menu(self):
         """Maak menu bar"""
         menubar = tk.Menu(self.root)
@@ -475,16 +554,22 @@ class DiabetesTracker:
         menubar.add_cascade(label="Bestand", menu=file_menu)
         file_menu.add_command(label="Backup Database", command=self.backup_database)
         file_menu.add_command(label="Herstel Database", command=self.restore_database)
+        file_menu.add_command(label="Herstel Laatste Automatische Backup", command=self.restore_latest_snapshot)
         file_menu.add_separator()
+        file_menu.add_command(label="Importeer CGM/Meter Data", command=self.import_data)
         file_menu.add_command(label="Export Alle Data", command=self.export_all_data)
+        file_menu.add_command(label="Export Wijzigingen sinds Vorige Export", command=self.export_changes)
         file_menu.add_separator()
-        file_menu.add_command(label="Afsluiten", command=self.root.quit)
+        file_menu.add_command(label="Afsluiten", command=self.on_close)
         
         # Beheer menu
         manage_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Beheer", menu=manage_menu)
         manage_menu.add_command(label="Database Optimaliseren", command=self.optimize_database)
         manage_menu.add_command(label="Configuratie", command=self.show_config)
+        manage_menu.add_command(label="Database Worker Status", command=self.show_worker_stats)
+        manage_menu.add_command(label="Query Diagnostiek", command=self.show_query_diagnostics)
+        manage_menu.add_command(label="Onderhoudslog", command=self.show_maintenance_log)
         manage_menu.add_separator()
         manage_menu.add_command(label="Statistieken", command=self.show_statistics)
         manage_menu.add_command(label="🤖 AI Analytics", command=self.show_ai_analytics)
@@ -510,21 +595,28 @@ class DiabetesTracker:
     
     def backup_database(self):
         """Maak backup van database"""
+        def on_progress(done, total):
+            percentage = (done / total * 100) if total else 100
+            self.update_status(f"Backup maken... {percentage:.0f}%")
+        
+        def on_done(result):
+            self.update_status("Backup succesvol gemaakt!")
+            messagebox.showinfo("Backup", f"Database backup gemaakt: {os.path.basename(result['path'])}")
+        
+        def on_error(error):
+            messagebox.showerror("Backup Fout", f"Kon geen backup maken: {str(error)}")
+            self.update_status("Backup mislukt")
+        
         try:
             self.update_status("Backup maken...")
             
-            backup_filename = f"diabetes_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
-            
-            # Kopieer database
-            import shutil
-            shutil.copy2('diabetes_data.db', backup_filename)
-            
-            self.update_status("Backup succesvol gemaakt!")
-            messagebox.showinfo("Backup", f"Database backup gemaakt: {backup_filename}")
+            # Online backup op de achtergrond: veilig tijdens schrijfacties en zonder de UI te blokkeren
+            if not self.backup_manager.start_backup(backup_filename('diabetes_backup'), progress=on_progress,
+                                                    callback=on_done, error_callback=on_error):
+                self.update_status("Er loopt al een backup")
             
         except Exception as e:
-            messagebox.showerror("Backup Fout", f"Kon geen backup maken: {str(e)}")
-            self.update_status("Backup mislukt")
+            on_error(e)
     
     def restore_database(self):
         """Herstel database van backup"""
@@ -535,30 +627,92 @@ class DiabetesTracker:
             )
             
             if filename:
-                self.update_status("Database herstellen...")
-                
-                # Sluit huidige connectie
-                self.conn.close()
-                
-                # Kopieer backup
-                import shutil
-                shutil.copy2(filename, 'diabetes_data.db')
-                
-                # Heropen connectie
-                self.conn = sqlite3.connect('diabetes_data.db')
-                self.cursor = self.conn.cursor()
-                
-                # Reload data
-                self.load_data()
-                self.update_overview_stats()
-                
-                self.update_status("Database hersteld!")
-                messagebox.showinfo("Herstel", "Database succesvol hersteld!")
+                self.restore_from_file(filename)
                 
         except Exception as e:
             messagebox.showerror("Herstel Fout", f"Kon database niet herstellen: {str(e)}")
             self.update_status("Herstel mislukt")
     
+    def restore_from_file(self, filename, cleanup=False):
+        """Zet een backup bestand terug in de open database (backup API op de database worker)"""
+        self.update_status("Database herstellen...")
+        
+        # Pagina's overschrijven binnen SQLite: de WAL en alle open connecties blijven geldig
+        def restore_job(conn):
+            return restore_backup(filename, conn)
+        
+        def on_restored(result):
+            if cleanup:
+                os.remove(filename)
+            # Een oudere backup kan een eerdere schema versie hebben
+            self.run_migrations()
+            self.analysis_cache.invalidate()
+            self.load_data()
+            self.update_overview_stats()
+            self.update_status("Database hersteld!")
+            messagebox.showinfo("Herstel", "Database succesvol hersteld!")
+        
+        def on_restore_error(error):
+            messagebox.showerror("Herstel Fout", f"Kon database niet herstellen: {str(error)}")
+            self.update_status("Herstel mislukt")
+        
+        self.db_worker.submit(restore_job, on_restored, on_restore_error, "restore")
+    
+    def import_data(self):
+        """Importeer metingen uit een CGM of meter export (CSV of JSON)"""
+        if self.import_manager.is_running():
+            messagebox.showinfo("Import", "Er loopt al een import.")
+            return
+        
+        filename = filedialog.askopenfilename(
+            title="Selecteer export bestand",
+            filetypes=[("CSV/JSON files", "*.csv *.json *.jsonl"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        
+        mappings = load_mappings()
+        labels = {mapping['label']: name for name, mapping in mappings.items()}
+        
+        import_window = tk.Toplevel(self.root)
+        import_window.title("Importeer Data")
+        import_window.geometry("420x200")
+        import_window.transient(self.root)
+        
+        ttk.Label(import_window, text=f"Bestand: {os.path.basename(filename)}").pack(pady=(15, 5))
+        ttk.Label(import_window, text="Indeling:").pack(pady=5)
+        format_var = tk.StringVar(value=list(labels)[0])
+        ttk.Combobox(import_window, textvariable=format_var, values=list(labels), state='readonly',
+                     width=40).pack()
+        
+        def on_progress(read, inserted, skipped):
+            self.update_status(f"Importeren... {read} gelezen, {inserted} toegevoegd, {skipped} overgeslagen")
+        
+        def on_done(result):
+            self.load_data()
+            self.update_overview_stats()
+            if result['inserted']:
+                self.analysis_cache.invalidate()
+                self.schedule_model_refit()
+            self.update_status("Import voltooid!")
+            messagebox.showinfo("Import", f"Import voltooid in {result['seconds']:.1f} s\n\n"
+                                          f"📥 Gelezen: {result['read']}\n"
+                                          f"✅ Toegevoegd: {result['inserted']}\n"
+                                          f"⏭️ Overgeslagen (ongeldig of dubbel): {result['skipped']}")
+        
+        def on_error(error):
+            messagebox.showerror("Import Fout", f"Kon data niet importeren: {str(error)}")
+            self.update_status("Import mislukt")
+        
+        def start():
+            mapping = mappings[labels[format_var.get()]]
+            import_window.destroy()
+            self.update_status("Importeren...")
+            self.import_manager.start_import(filename, mapping, progress=on_progress,
+                                             callback=on_done, error_callback=on_error)
+        
+        ttk.Button(import_window, text="Start Import", command=start, style='success.TButton').pack(pady=20)
+    
     def export_all_data(self):
         """Export alle data naar Excel"""
         try:
@@ -610,11 +764,66 @@ class DiabetesTracker:
             messagebox.showerror("Export Fout", f"Er is een fout opgetreden: {str(e)}")
             self.update_status("Export mislukt")
     
+    def export_changes(self):
+        """Export alleen de metingen die sinds de vorige wijzigingen export veranderd zijn
+
+        Watermerk en journaal worden op de database worker gelezen; kind='job' zodat openstaande
+        schrijfopdrachten eerst gecommit zijn en in de export meekomen.
+        """
+        def changes_job(conn):
+            watermark = get_watermark(conn, 'excel_export')
+            return net_changes(conn, 'bloedwaarden', f"id, {EXPORT_COLUMNS}", watermark)
+        
+        self.update_status("Wijzigingen ophalen...")
+        self.db_worker.submit(changes_job, callback=lambda result: self.write_changes_export(*result),
+                              error_callback=self.show_db_error, label="export_changes")
+    
+    def write_changes_export(self, changed, deleted, last_seq):
+        """Schrijf de opgehaalde wijzigingen naar Excel en verschuif daarna het watermerk"""
+        try:
+            if not changed and not deleted:
+                self.update_status("Geen wijzigingen sinds de vorige export")
+                messagebox.showinfo("Export", "Geen wijzigingen sinds de vorige export.")
+                return
+            
+            filename = filedialog.asksaveasfilename(
+                defaultextension=".xlsx",
+                filetypes=[("Excel files", "*.xlsx")],
+                title="Export Wijzigingen"
+            )
+            
+            if filename:
+                self.update_status("Wijzigingen exporteren...")
+                df = pd.DataFrame(changed, columns=[
+                    'Id', 'Datum', 'Tijd', 'Bloedwaarde (mg/dL)', 'Medicatie',
+                    'Activiteit', 'Gewicht (kg)', 'Opmerkingen', 'Medicatie Hoeveelheid', 'Insuline ingenomen', 'Insuline vergeten'
+                ])
+                
+                with pd.ExcelWriter(filename, engine='openpyxl') as writer:
+                    df.to_excel(writer, sheet_name='Gewijzigd', index=False)
+                    pd.DataFrame({'Id': deleted}).to_excel(writer, sheet_name='Verwijderd', index=False)
+                
+                # Pas na een geslaagde export verschuift het watermerk
+                def on_watermark(result):
+                    self.update_status("Wijzigingen geëxporteerd!")
+                    messagebox.showinfo("Export", f"{len(changed)} gewijzigde en {len(deleted)} verwijderde metingen "
+                                                  f"geëxporteerd naar {filename}")
+                
+                self.db_worker.submit(lambda conn: set_watermark(conn, 'excel_export', last_seq),
+                                      callback=on_watermark, error_callback=self.show_db_error,
+                                      label="export_changes_watermark")
+            else:
+                self.update_status("Export geannuleerd")
+                
+        except Exception as e:
+            messagebox.showerror("Export Fout", f"Er is een fout opgetreden: {str(e)}")
+            self.update_status("Export mislukt")
+    
     def show_config(self):
         """Toon configuratie venster"""
         config_window = tk.Toplevel(self.root)
         config_window.title("Configuratie")
-        config_window.geometry("400x300")
+        config_window.geometry("400x580")
         
         # Configuratie opties
         ttk.Label(config_window, text="Configuratie Instellingen", font=('Arial', 16, 'bold')).pack(pady=20)
@@ -628,17 +837,47 @@ class DiabetesTracker:
         interval_var = tk.StringVar(value=str(self.config['backup_interval']))
         ttk.Entry(config_window, textvariable=interval_var, width=10).pack()
         
+        # Retentie van automatische backups
+        ttk.Label(config_window, text="Bewaar backups (dagen / weken / maanden):").pack(pady=5)
+        retention_frame = ttk.Frame(config_window)
+        retention_frame.pack()
+        retention_vars = {}
+        for period in ('daily', 'weekly', 'monthly'):
+            retention_vars[period] = tk.StringVar(value=str(self.config['backup_retention'][period]))
+            ttk.Entry(retention_frame, textvariable=retention_vars[period], width=5).pack(side=tk.LEFT, padx=3)
+        
         # Max records
         ttk.Label(config_window, text="Max records in tabel:").pack(pady=5)
         max_records_var = tk.StringVar(value=str(self.config['max_records_display']))
         ttk.Entry(config_window, textvariable=max_records_var, width=10).pack()
         
+        # Archiveren
+        ttk.Label(config_window, text="Archiveer metingen ouder dan (dagen, 0 = uit):").pack(pady=5)
+        archive_var = tk.StringVar(value=str(self.config['archive_after_days']))
+        ttk.Entry(config_window, textvariable=archive_var, width=10).pack()
+        
+        # Onderhoud
+        maintenance_var = tk.BooleanVar(value=self.config['maintenance_enabled'])
+        ttk.Checkbutton(config_window, text="Automatisch database onderhoud", variable=maintenance_var).pack(pady=5)
+        
+        # Trage query drempel
+        ttk.Label(config_window, text="Trage query drempel (ms):").pack(pady=5)
+        slow_query_var = tk.StringVar(value=str(self.config['slow_query_ms']))
+        ttk.Entry(config_window, textvariable=slow_query_var, width=10).pack()
+        
         # Opslaan knop
         def save_config():
             try:
                 self.config['auto_backup'] = auto_backup_var.get()
                 self.config['backup_interval'] = int(interval_var.get())
+                self.config['backup_retention'] = {period: int(var.get()) for period, var in retention_vars.items()}
                 self.config['max_records_display'] = int(max_records_var.get())
+                self.config['archive_after_days'] = max(0, int(archive_var.get()))
+                self.config['slow_query_ms'] = max(1, int(slow_query_var.get()))
+                query_stats.slow_query_ms = self.config['slow_query_ms']
+                self.config['maintenance_enabled'] = maintenance_var.get()
+                self.maintenance.enabled = self.config['maintenance_enabled']
+                self.load_data()
                 config_window.destroy()
                 messagebox.showinfo("Configuratie", "Instellingen opgeslagen!")
             except ValueError:
@@ -649,15 +888,21 @@ class DiabetesTracker:
     def show_statistics(self):
         """Toon gedetailleerde statistieken en grafieken"""
         try:
-            data = self.load_all_data()
+            df = self.load_analysis_frame()
             
-            if not data:
+            if df is None or df.empty:
                 messagebox.showwarning("Waarschuwing", "Geen data beschikbaar voor statistieken.")
                 return
             
-            df = pd.DataFrame(data, columns=[
-                'Datum', 'Tijd', 'Bloedwaarde', 'Medicatie', 'Activiteit', 'Gewicht', 'Opmerkingen', 'Insuline Advies', 'Insuline ingenomen', 'Insuline vergeten'
-            ])
+            # Aggregaten uit de dagelijkse rollup; mediaan en modus vragen de ruwe metingen
+            summary = summarize_detailed(self.conn)
+            
+            # Per medicatie uit de genormaliseerde reading_medications tabel
+            medication_stats = medication_summary(self.conn)
+            most_used = medication_stats[0][0] if medication_stats else 'Geen'
+            medication_lines = "\n".join(
+                f"            • {name}: {count} metingen, gem. {mean:.1f} mg/dL"
+                for name, count, mean, total in medication_stats[:5])
             
             stats_window = tk.Toplevel(self.root)
             stats_window.title("Statistieken & Grafieken")
@@ -676,23 +921,24 @@ class DiabetesTracker:
             📊 GEDETAILLEERDE STATISTIEKEN
             
             📈 Algemene Statistieken:
-            • Totaal aantal metingen: {len(data)}
-            • Periode: {df['Datum'].min()} tot {df['Datum'].max()}
-            • Aantal dagen met metingen: {df['Datum'].nunique()}
+            • Totaal aantal metingen: {summary['count']}
+            • Periode: {summary['first_day']} tot {summary['last_day']}
+            • Aantal dagen met metingen: {summary['days']}
             
             🩸 Bloedwaarden:
-            • Gemiddelde: {df['Bloedwaarde'].mean():.1f} mg/dL
-            • Mediaan: {df['Bloedwaarde'].median():.1f} mg/dL
-            • Hoogste: {df['Bloedwaarde'].max():.1f} mg/dL
-            • Laagste: {df['Bloedwaarde'].min():.1f} mg/dL
-            • Standaardafwijking: {df['Bloedwaarde'].std():.1f} mg/dL
+            • Gemiddelde: {summary['mean']:.1f} mg/dL
+            • Mediaan: {df[GLUCOSE].median():.1f} mg/dL
+            • Hoogste: {summary['max']:.1f} mg/dL
+            • Laagste: {summary['min']:.1f} mg/dL
+            • Standaardafwijking: {summary['std']:.1f} mg/dL
             
             ⚖️ Gewicht (indien beschikbaar):
-            • Gemiddeld gewicht: {df['Gewicht'].mean():.1f} kg
-            • Gewichtsverandering: {df['Gewicht'].max() - df['Gewicht'].min():.1f} kg
+            • Gemiddeld gewicht: {summary['avg_weight'] or float('nan'):.1f} kg
+            • Gewichtsverandering: {df[WEIGHT].max() - df[WEIGHT].min():.1f} kg
             
             💊 Medicatie:
-            • Meest gebruikte medicatie: {df['Medicatie'].mode().iloc[0] if not df['Medicatie'].mode().empty else 'Geen'}
+            • Meest gebruikte medicatie: {most_used}
+{medication_lines}
             
             🏃 Activiteiten:
             • Meest voorkomende activiteit: {df['Activiteit'].mode().iloc[0] if not df['Activiteit'].mode().empty else 'Geen'}
@@ -819,9 +1065,13 @@ class DiabetesTracker:
         • Export naar Excel of PDF
         • Voor aangepaste periode: vul start- en einddatum in
         
-        🗑️ VERWIJDEREN:
-        • Selecteer rij in geschiedenis
-        • Klik "Verwijder Selectie"
+        🔎 ZOEKEN:
+        • Typ in de zoekbalk boven de geschiedenis en druk op Enter
+        • Combineer woorden: hypo AND sport, sport OR wandelen, sport*
+        
+        🗑️ VERWIJDEREN / ✏️ BEWERKEN:
+        • Selecteer een of meer rijen in geschiedenis (Ctrl/Shift)
+        • Klik "Verwijder Selectie" of "Bewerk Selectie"
         
         ⌨️ KEYBOARD SHORTCUTS:
         • Ctrl+S: Meting toevoegen
@@ -868,32 +1118,87 @@ class DiabetesTracker:
         
         messagebox.showinfo("Over", about_text)
     
+    def schedule_archiving(self):
+        """Verplaats oude metingen naar jaararchieven en plan de volgende controle over 24 uur"""
+        days = self.config['archive_after_days']
+        if days > 0:
+            def on_archived(moved):
+                if moved:
+                    self.update_status(f"{sum(moved.values())} oude metingen gearchiveerd "
+                                       f"({', '.join(str(year) for year in moved)})")
+                    self.history_view.reload()
+            
+            self.db_worker.submit(lambda conn: archive_old_readings(conn, days), callback=on_archived,
+                                  error_callback=lambda e: print(f"⚠️ Archiveren mislukt: {e}"),
+                                  label="archive_old_readings")
+        
+        self.root.after(24 * 60 * 60 * 1000, self.schedule_archiving)
+    
     def schedule_backup(self):
         """Plan automatische backup"""
         if self.config['auto_backup']:
-            # Check of backup nodig is
+            # Check of backup nodig is via het manifest van de backup store
             try:
-                backup_files = [f for f in os.listdir('.') if f.startswith('diabetes_backup_')]
-                if not backup_files:
-                    self.backup_database()
+                latest = self.backup_store.latest()
+                if latest is None:
+                    self.create_snapshot()
                 else:
-                    # Check laatste backup datum
-                    latest_backup = max(backup_files)
-                    backup_date = datetime.strptime(latest_backup[15:30], '%Y%m%d_%H%M%S')
+                    backup_date = datetime.strptime(latest['created'], '%Y-%m-%d %H:%M:%S')
                     days_since_backup = (datetime.now() - backup_date).days
                     
                     if days_since_backup >= self.config['backup_interval']:
-                        self.backup_database()
+                        self.create_snapshot()
             except Exception:
                 pass  # Backup mislukt, probeer later opnieuw
         
         # Plan volgende check over 24 uur
         self.root.after(24 * 60 * 60 * 1000, self.schedule_backup)
+    
+    def create_snapshot(self):
+        """Maak een automatische snapshot in de backup store"""
+        def on_done(snapshot):
+            self.update_status(f"Automatische backup gemaakt ({snapshot['new_bytes'] / 1024:.0f} KB nieuw)")
+        
+        def on_error(error):
+            self.update_status(f"Automatische backup mislukt: {error}")
+        
+        self.backup_store.retention.update(self.config['backup_retention'])
+        self.backup_manager.start_snapshot(self.backup_store, callback=on_done, error_callback=on_error)
+    
+    def restore_latest_snapshot(self):
+        """Herstel de database uit de laatste automatische backup"""
+        latest = self.backup_store.latest()
+        if latest is None:
+            messagebox.showinfo("Herstel", "Er zijn nog geen automatische backups.")
+            return
+        
+        if not messagebox.askyesno("Herstel", f"Database herstellen naar de backup van {latest['created']}?\n\n"
+                                              "Huidige gegevens worden overschreven."):
+            return
+        
+        try:
+            restored = self.backup_store.restore_snapshot(latest['id'], 'diabetes_restore.db')
+            self.restore_from_file(restored, cleanup=True)
+        except Exception as e:
+            messagebox.showerror("Herstel Fout", f"Kon database niet herstellen: {str(e)}")
+            self.update_status("Herstel mislukt")
 
     def init_database(self):
         """Database initialisatie met optimalisaties"""
-        self.conn = sqlite3.connect('diabetes_data.db')
+        # WAL modus zodat analytics kunnen lezen terwijl de worker schrijft; de connection
+        # manager zet de pragmas bij het openen
+        connections.storage_mode = self.config['storage_mode']
+        self.conn = get_connection(DIABETES_DB)
         self.cursor = self.conn.cursor()
+        print(f"ℹ️ Database journal mode: {self.conn.execute('PRAGMA journal_mode').fetchone()[0]}")
+        
+        # Nieuwe database: auto_vacuum=INCREMENTAL zetten zolang er nog geen tabellen zijn; de
+        # VACUUM (nodig omdat WAL de header al geschreven heeft) kost dan niets. Zo kan het
+        # geplande onderhoud vrije pagina's teruggeven; bestaande databases zet het onderhoud
+        # één keer om (zie maintenance.py)
+        if not self.conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0]:
+            self.cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            self.cursor.execute('VACUUM')
         
         # Tabel aanmaken als deze nog niet bestaat
         self.cursor.execute('''
@@ -920,122 +1225,74 @@ class DiabetesTracker:
         except sqlite3.Error:
             pass  # Indexes bestaan mogelijk al
         
-        # Veilige database migratie - voeg kolommen toe zonder data verlies
-        self.safe_add_column('insuline_ingenomen', 'INTEGER')
-        self.safe_add_column('insuline_vergeten', 'INTEGER')
-        self.safe_add_column('medicatie_hoeveelheid', 'TEXT')
+        # Veilige database migratie - versioned migraties in de schema_version tabel
+        self.run_migrations()
         
         # Optimaliseer database
         self.cursor.execute('PRAGMA optimize')
         self.conn.commit()
     
-    def safe_add_column(self, column_name, column_type):
-        """Veilig een kolom toevoegen aan de database zonder data verlies"""
+    def run_migrations(self):
+        """Voer openstaande schema migraties uit zonder data verlies"""
         try:
-            # Controleer eerst of de kolom al bestaat
-            self.cursor.execute("PRAGMA table_info(bloedwaarden)")
-            columns = [column[1] for column in self.cursor.fetchall()]
+            engine = MigrationEngine(self.conn)
+            pending = engine.pending(BLOEDWAARDEN_MIGRATIONS)
+            if not pending:
+                print(f"ℹ️ Database schema is actueel (versie {engine.current_version()})")
+                return
             
-            if column_name not in columns:
-                # Maak automatische backup voordat migratie
+            # Maak automatische backup voordat bestaande data gemigreerd wordt
+            self.cursor.execute("SELECT EXISTS(SELECT 1 FROM bloedwaarden)")
+            if self.cursor.fetchone()[0]:
                 self.create_migration_backup()
-                
-                # Maak backup van huidige data
-                self.cursor.execute("SELECT * FROM bloedwaarden")
-                old_data = self.cursor.fetchall()
-                
-                # Voeg kolom toe
-                self.cursor.execute(f"ALTER TABLE bloedwaarden ADD COLUMN {column_name} {column_type}")
-                
-                # Herstel data met nieuwe kolom (NULL waarden voor nieuwe kolom)
-                if old_data:
-                    # Maak nieuwe tabel met gewenste structuur
-                    self.cursor.execute("""
-                        CREATE TABLE bloedwaarden_new (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            datum TEXT NOT NULL,
-                            tijd TEXT NOT NULL,
-                            bloedwaarde REAL NOT NULL,
-                            medicatie TEXT,
-                            activiteit TEXT,
-                            gewicht REAL,
-                            opmerkingen TEXT,
-                            insuline_ingenomen INTEGER,
-                            insuline_vergeten INTEGER,
-                            medicatie_hoeveelheid TEXT
-                        )
-                    """)
-                    
-                    # Kopieer data naar nieuwe tabel
-                    for row in old_data:
-                        # Pas de row aan voor nieuwe structuur
-                        if len(row) == 9:  # Oude structuur zonder medicatie_hoeveelheid
-                            new_row = row + (None,)  # Voeg NULL toe voor medicatie_hoeveelheid
-                        elif len(row) == 8:  # Nog oudere structuur
-                            new_row = row + (None, None)  # Voeg NULL toe voor beide nieuwe kolommen
-                        else:
-                            new_row = row
-                        
-                        self.cursor.execute("""
-                            INSERT INTO bloedwaarden_new 
-                            (datum, tijd, bloedwaarde, medicatie, activiteit, gewicht, opmerkingen, 
-                             insuline_ingenomen, insuline_vergeten, medicatie_hoeveelheid)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """, new_row)
-                    
-                    # Vervang oude tabel
-                    self.cursor.execute("DROP TABLE bloedwaarden")
-                    self.cursor.execute("ALTER TABLE bloedwaarden_new RENAME TO bloedwaarden")
-                
-                self.conn.commit()
-                print(f"✅ Kolom '{column_name}' succesvol toegevoegd")
-            else:
-                print(f"ℹ️ Kolom '{column_name}' bestaat al")
-                
+            
+            engine.migrate(BLOEDWAARDEN_MIGRATIONS)
+            if engine.error is not None:
+                raise engine.error
         except Exception as e:
-            print(f"⚠️ Fout bij toevoegen kolom '{column_name}': {e}")
-            # Probeer gewone ALTER TABLE als fallback
-            try:
-                self.cursor.execute(f"ALTER TABLE bloedwaarden ADD COLUMN {column_name} {column_type}")
-                self.conn.commit()
-                print(f"✅ Kolom '{column_name}' toegevoegd via fallback")
-            except:
-                print(f"❌ Kon kolom '{column_name}' niet toevoegen")
+            print(f"⚠️ Fout bij database migratie: {e}")
+            messagebox.showerror("Database Migratie",
+                                 f"Database migratie mislukt: {str(e)}\n\n"
+                                 "Niet vastgelegde wijzigingen zijn teruggedraaid; "
+                                 "bij de volgende start gaat de migratie verder.")
     
     def create_migration_backup(self):
         """Maak automatische backup voordat database migratie"""
         try:
-            import shutil
-            from datetime import datetime
+            # Draait tijdens het opstarten, dus synchroon en zonder pauzes tussen de stappen
+            result = online_backup('diabetes_data.db', backup_filename('migration_backup'), step_delay=0)
             
-            # Maak backup bestandsnaam met timestamp
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_filename = f"migration_backup_{timestamp}.db"
-            
-            # Kopieer huidige database
-            shutil.copy2('diabetes_data.db', backup_filename)
-            
-            print(f"🔄 Automatische backup gemaakt: {backup_filename}")
+            print(f"🔄 Automatische backup gemaakt: {os.path.basename(result['path'])}")
             
         except Exception as e:
             print(f"⚠️ Kon geen automatische backup maken: {e}")
     
     def optimize_database(self):
-        """Database optimaliseren voor betere performance"""
-        try:
-            # VACUUM om database te comprimeren
-            self.cursor.execute('VACUUM')
+        """Database optimaliseren voor betere performance (VACUUM en ANALYZE op de database worker)"""
+        def optimize_job(conn):
+            started = time.perf_counter()
+            gestart = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            
+            # VACUUM om database te comprimeren; zet daarbij auto_vacuum op INCREMENTAL zodat
+            # het geplande onderhoud vrije pagina's in kleine stappen kan teruggeven
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            conn.execute('VACUUM')
             
             # ANALYZE voor query optimalisatie
-            self.cursor.execute('ANALYZE')
+            conn.execute('ANALYZE')
             
             # Update statistieken
-            self.cursor.execute('PRAGMA optimize')
-            
-            self.conn.commit()
+            conn.execute('PRAGMA optimize')
+            log_step(conn, gestart, 'vacuum', None, (time.perf_counter() - started) * 1000, "handmatig")
+        
+        def on_optimized(result):
             print("Database geoptimaliseerd")
-        except sqlite3.Error as e:
-            print(f"Database optimalisatie fout: {e}")
+            self.update_status("Database geoptimaliseerd")
+        
+        self.update_status("Database optimaliseren...")
+        self.db_worker.submit(optimize_job, callback=on_optimized,
+                              error_callback=lambda e: self.update_status(f"Database optimalisatie fout: {e}"),
+                              label="optimize_database")
     
     def create_widgets(self):
         """GUI widgets aanmaken met Material Design en verbeterde UX"""
@@ -1315,7 +1572,18 @@ class DiabetesTracker:
         history_card = ttk.LabelFrame(main_frame, text="📋 Geschiedenis", padding="20")
         history_card.grid(row=4, column=0, sticky="nsew", pady=(0, 20))
         history_card.columnconfigure(0, weight=1)
-        history_card.rowconfigure(0, weight=1)
+        history_card.rowconfigure(1, weight=1)
+        
+        # Zoekbalk (FTS5 syntax, bijvoorbeeld: hypo AND sport)
+        search_frame = ttk.Frame(history_card)
+        search_frame.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(0, 10))
+        ttk.Label(search_frame, text="🔎 Zoeken:", font=('Arial', 11)).pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(search_frame, textvariable=self.search_var, width=40, font=('Arial', 11))
+        search_entry.pack(side=tk.LEFT, padx=(10, 10))
+        search_entry.bind('<Return>', lambda event: self.search_history())
+        ttk.Button(search_frame, text="Zoek", command=self.search_history,
+                  style='primary.TButton').pack(side=tk.LEFT)
         
         # Treeview voor data met grotere font
         columns = ('Datum', 'Tijd', 'Bloedwaarde', 'Medicatie', 'Activiteit', 'Gewicht', 'Opmerkingen', 'Medicatie Hoeveelheid', 'Insuline ingenomen', 'Insuline vergeten')
@@ -1330,12 +1598,22 @@ class DiabetesTracker:
         scrollbar = ttk.Scrollbar(history_card, orient=tk.VERTICAL, command=self.tree.yview)
         self.tree.configure(yscrollcommand=scrollbar.set)
         
-        self.tree.grid(row=0, column=0, sticky="nsew")
-        scrollbar.grid(row=0, column=1, sticky="ns")
-        
-        # Verwijder knop
-        ttk.Button(history_card, text="🗑️ Verwijder Selectie", command=self.delete_selected, 
-                  style='danger.TButton').grid(row=1, column=0, pady=(15, 0))
+        self.tree.grid(row=1, column=0, sticky="nsew")
+        scrollbar.grid(row=1, column=1, sticky="ns")
+        
+        # Virtuele weergave: pagina's worden geladen tijdens het scrollen
+        self.history_view = VirtualHistoryView(self.tree, scrollbar, self.db_worker,
+                                               page_size=self.config['max_records_display'],
+                                               format_row=self.format_history_row,
+                                               error_callback=self.show_db_error)
+        
+        # Bewerk en verwijder knoppen (meerdere rijen selecteren met Ctrl/Shift)
+        history_buttons = ttk.Frame(history_card)
+        history_buttons.grid(row=2, column=0, pady=(15, 0))
+        ttk.Button(history_buttons, text="✏️ Bewerk Selectie", command=self.edit_selected, 
+                  style='primary.TButton').pack(side=tk.LEFT, padx=(0, 15))
+        ttk.Button(history_buttons, text="🗑️ Verwijder Selectie", command=self.delete_selected, 
+                  style='danger.TButton').pack(side=tk.LEFT)
 
         # Overzicht Card
         overview_card = ttk.LabelFrame(main_frame, text="📊 Overzicht Ingevoerde Waarden", padding="25")
@@ -1382,15 +1660,12 @@ class DiabetesTracker:
         """Haal medicatie op van de patiënt uit de patiënten fiche"""
         try:
             # Probeer medicatie op te halen uit patiënten database
-            patient_conn = sqlite3.connect('patient_data.db')
-            patient_cursor = patient_conn.cursor()
-            
-            patient_cursor.execute('''
+            # Gedeelde connectie: deze functie draait bij elke toetsaanslag in het medicatie veld
+            patient_cursor = get_connection(PATIENT_DB).execute('''
                 SELECT DISTINCT medication_name FROM medications WHERE active = 1
             ''')
             
             medications = [row[0] for row in patient_cursor.fetchall()]
-            patient_conn.close()
             
             if medications:
                 return medications
@@ -1412,15 +1687,11 @@ class DiabetesTracker:
         if selected_med:
             # Haal medicatie info op uit patiënten database
             try:
-                patient_conn = sqlite3.connect('patient_data.db')
-                patient_cursor = patient_conn.cursor()
-                
-                patient_cursor.execute('''
+                patient_cursor = get_connection(PATIENT_DB).execute('''
                     SELECT pros, cons FROM medication_info WHERE medication_name = ?
                 ''', (selected_med,))
                 
                 result = patient_cursor.fetchone()
-                patient_conn.close()
                 
                 if result:
                     pros, cons = result
@@ -1615,34 +1886,174 @@ class DiabetesTracker:
                     return
             
             opmerkingen = self.notes_entry.get()
-            
-            # Voeg toe aan database
-            self.cursor.execute('''
-                            INSERT INTO bloedwaarden (datum, tijd, bloedwaarde, medicatie, activiteit, gewicht, opmerkingen, medicatie_hoeveelheid)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (datum, tijd, bloedwaarde, medicatie, activiteit, gewicht, opmerkingen, medicatie_hoeveelheid))
-            
-            self.conn.commit()
-            
-            # Update overzicht
-            self.update_status("Updaten van statistieken...")
-            self.update_overview_stats()
-            
-            # Clear entries
-            self.clear_entries()
-            
-            # Reload data
-            self.update_status("Laden van nieuwe data...")
-            self.load_data()
-            
-            self.update_status("Meting succesvol toegevoegd!")
-            
+
+            # Voeg toe aan database via de worker thread
+            ts = to_ts(datum, tijd)
+            values = (datum, tijd, ts, bloedwaarde, medicatie, activiteit, gewicht, opmerkingen, medicatie_hoeveelheid)
+            
+            def on_saved(result):
+                # Rij in dezelfde volgorde als de geschiedenis weergave: (id, ts, datum, tijd, ...)
+                row_id = result[0]
+                self.on_entry_added((row_id, ts, datum, tijd, bloedwaarde, medicatie, activiteit, gewicht,
+                                     opmerkingen, medicatie_hoeveelheid, None, None))
+            
+            def insert_job(conn):
+                # Meting en genormaliseerde medicatie regels in dezelfde transactie
+                cursor = conn.execute('''
+                    INSERT INTO bloedwaarden (datum, tijd, ts, bloedwaarde, medicatie, activiteit, gewicht, opmerkingen, medicatie_hoeveelheid)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', values)
+                if medicatie or medicatie_hoeveelheid:
+                    store_reading_medications(conn, cursor.lastrowid, medicatie, medicatie_hoeveelheid)
+                return cursor.lastrowid, cursor.rowcount
+            
+            self.db_worker.submit(insert_job, callback=on_saved, error_callback=self.show_db_error,
+                                  label="add_entry", kind='write')
+
         except sqlite3.Error as e:
             messagebox.showerror("Database Fout", f"Er is een database fout opgetreden: {str(e)}")
             self.update_status("Database fout opgetreden")
         except Exception as e:
             messagebox.showerror("Fout", f"Er is een onverwachte fout opgetreden: {str(e)}")
             self.update_status("Onverwachte fout opgetreden")
+
+    def on_entry_added(self, row):
+        """Verwerk een opgeslagen meting (aangeroepen door de database worker)"""
+        # Update overzicht
+        self.update_status("Updaten van statistieken...")
+        self.update_overview_stats()
+
+        # Clear entries
+        self.clear_entries()
+
+        # Alleen de nieuwe rij toevoegen in plaats van de hele tabel te herladen
+        self.history_view.add_row(row)
+        
+        # Analyse frame en AI model incrementeel bijwerken met (ts, bloedwaarde)
+        self.analysis_cache.append([(row[0], row[1], row[4], row[5], row[6], row[7])])
+        self.ai_analytics.learn_readings([(row[1], row[4])])
+        if self.ai_analytics.needs_refit:
+            self.schedule_model_refit()
+
+        self.update_status("Meting succesvol toegevoegd!")
+
+    def show_db_error(self, error):
+        """Toon een fout die door de database worker is gemeld"""
+        if isinstance(error, sqlite3.Error):
+            messagebox.showerror("Database Fout", f"Er is een database fout opgetreden: {str(error)}")
+            self.update_status("Database fout opgetreden")
+        else:
+            messagebox.showerror("Fout", f"Er is een onverwachte fout opgetreden: {str(error)}")
+            self.update_status("Onverwachte fout opgetreden")
+
+    def show_worker_stats(self):
+        """Toon wachtrij diepte en latency van de database worker"""
+        stats = self.db_worker.get_stats()
+
+        stats_text = f"💽 Opslag modus: {stats['storage_mode']}\n"
+        stats_text += f"📥 Wachtrij: {stats['queue_depth']} (max {stats['max_queue_depth']})\n"
+        stats_text += f"✅ Uitgevoerd: {stats['jobs_done']} | ❌ Mislukt: {stats['jobs_failed']}\n"
+        stats_text += f"💾 Commits: {stats['commits']} | gem. {stats['writes_per_commit']:.1f} schrijfopdrachten per commit\n"
+        if 'avg_run_ms' in stats:
+            stats_text += f"\n⏱️ Uitvoertijd: gem. {stats['avg_run_ms']:.1f} ms | p95 {stats['p95_run_ms']:.1f} ms | max {stats['max_run_ms']:.1f} ms\n"
+            stats_text += f"⏳ Wachttijd: gem. {stats['avg_wait_ms']:.1f} ms | max {stats['max_wait_ms']:.1f} ms\n"
+            stats_text += f"🔁 Laatste opdracht: {stats['last_job']}"
+
+        pool = connections.get_stats()
+        stats_text += f"\n\n🔌 Connecties: {pool['open']} open | {pool['opened']} geopend | {pool['closed']} gesloten\n"
+        stats_text += f"♻️ Hergebruikt: {pool['reused']} van {pool['requests']} aanvragen"
+
+        messagebox.showinfo("Database Worker Status", stats_text)
+
+    def show_query_diagnostics(self):
+        """Toon per statement aantal, fouten, p50/p95 latency en rijen, plus de trage query log met query plans"""
+        diagnostics_window = tk.Toplevel(self.root)
+        diagnostics_window.title("🩺 Query Diagnostiek")
+        diagnostics_window.geometry("1000x650")
+        diagnostics_window.transient(self.root)
+        
+        columns = ('Statement', 'Aantal', 'Fouten', 'p50 (ms)', 'p95 (ms)', 'Max (ms)', 'Totaal (ms)', 'Rijen')
+        stats_frame = ttk.Frame(diagnostics_window)
+        stats_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 5))
+        stats_tree = ttk.Treeview(stats_frame, columns=columns, show='headings', height=14)
+        for col, width in zip(columns, (460, 60, 60, 70, 70, 70, 90, 70)):
+            stats_tree.heading(col, text=col)
+            stats_tree.column(col, width=width, anchor=tk.W if col == 'Statement' else tk.E)
+        stats_scrollbar = ttk.Scrollbar(stats_frame, orient=tk.VERTICAL, command=stats_tree.yview)
+        stats_tree.configure(yscrollcommand=stats_scrollbar.set)
+        stats_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        stats_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        ttk.Label(diagnostics_window, text=f"🐢 Trage queries (≥ {query_stats.slow_query_ms} ms)",
+                  font=('Arial', 11, 'bold')).pack(anchor=tk.W, padx=10)
+        slow_text = tk.Text(diagnostics_window, height=12, wrap=tk.WORD, font=('Consolas', 9))
+        slow_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        
+        def refresh():
+            stats_tree.delete(*stats_tree.get_children())
+            for stat in query_stats.get_stats():
+                stats_tree.insert('', 'end', values=(
+                    stat['sql'][:200], stat['count'], stat['errors'], f"{stat['p50_ms']:.2f}", f"{stat['p95_ms']:.2f}",
+                    f"{stat['max_ms']:.2f}", f"{stat['total_ms']:.1f}", stat['rows']))
+            
+            slow_text.delete('1.0', tk.END)
+            for entry in reversed(query_stats.get_slow_log()):
+                slow_text.insert(tk.END, f"{entry['time']} | {entry['ms']:.1f} ms | {entry['rows']} rijen\n{entry['sql']}\n")
+                for line in entry['plan']:
+                    slow_text.insert(tk.END, f"    {line}\n")
+                slow_text.insert(tk.END, "\n")
+        
+        def export_json():
+            filename = filedialog.asksaveasfilename(
+                defaultextension=".json",
+                filetypes=[("JSON files", "*.json")],
+                initialfile=f"query_stats_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                title="Export Query Statistieken"
+            )
+            if filename:
+                try:
+                    query_stats.dump_json(filename)
+                    messagebox.showinfo("Export", f"Query statistieken opgeslagen in {filename}")
+                except OSError as e:
+                    messagebox.showerror("Export Fout", f"Kon statistieken niet opslaan: {str(e)}")
+        
+        def reset():
+            query_stats.reset()
+            refresh()
+        
+        button_frame = ttk.Frame(diagnostics_window)
+        button_frame.pack(pady=10)
+        ttk.Button(button_frame, text="🔄 Vernieuwen", command=refresh).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="💾 Export JSON", command=export_json).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="🗑️ Reset", command=reset, style='danger.TButton').pack(side=tk.LEFT, padx=5)
+        
+        refresh()
+    
+    def show_maintenance_log(self):
+        """Toon de laatste onderhoudsstappen (optimize, ANALYZE, quick_check, vacuum)"""
+        def show(rows):
+            log_window = tk.Toplevel(self.root)
+            log_window.title("🧹 Onderhoudslog")
+            log_window.geometry("800x450")
+            log_window.transient(self.root)
+            
+            columns = ('Gestart', 'Taak', 'Object', 'Duur (ms)', 'Resultaat')
+            log_tree = ttk.Treeview(log_window, columns=columns, show='headings')
+            for col, width in zip(columns, (140, 120, 180, 80, 260)):
+                log_tree.heading(col, text=col)
+                log_tree.column(col, width=width)
+            log_scrollbar = ttk.Scrollbar(log_window, orient=tk.VERTICAL, command=log_tree.yview)
+            log_tree.configure(yscrollcommand=log_scrollbar.set)
+            
+            for gestart, taak, obj, duur_ms, resultaat in rows:
+                log_tree.insert('', 'end', values=(gestart, taak, obj or "", f"{duur_ms:.1f}", resultaat or ""))
+            
+            log_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(10, 0), pady=10)
+            log_scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=10)
+        
+        self.db_worker.submit(recent_log, callback=show,
+                              error_callback=lambda e: messagebox.showerror("Database Fout", f"Kon onderhoudslog niet laden: {str(e)}"),
+                              label="recent_log", kind='read')
     
     def clear_entries(self):
         """Wis alle invoervelden"""
@@ -1685,82 +2096,90 @@ class DiabetesTracker:
             self.update_status("Fout bij wissen")
     
     def load_data(self):
-        """Data laden in tabel met lazy loading voor grote datasets"""
+        """Data laden in tabel; oudere metingen worden per pagina geladen tijdens het scrollen"""
+        self.history_view.set_page_size(self.config['max_records_display'])
+        self.history_view.reload()
+
+    def format_history_row(self, row):
+        """Zet een rij (id, ts, datum, tijd, ...) om naar de waarden voor de tabel"""
+        # Gewicht formatting
+        gewicht = f"{row[7]:.1f}" if row[7] else ""
+        medicatie_hoeveelheid = row[9] or ""
+        ingenomen = "Ja" if row[10] else "Nee"
+        vergeten = "Ja" if row[11] else "Nee"
+        
+        # Markeer afwijkende bloedwaarden
+        bloedwaarde = f"{row[4]:.1f}"
+        if row[4] > 180 or row[4] < 80:
+            bloedwaarde += " ⚠️"
+        
+        return (row[2], row[3], bloedwaarde, row[5], row[6], gewicht, row[8], medicatie_hoeveelheid, ingenomen, vergeten)
+    
+    def load_all_data(self):
+        """Laad alle data (voor export en statistieken), inclusief jaararchieven"""
         try:
-            # Tabel leegmaken
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            
-            # Eerst alleen de laatste 100 records laden voor snelle weergave
-            self.cursor.execute('''
-                SELECT datum, tijd, bloedwaarde, medicatie, activiteit, gewicht, opmerkingen, medicatie_hoeveelheid, insuline_ingenomen, insuline_vergeten
-                FROM bloedwaarden
-                ORDER BY datum DESC, tijd DESC
-                LIMIT 100
-            ''')
-            
-            # Voeg data toe met betere formatting
-            for row in self.cursor.fetchall():
-                # Gewicht formatting
-                gewicht = f"{row[5]:.1f}" if row[5] else ""
-                medicatie_hoeveelheid = row[7] or ""
-                ingenomen = "Ja" if row[8] else "Nee"
-                vergeten = "Ja" if row[9] else "Nee"
-                
-                # Voeg rij toe met tags voor styling
-                item = self.tree.insert('', 'end', values=(
-                    row[0], row[1], f"{row[2]:.1f}", row[3], row[4], gewicht, row[6], medicatie_hoeveelheid, ingenomen, vergeten
-                ))
-                
-                # Kleur rij op basis van bloedwaarde
-                if row[2] > 180:
-                    self.tree.set(item, 'Bloedwaarde', f"{row[2]:.1f} ⚠️")
-                elif row[2] < 80:
-                    self.tree.set(item, 'Bloedwaarde', f"{row[2]:.1f} ⚠️")
-                    
+            return readings_between(self.conn, EXPORT_COLUMNS)
         except sqlite3.Error as e:
             messagebox.showerror("Database Fout", f"Er is een database fout opgetreden: {str(e)}")
-        except Exception as e:
-            messagebox.showerror("Fout", f"Er is een onverwachte fout opgetreden: {str(e)}")
+            return []
     
-    def load_all_data(self):
-        """Laad alle data (voor export en statistieken)"""
+    def load_analysis_frame(self):
+        """Getypeerde analyse frame van alle metingen (voor statistieken en AI analytics)
+
+        Wordt één keer opgebouwd en daarna bijgewerkt, zie analysis_frame.py.
+        """
         try:
-            self.cursor.execute('''
-                SELECT datum, tijd, bloedwaarde, medicatie, activiteit, gewicht, opmerkingen, medicatie_hoeveelheid, insuline_ingenomen, insuline_vergeten
-                FROM bloedwaarden
-                ORDER BY datum DESC, tijd DESC
-            ''')
-            return self.cursor.fetchall()
+            return self.analysis_cache.get(self.conn)
         except sqlite3.Error as e:
             messagebox.showerror("Database Fout", f"Er is een database fout opgetreden: {str(e)}")
-            return []
+            return None
+    
+    def archived_ids(self, row_ids):
+        """Geselecteerde ids die niet in diabetes_data.db staan (gearchiveerd, dus alleen-lezen)"""
+        placeholders = ", ".join("?" for _ in row_ids)
+        present = {row[0] for row in self.conn.execute(
+            f"SELECT id FROM main.bloedwaarden WHERE id IN ({placeholders})", row_ids)}
+        return [row_id for row_id in row_ids if row_id not in present]
+    
+    def refuse_archived(self, row_ids, action):
+        """Meld gearchiveerde metingen in de selectie; geeft True als de actie moet stoppen"""
+        archived = self.archived_ids(row_ids)
+        if not archived:
+            return False
+        messagebox.showwarning("Gearchiveerde metingen",
+                               f"{len(archived)} van de geselecteerde metingen staan in een jaararchief en "
+                               f"zijn alleen-lezen.\n\nSelecteer alleen recente metingen om te {action}.")
+        self.update_status("Gearchiveerde metingen zijn alleen-lezen")
+        return True
     
     def delete_selected(self):
-        """Geselecteerde rij verwijderen"""
+        """Geselecteerde rijen verwijderen in één transactie"""
         try:
-            selected = self.tree.selection()
-            if not selected:
+            row_ids = self.history_view.selected_ids()
+            if not row_ids:
                 messagebox.showwarning("Waarschuwing", "Selecteer eerst een rij om te verwijderen.")
                 self.update_status("Geen rij geselecteerd")
                 return
+            if self.refuse_archived(row_ids, "verwijderen"):
+                return
             
-            if messagebox.askyesno("Bevestiging", "Weet je zeker dat je deze meting wilt verwijderen?"):
+            question = ("Weet je zeker dat je deze meting wilt verwijderen?" if len(row_ids) == 1
+                        else f"Weet je zeker dat je deze {len(row_ids)} metingen wilt verwijderen?")
+            if messagebox.askyesno("Bevestiging", question):
                 self.update_status("Verwijderen van meting...")
                 
-                item = self.tree.item(selected[0])
-                datum = item['values'][0]
-                tijd = item['values'][1]
+                # Verwijder op primary key; de worker voert alles in één transactie uit
+                def delete_job(conn):
+                    placeholders = ", ".join("?" for _ in row_ids)
+                    removed_values = conn.execute(
+                        f"SELECT ts, bloedwaarde FROM bloedwaarden WHERE id IN ({placeholders})", row_ids).fetchall()
+                    # Alleen ids die echt verwijderd zijn gaan terug naar de UI
+                    removed = [row_id for row_id in row_ids
+                               if conn.execute("DELETE FROM bloedwaarden WHERE id = ?", (row_id,)).rowcount]
+                    return removed, removed_values
                 
-                self.cursor.execute('''
-                    DELETE FROM bloedwaarden WHERE datum = ? AND tijd = ?
-                ''', (datum, tijd))
-                self.conn.commit()
-                
-                self.load_data()
-                self.update_overview_stats()
-                self.update_status("Meting succesvol verwijderd!")
-                messagebox.showinfo("Succes", "Meting succesvol verwijderd!")
+                self.db_worker.submit(delete_job, callback=lambda result: self.on_entry_deleted(*result),
+                                      error_callback=self.show_db_error, label="delete_selected", kind='write')
                 
         except sqlite3.Error as e:
             messagebox.showerror("Database Fout", f"Er is een database fout opgetreden: {str(e)}")
@@ -1769,8 +2188,190 @@ class DiabetesTracker:
             messagebox.showerror("Fout", f"Er is een onverwachte fout opgetreden: {str(e)}")
             self.update_status("Onverwachte fout opgetreden")
     
-    def get_export_data(self):
-        """Data ophalen voor export op basis van geselecteerde periode"""
+    def on_entry_deleted(self, removed, removed_values=()):
+        """Verwerk verwijderde metingen (aangeroepen door de database worker)"""
+        if not removed:
+            self.update_status("Geen metingen verwijderd")
+            messagebox.showwarning("Waarschuwing", "De geselecteerde metingen bestaan niet meer of zijn gearchiveerd.")
+            return
+        for row_id in removed:
+            self.history_view.remove_row(row_id)
+        self.ai_analytics.forget_readings(removed_values)
+        self.analysis_cache.invalidate()
+        self.update_overview_stats()
+        if len(removed) == 1:
+            self.update_status("Meting succesvol verwijderd!")
+            messagebox.showinfo("Succes", "Meting succesvol verwijderd!")
+        else:
+            self.update_status(f"{len(removed)} metingen succesvol verwijderd!")
+            messagebox.showinfo("Succes", f"{len(removed)} metingen succesvol verwijderd!")
+
+    def edit_selected(self):
+        """Bewerk de geselecteerde rijen; lege velden blijven ongewijzigd bij meerdere rijen"""
+        row_ids = self.history_view.selected_ids()
+        if not row_ids:
+            messagebox.showwarning("Waarschuwing", "Selecteer eerst een rij om te bewerken.")
+            self.update_status("Geen rij geselecteerd")
+            return
+        if self.refuse_archived(row_ids, "bewerken"):
+            return
+        
+        single = len(row_ids) == 1
+        current = self.tree.item(str(row_ids[0]))['values'] if single else None
+        
+        edit_window = tk.Toplevel(self.root)
+        edit_window.title("Bewerk Meting" if single else f"Bewerk {len(row_ids)} Metingen")
+        edit_window.geometry("420x420")
+        edit_window.transient(self.root)
+        
+        if not single:
+            ttk.Label(edit_window, text="Lege velden blijven ongewijzigd", font=('Arial', 10, 'italic')).pack(pady=(10, 0))
+        
+        form = ttk.Frame(edit_window, padding="15")
+        form.pack(fill=tk.BOTH, expand=True)
+        
+        # (kolom, label, index in de tabelwaarden); datum en tijd alleen bij één rij
+        fields = [('bloedwaarde', "Bloedwaarde (mg/dL):", 2), ('medicatie', "Medicatie:", 3),
+                  ('activiteit', "Activiteit:", 4), ('gewicht', "Gewicht (kg):", 5), ('opmerkingen', "Opmerkingen:", 6)]
+        if single:
+            fields = [('datum', "Datum (YYYY-MM-DD):", 0), ('tijd', "Tijd (HH:MM):", 1)] + fields
+        
+        entries = {}
+        for row, (column, label, index) in enumerate(fields):
+            ttk.Label(form, text=label).grid(row=row, column=0, sticky=tk.W, pady=4)
+            entry = ttk.Entry(form, width=28)
+            entry.grid(row=row, column=1, sticky=tk.W, pady=4)
+            if single:
+                value = str(current[index])
+                if value == 'None':
+                    value = ""
+                if column == 'bloedwaarde':
+                    value = value.replace("⚠️", "").strip()
+                entry.insert(0, value)
+            entries[column] = entry
+        
+        def save():
+            changes = {}
+            try:
+                for column, entry in entries.items():
+                    value = entry.get().strip()
+                    if column == 'datum':
+                        datetime.strptime(value, "%Y-%m-%d")
+                    elif column == 'tijd':
+                        datetime.strptime(value, "%H:%M")
+                    elif column == 'bloedwaarde':
+                        if not value:
+                            continue
+                        value = float(value)
+                        if value <= 0 or value > 1000:
+                            raise ValueError("Bloedwaarde moet tussen 0 en 1000 mg/dL zijn")
+                    elif column == 'gewicht':
+                        if not value:
+                            if single:
+                                changes[column] = None
+                            continue
+                        value = float(value)
+                        if value <= 0 or value > 500:
+                            raise ValueError("Gewicht moet tussen 0 en 500 kg zijn")
+                    elif not value and not single:
+                        continue
+                    changes[column] = value
+            except ValueError as e:
+                messagebox.showerror("Fout", f"Ongeldige invoer: {str(e)}", parent=edit_window)
+                return
+            
+            if not changes:
+                edit_window.destroy()
+                return
+            
+            edit_window.destroy()
+            self.update_status("Opslaan van wijzigingen...")
+            
+            # Alle rijen in één transactie bijwerken op primary key (ts volgt via trigger)
+            assignments = ", ".join(f"{column} = ?" for column in changes)
+            values = list(changes.values())
+            
+            def update_job(conn):
+                # Alleen ids die echt bijgewerkt zijn worden teruggelezen en in de UI vernieuwd
+                updated = [row_id for row_id in row_ids
+                           if conn.execute(f"UPDATE bloedwaarden SET {assignments} WHERE id = ?",
+                                           values + [row_id]).rowcount]
+                if not updated:
+                    return []
+                placeholders = ", ".join("?" for _ in updated)
+                if 'medicatie' in changes:
+                    # Genormaliseerde medicatie regels volgen de nieuwe medicatie tekst
+                    for row_id, medicatie_hoeveelheid in conn.execute(
+                            f"SELECT id, medicatie_hoeveelheid FROM bloedwaarden WHERE id IN ({placeholders})",
+                            updated).fetchall():
+                        store_reading_medications(conn, row_id, changes['medicatie'], medicatie_hoeveelheid)
+                return conn.execute(f"SELECT {HISTORY_COLUMNS} FROM bloedwaarden WHERE id IN ({placeholders})",
+                                    updated).fetchall()
+            
+            self.db_worker.submit(update_job, callback=self.on_entries_updated,
+                                  error_callback=self.show_db_error, label="edit_selected", kind='write')
+        
+        buttons = ttk.Frame(edit_window)
+        buttons.pack(pady=15)
+        ttk.Button(buttons, text="Opslaan", command=save, style='success.TButton').pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Annuleren", command=edit_window.destroy).pack(side=tk.LEFT, padx=5)
+
+    def search_history(self):
+        """Zoek in notities, medicatie en activiteit via de worker thread"""
+        query = self.search_var.get().strip()
+        if not query:
+            return
+        self.update_status(f"Zoeken naar '{query}'...")
+        self.db_worker.submit(lambda conn: search_readings(conn, query),
+                              callback=lambda rows: self.show_search_results(query, rows),
+                              error_callback=self.show_db_error, label="search_history", kind='read')
+    
+    def show_search_results(self, query, rows):
+        """Toon zoekresultaten, meest relevante eerst"""
+        self.update_status(f"{len(rows)} resultaten voor '{query}'")
+        if not rows:
+            messagebox.showinfo("Zoeken", f"Geen metingen gevonden voor '{query}'")
+            return
+        
+        results_window = tk.Toplevel(self.root)
+        results_window.title(f"🔎 Zoekresultaten: {query}")
+        results_window.geometry("900x450")
+        results_window.transient(self.root)
+        
+        columns = ('Datum', 'Tijd', 'Bloedwaarde', 'Activiteit', 'Fragment')
+        results_tree = ttk.Treeview(results_window, columns=columns, show='headings')
+        for col, width in zip(columns, (100, 70, 100, 140, 460)):
+            results_tree.heading(col, text=col)
+            results_tree.column(col, width=width)
+        results_scrollbar = ttk.Scrollbar(results_window, orient=tk.VERTICAL, command=results_tree.yview)
+        results_tree.configure(yscrollcommand=results_scrollbar.set)
+        
+        for row in rows:
+            results_tree.insert('', 'end', iid=str(row[0]),
+                                values=(row[2], row[3], f"{row[4]:.1f}", row[6] or "", row[8] or ""))
+        
+        results_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(10, 0), pady=10)
+        results_scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=10)
+    
+    def on_entries_updated(self, rows):
+        """Verwerk bewerkte metingen (aangeroepen door de database worker)"""
+        if not rows:
+            self.update_status("Geen metingen bijgewerkt")
+            messagebox.showwarning("Waarschuwing", "De geselecteerde metingen bestaan niet meer of zijn gearchiveerd.")
+            return
+        for row in rows:
+            self.history_view.update_row(row)
+        self.analysis_cache.invalidate()
+        self.schedule_model_refit()
+        self.update_overview_stats()
+        self.update_status(f"{len(rows)} meting(en) bijgewerkt!")
+
+    def get_export_data(self, callback):
+        """Data ophalen voor export op basis van geselecteerde periode
+
+        De query loopt via de database worker; callback krijgt (data, start_date, end_date, summary)
+        met summary = (aantal, gemiddelde, min, max, gemiddeld gewicht) uit de rollup tabel.
+        """
         try:
             period = self.period_var.get()
             today = datetime.now()
@@ -1801,36 +2402,33 @@ class DiabetesTracker:
                     datetime.strptime(end_date, "%Y-%m-%d")
                 except ValueError:
                     messagebox.showerror("Fout", "Voer geldige datums in (YYYY-MM-DD)")
-                    return None, None, None
+                    return
             else:
                 start_date = today.strftime("%Y-%m-%d")
                 end_date = today.strftime("%Y-%m-%d")
             
-            # Gebruik geoptimaliseerde query met index hints
-            self.cursor.execute('''
-                SELECT datum, tijd, bloedwaarde, medicatie, activiteit, gewicht, opmerkingen, medicatie_hoeveelheid, insuline_ingenomen, insuline_vergeten
-                FROM bloedwaarden
-                WHERE datum BETWEEN ? AND ?
-                ORDER BY datum DESC, tijd DESC
-            ''', (start_date, end_date))
+            # Index range scan op ts in plaats van vergelijken van datum strings
+            start_ts, end_ts = day_range(start_date, end_date)
             
-            return self.cursor.fetchall(), start_date, end_date
+            def query_export(conn):
+                # Jaararchieven worden alleen gekoppeld als de periode ze raakt
+                rows = readings_between(conn, EXPORT_COLUMNS, start_ts, end_ts)
+                # Samenvatting voor het rapport uit de rollup tabel
+                return rows, summarize(conn, start_date, end_date)
+            
+            self.db_worker.submit(query_export, callback=lambda result: callback(result[0], start_date, end_date, result[1]),
+                                  error_callback=self.show_db_error, label="get_export_data", kind='read')
             
-        except sqlite3.Error as e:
-            messagebox.showerror("Database Fout", f"Er is een database fout opgetreden: {str(e)}")
-            return None, None, None
         except Exception as e:
             messagebox.showerror("Fout", f"Er is een onverwachte fout opgetreden: {str(e)}")
-            return None, None, None
     
     def export_excel(self):
         """Export naar Excel met geoptimaliseerde performance"""
+        self.get_export_data(self.write_excel_export)
+
+    def write_excel_export(self, data, start_date, end_date, summary):
+        """Schrijf opgehaalde export data naar Excel"""
         try:
-            data, start_date, end_date = self.get_export_data()
-            
-            if data is None:
-                return
-                
             if not data:
                 messagebox.showwarning("Waarschuwing", "Geen data gevonden voor de geselecteerde periode.")
                 return
@@ -1859,16 +2457,17 @@ class DiabetesTracker:
                     
                     df.to_excel(writer, sheet_name='Bloedwaarden', index=False)
                     
-                    # Statistieken toevoegen
+                    # Statistieken toevoegen (uit de rollup tabel)
+                    count, avg_blood, min_blood, max_blood, avg_weight = summary
                     stats_data = {
                         'Statistiek': ['Aantal metingen', 'Gemiddelde bloedwaarde', 'Hoogste bloedwaarde', 
                                       'Laagste bloedwaarde', 'Gemiddeld gewicht'],
                         'Waarde': [
-                            len(data),
-                            f"{df['Bloedwaarde (mg/dL)'].mean():.1f}",
-                            f"{df['Bloedwaarde (mg/dL)'].max():.1f}",
-                            f"{df['Bloedwaarde (mg/dL)'].min():.1f}",
-                            f"{df['Gewicht (kg)'].mean():.1f}" if not df['Gewicht (kg)'].isna().all() else "N/A"
+                            count,
+                            f"{avg_blood:.1f}",
+                            f"{max_blood:.1f}",
+                            f"{min_blood:.1f}",
+                            f"{avg_weight:.1f}" if avg_weight is not None else "N/A"
                         ]
                     }
                     
@@ -1882,12 +2481,11 @@ class DiabetesTracker:
     
     def export_pdf(self):
         """Export naar PDF met geoptimaliseerde performance"""
+        self.get_export_data(self.write_pdf_export)
+
+    def write_pdf_export(self, data, start_date, end_date, summary):
+        """Schrijf opgehaalde export data naar PDF"""
         try:
-            data, start_date, end_date = self.get_export_data()
-            
-            if data is None:
-                return
-                
             if not data:
                 messagebox.showwarning("Waarschuwing", "Geen data gevonden voor de geselecteerde periode.")
                 return
@@ -1947,15 +2545,15 @@ class DiabetesTracker:
                 story.append(table)
                 story.append(Spacer(1, 12))
                 
-                # Statistieken
-                df = pd.DataFrame(data, columns=['Datum', 'Tijd', 'Bloedwaarde', 'Medicatie', 'Activiteit', 'Gewicht', 'Opmerkingen', 'Medicatie Hoeveelheid', 'Insuline ingenomen', 'Insuline vergeten'])
+                # Statistieken (uit de rollup tabel)
+                count, avg_blood, min_blood, max_blood, avg_weight = summary
                 
                 stats_text = f"""
                 Statistieken:
-                • Aantal metingen: {len(data)}
-                • Gemiddelde bloedwaarde: {df['Bloedwaarde'].mean():.1f} mg/dL
-                • Hoogste bloedwaarde: {df['Bloedwaarde'].max():.1f} mg/dL
-                • Laagste bloedwaarde: {df['Bloedwaarde'].min():.1f} mg/dL
+                • Aantal metingen: {count}
+                • Gemiddelde bloedwaarde: {avg_blood:.1f} mg/dL
+                • Hoogste bloedwaarde: {max_blood:.1f} mg/dL
+                • Laagste bloedwaarde: {min_blood:.1f} mg/dL
                 """
                 
                 stats_para = Paragraph(stats_text, styles['Normal'])
@@ -1972,7 +2570,7 @@ class DiabetesTracker:
         try:
             self.cursor.execute('''
                 SELECT datum, bloedwaarde FROM bloedwaarden 
-                ORDER BY datum ASC, tijd ASC
+                ORDER BY ts ASC
             ''')
             data = self.cursor.fetchall()
             
@@ -2009,13 +2607,36 @@ class DiabetesTracker:
         except Exception as e:
             messagebox.showerror("Grafiek Fout", f"Er is een fout opgetreden bij het maken van de grafiek: {str(e)}")
     
+    def show_forecast_chart(self, start, hours):
+        """Voorspelde bloedwaarde curve (per 5 minuten) vanaf start, in één batch voorspelling"""
+        moments, values = self.ai_analytics.forecast(start, hours)
+        
+        chart_window = tk.Toplevel(self.root)
+        chart_window.title("Voorspelde Bloedwaarden")
+        chart_window.geometry("800x600")
+        
+        fig, ax = plt.subplots(figsize=(10, 6))
+        ax.plot(moments, values, linewidth=2)
+        ax.axhspan(70, 180, color='green', alpha=0.1)
+        ax.set_title(f"Voorspelling {start:%Y-%m-%d} ({hours} uur)", fontsize=16, fontweight='bold')
+        ax.set_xlabel("Tijdstip")
+        ax.set_ylabel("Bloedwaarde (mg/dL)")
+        ax.grid(True, alpha=0.3)
+        
+        plt.xticks(rotation=45)
+        plt.tight_layout()
+        
+        canvas = FigureCanvasTkAgg(fig, chart_window)
+        canvas.draw()
+        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+    
     def show_weight_chart(self):
         """Gewicht grafiek tonen"""
         try:
             self.cursor.execute('''
                 SELECT datum, gewicht FROM bloedwaarden 
                 WHERE gewicht IS NOT NULL
-                ORDER BY datum ASC, tijd ASC
+                ORDER BY ts ASC
             ''')
             data = self.cursor.fetchall()
             
@@ -2063,8 +2684,7 @@ class DiabetesTracker:
     def __del__(self):
         """Cleanup bij afsluiten"""
         try:
-            if hasattr(self, 'conn'):
-                self.conn.close()
+            connections.close_all()
         except:
             pass
 
@@ -2139,21 +2759,13 @@ class DiabetesTracker:
             taken = taken_var.get()
             missed = missed_var.get()
             
-            # Verwijder bestaande entry voor vandaag
-            self.patient_profile.patient_cursor.execute('''
-                DELETE FROM medication_schedule 
-                WHERE patient_id = ? AND medication_id = ? AND date = ? AND scheduled_time = ?
-            ''', (patient_id, med_id, today, f"{time_hour}:00"))
-            
-            # Voeg nieuwe status toe
+            # Eén upsert op de unieke sleutel; zonder status wordt de registratie verwijderd
             if taken or missed:
-                self.patient_profile.patient_cursor.execute('''
-                    INSERT INTO medication_schedule (patient_id, medication_id, scheduled_time, taken, missed, date)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (patient_id, med_id, f"{time_hour}:00", taken, missed, today))
-                
-                self.patient_profile.patient_conn.commit()
+                record_dose(self.patient_profile.patient_conn, patient_id, med_id, today, f"{time_hour}:00",
+                            taken, missed)
                 messagebox.showinfo("Succes", "Medicatie status succesvol opgeslagen!")
+            else:
+                clear_dose(self.patient_profile.patient_conn, patient_id, med_id, today, f"{time_hour}:00")
             
             # Update statistieken
             self.update_compliance_stats()
@@ -2183,19 +2795,9 @@ class DiabetesTracker:
             taken = taken_var.get()
             missed = not taken  # Als niet genomen, dan vergeten
             
-            # Verwijder bestaande entry voor vandaag
-            self.patient_profile.patient_cursor.execute('''
-                DELETE FROM medication_schedule 
-                WHERE patient_id = ? AND medication_id = ? AND date = ? AND scheduled_time = ?
-            ''', (patient_id, med_id, today, f"{time_hour}:00"))
-            
-            # Voeg nieuwe status toe
-            self.patient_profile.patient_cursor.execute('''
-                INSERT INTO medication_schedule (patient_id, medication_id, scheduled_time, taken, missed, date)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (patient_id, med_id, f"{time_hour}:00", taken, missed, today))
-                
-            self.patient_profile.patient_conn.commit()
+            # Eén upsert op de unieke sleutel (patient, datum, medicatie, tijdstip)
+            record_dose(self.patient_profile.patient_conn, patient_id, med_id, today, f"{time_hour}:00",
+                        taken, missed)
             
             # Update statistieken
             self.update_compliance_stats()
@@ -2233,29 +2835,37 @@ class DiabetesTracker:
             
             total_meds = self.patient_profile.patient_cursor.fetchone()[0]
             
-            # Tel genomen en vergeten medicatie
-            self.patient_profile.patient_cursor.execute('''
-                SELECT SUM(taken), SUM(missed) FROM medication_schedule 
-                WHERE patient_id = ? AND date = ?
-            ''', (patient_id, today))
-            
-            result = self.patient_profile.patient_cursor.fetchone()
-            taken_meds = result[0] if result[0] else 0
-            missed_meds = result[1] if result[1] else 0
+            # Tel genomen en vergeten medicatie uit de compliance rollup
+            registered, taken_meds, missed_meds = adherence(self.patient_profile.patient_conn, patient_id,
+                                                            today, today)
             
             compliance_rate = (taken_meds / total_meds * 100) if total_meds > 0 else 0
             
             stats_text = f"📊 Compliance: {compliance_rate:.1f}% | ✅ Genomen: {taken_meds} | 📋 Totaal: {total_meds}"
             
+            # Compliance over 30/90/365 dagen uit de rollup
+            after_text = ""
+            windows = adherence_windows(self.patient_profile.patient_conn, patient_id, today=today)
+            if any(rate is not None for rate in windows.values()):
+                after_text += "\n📅 " + " | ".join(
+                    f"{days} dagen: {rate:.0f}%" if rate is not None else f"{days} dagen: -"
+                    for days, rate in windows.items())
+            
+            # Glucose in de 4 uur na gemiste doses (laatste 30 dagen, één join over beide databases)
+            month_ago = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+            missed_stats = glucose_after_doses(get_data_connection(), patient_id, month_ago).get('missed')
+            if missed_stats and missed_stats['readings']:
+                after_text += f"\n🩸 Na gemiste dosis (4u, 30 dagen): gemiddeld {missed_stats['mean']:.0f} mg/dL"
+            
             if compliance_rate < 80:
                 stats_text += " ⚠️ Verbetering nodig"
-                self.compliance_stats_label.config(text=stats_text, foreground='orange')
+                self.compliance_stats_label.config(text=stats_text + after_text, foreground='orange')
             elif compliance_rate >= 90:
                 stats_text += " 🎉 Uitstekend!"
-                self.compliance_stats_label.config(text=stats_text, foreground='green')
+                self.compliance_stats_label.config(text=stats_text + after_text, foreground='green')
             else:
                 stats_text += " 👍 Goed bezig"
-                self.compliance_stats_label.config(text=stats_text, foreground='blue')
+                self.compliance_stats_label.config(text=stats_text + after_text, foreground='blue')
                 
         except Exception as e:
             self.compliance_stats_label.config(text=f"Fout bij laden statistieken: {str(e)}")
@@ -2295,75 +2905,43 @@ class DiabetesTracker:
         self.update_overview_stats()
     
     def update_overview_stats(self):
-        """Update overzicht statistieken met geoptimaliseerde queries"""
+        """Update overzicht statistieken uit de dagelijkse rollup tabel"""
+        today = datetime.now().strftime("%Y-%m-%d")
+        week_start = (datetime.now() - timedelta(days=datetime.now().weekday())).strftime("%Y-%m-%d")
+        month_start = datetime.now().replace(day=1).strftime("%Y-%m-%d")
+        
+        # Hooguit 31 rollup rijen per periode in plaats van alle metingen
+        ranges = ((today, today), (week_start, LAST_DAY), (month_start, LAST_DAY))
+
+        def query_overview(conn):
+            # Vandaag, deze week en deze maand in één opdracht op de worker thread
+            return [conn.execute(SUMMARY_SQL, date_range).fetchone() for date_range in ranges]
+
+        self.db_worker.submit(query_overview, callback=self.show_overview_stats,
+                              error_callback=self.show_db_error, label="update_overview_stats", kind='read')
+
+    def show_overview_stats(self, results):
+        """Toon overzicht statistieken die de database worker heeft berekend"""
         try:
-            today = datetime.now().strftime("%Y-%m-%d")
-            week_start = (datetime.now() - timedelta(days=datetime.now().weekday())).strftime("%Y-%m-%d")
-            month_start = datetime.now().replace(day=1).strftime("%Y-%m-%d")
-            
-            # Vandaag statistieken - gebruik geoptimaliseerde query
-            self.cursor.execute('''
-                SELECT COUNT(*), AVG(bloedwaarde), MIN(bloedwaarde), MAX(bloedwaarde), AVG(gewicht)
-                FROM bloedwaarden WHERE datum = ?
-            ''', (today,))
-            
-            today_result = self.cursor.fetchone()
-            if today_result and today_result[0] > 0:
-                count, avg_blood, min_blood, max_blood, avg_weight = today_result
-                today_text = f"📊 Metingen: {count}\n"
-                today_text += f"🩸 Gemiddelde: {avg_blood:.1f} mg/dL\n" if avg_blood else "🩸 Gemiddelde: Geen data\n"
-                today_text += f"📉 Laagste: {min_blood:.1f} mg/dL\n" if min_blood else "📉 Laagste: Geen data\n"
-                today_text += f"📈 Hoogste: {max_blood:.1f} mg/dL\n" if max_blood else "📈 Hoogste: Geen data\n"
-                today_text += f"⚖️ Gemiddeld gewicht: {avg_weight:.1f} kg" if avg_weight else "⚖️ Gemiddeld gewicht: Geen data"
-            else:
-                today_text = "📊 Geen metingen vandaag"
-            
-            self.today_stats_label.config(text=today_text)
-            
-            # Deze week statistieken
-            self.cursor.execute('''
-                SELECT COUNT(*), AVG(bloedwaarde), MIN(bloedwaarde), MAX(bloedwaarde), AVG(gewicht)
-                FROM bloedwaarden WHERE datum >= ?
-            ''', (week_start,))
-            
-            week_result = self.cursor.fetchone()
-            if week_result and week_result[0] > 0:
-                count, avg_blood, min_blood, max_blood, avg_weight = week_result
-                week_text = f"📊 Metingen: {count}\n"
-                week_text += f"🩸 Gemiddelde: {avg_blood:.1f} mg/dL\n" if avg_blood else "🩸 Gemiddelde: Geen data\n"
-                week_text += f"📉 Laagste: {min_blood:.1f} mg/dL\n" if min_blood else "📉 Laagste: Geen data\n"
-                week_text += f"📈 Hoogste: {max_blood:.1f} mg/dL\n" if max_blood else "📈 Hoogste: Geen data\n"
-                week_text += f"⚖️ Gemiddeld gewicht: {avg_weight:.1f} kg" if avg_weight else "⚖️ Gemiddeld gewicht: Geen data"
-            else:
-                week_text = "📊 Geen metingen deze week"
-            
-            self.week_stats_label.config(text=week_text)
-            
-            # Deze maand statistieken
-            self.cursor.execute('''
-                SELECT COUNT(*), AVG(bloedwaarde), MIN(bloedwaarde), MAX(bloedwaarde), AVG(gewicht)
-                FROM bloedwaarden WHERE datum >= ?
-            ''', (month_start,))
-            
-            month_result = self.cursor.fetchone()
-            if month_result and month_result[0] > 0:
-                count, avg_blood, min_blood, max_blood, avg_weight = month_result
-                month_text = f"📊 Metingen: {count}\n"
-                month_text += f"🩸 Gemiddelde: {avg_blood:.1f} mg/dL\n" if avg_blood else "🩸 Gemiddelde: Geen data\n"
-                month_text += f"📉 Laagste: {min_blood:.1f} mg/dL\n" if min_blood else "📉 Laagste: Geen data\n"
-                month_text += f"📈 Hoogste: {max_blood:.1f} mg/dL\n" if max_blood else "📈 Hoogste: Geen data\n"
-                month_text += f"⚖️ Gemiddeld gewicht: {avg_weight:.1f} kg" if avg_weight else "⚖️ Gemiddeld gewicht: Geen data"
-            else:
-                month_text = "📊 Geen metingen deze maand"
-            
-            self.month_stats_label.config(text=month_text)
-            
-        except sqlite3.Error as e:
-            messagebox.showerror("Database Fout", f"Er is een database fout opgetreden: {str(e)}")
+            today_result, week_result, month_result = results
+            self.today_stats_label.config(text=self.format_overview_text(today_result, "📊 Geen metingen vandaag"))
+            self.week_stats_label.config(text=self.format_overview_text(week_result, "📊 Geen metingen deze week"))
+            self.month_stats_label.config(text=self.format_overview_text(month_result, "📊 Geen metingen deze maand"))
         except Exception as e:
             messagebox.showerror("Fout", f"Er is een onverwachte fout opgetreden: {str(e)}")
 
+    def format_overview_text(self, result, empty_text):
+        """Maak overzicht tekst van (count, avg, min, max, avg gewicht)"""
+        if not result or not result[0]:
+            return empty_text
 
+        count, avg_blood, min_blood, max_blood, avg_weight = result
+        text = f"📊 Metingen: {count}\n"
+        text += f"🩸 Gemiddelde: {avg_blood:.1f} mg/dL\n" if avg_blood else "🩸 Gemiddelde: Geen data\n"
+        text += f"📉 Laagste: {min_blood:.1f} mg/dL\n" if min_blood else "📉 Laagste: Geen data\n"
+        text += f"📈 Hoogste: {max_blood:.1f} mg/dL\n" if max_blood else "📈 Hoogste: Geen data\n"
+        text += f"⚖️ Gemiddeld gewicht: {avg_weight:.1f} kg" if avg_weight else "⚖️ Gemiddeld gewicht: Geen data"
+        return text
 
     def create_tooltip(self, widget, text):
         """Maak een tooltip voor een widget"""
@@ -2392,19 +2970,60 @@ class DiabetesTracker:
             self.root.after(3000, lambda: self.status_var.set("Klaar"))  # Reset na 3 seconden
 
     def train_ai_model(self):
-        """Train het AI model op historische data"""
-        try:
-            data = self.load_all_data()
-            if data and len(data) >= 5:
-                success = self.ai_analytics.train_model(data)
-                if success:
-                    self.update_status("AI model getraind op historische data")
-                else:
-                    self.update_status("AI training mislukt - onvoldoende data")
+        """Exacte fit van het AI model op alle metingen (inclusief jaararchieven) via de database worker
+
+        Een bewaard model met dezelfde data vingerafdruk wordt geladen in plaats van gefit; een
+        nieuwe fit wordt in de model cache bewaard. Tussen twee exacte fits werkt het model
+        incrementeel bij (zie on_entry_added). kind='job': openstaande schrijfopdrachten en hun
+        callbacks gaan eerst, zodat geen meting dubbel of niet meegeteld wordt.
+        """
+        self.model_refit_pending = False
+        
+        def fit_job(conn):
+            fingerprint = data_fingerprint(conn)
+            model = load_model(AIAnalytics.MODEL_NAME, fingerprint, AIAnalytics.FEATURES)
+            if model is not None:
+                return model, True
+            model = AIAnalytics.fit_readings(readings_between(conn, "ts, bloedwaarde", descending=False))
+            try:
+                save_model(AIAnalytics.MODEL_NAME, model, fingerprint, AIAnalytics.FEATURES)
+            except OSError as e:
+                print(f"⚠️ Model kon niet opgeslagen worden: {e}")
+            return model, False
+        
+        def on_fitted(result):
+            model, cached = result
+            self.ai_analytics.model = model
+            if self.ai_analytics.is_trained:
+                self.update_status("AI model geladen uit cache" if cached else "AI model getraind op historische data")
             else:
                 self.update_status("AI training uitgesteld - wacht op meer data")
-        except Exception as e:
-            self.update_status(f"AI training fout: {str(e)}")
+        
+        self.db_worker.submit(fit_job, callback=on_fitted,
+                              error_callback=lambda e: self.update_status(f"AI training fout: {str(e)}"),
+                              label="train_ai_model")
+    
+    def save_ai_model(self):
+        """Bewaar een incrementeel bijgewerkt model met de huidige vingerafdruk (bij afsluiten)
+
+        Alleen als er sinds de laatste exacte fit metingen bijgekomen of verwijderd zijn en er
+        geen fit meer gepland staat; anders klopt de bewaarde fit al of is die verouderd.
+        """
+        model = self.ai_analytics.model
+        if getattr(self, 'model_refit_pending', False) or not model.updates_since_fit:
+            return
+        
+        def save_job(conn):
+            save_model(AIAnalytics.MODEL_NAME, model, data_fingerprint(conn), AIAnalytics.FEATURES)
+        
+        self.db_worker.submit(save_job, error_callback=lambda e: print(f"⚠️ Model opslaan mislukt: {e}"),
+                              label="save_ai_model")
+    
+    def schedule_model_refit(self, delay_ms=2000):
+        """Plan één exacte fit na bewerkingen, imports of te veel incrementele wijzigingen"""
+        if not getattr(self, 'model_refit_pending', False):
+            self.model_refit_pending = True
+            self.root.after(delay_ms, self.train_ai_model)
 
     def show_ai_analytics(self):
         """Toon AI analytics venster"""
@@ -2428,15 +3047,17 @@ class DiabetesTracker:
                  font=('Arial', 18, 'bold')).pack(pady=(0, 20))
         
         # Data laden
-        data = self.load_all_data()
+        data = self.load_analysis_frame()
         
-        if not data or len(data) < 5:
+        if data is None or len(data) < 5:
             ttk.Label(main_frame, text="❌ Onvoldoende data voor AI analyse\n\nVoeg minimaal 5 metingen toe", 
                      font=('Arial', 12)).pack(pady=50)
             return
         
-        # Train model
-        self.train_ai_model()
+        # Het model wordt bij het opslaan van metingen bijgewerkt; alleen zonder model (de
+        # eerste fit na het opstarten loopt nog) wordt het hier op de geladen data gefit
+        if not self.ai_analytics.is_trained:
+            self.ai_analytics.train_model(data)
         
         # AI Analyse sectie
         analysis_frame = ttk.LabelFrame(main_frame, text="📊 AI Analyse", padding="15")
@@ -2457,12 +3078,15 @@ class DiabetesTracker:
             
             risk_text = f"⚠️ Hoog risico: {analysis.get('high_risk_percentage', 0):.1f}% | Laag risico: {analysis.get('low_risk_percentage', 0):.1f}%"
             ttk.Label(analysis_frame, text=risk_text, font=('Arial', 11)).pack(anchor=tk.W)
+            
+            for line in format_metrics(analysis.get('metrics')):
+                ttk.Label(analysis_frame, text=line, font=('Arial', 11)).pack(anchor=tk.W)
         
         # AI Aanbevelingen sectie
         recommendations_frame = ttk.LabelFrame(main_frame, text="💡 AI Aanbevelingen", padding="15")
         recommendations_frame.pack(fill=tk.X, pady=(0, 20))
         
-        recommendations = self.ai_analytics.get_ai_recommendations(data)
+        recommendations = self.ai_analytics.get_ai_recommendations(data, analysis)
         
         for rec in recommendations:
             ttk.Label(recommendations_frame, text=f"• {rec}", 
@@ -2509,8 +3133,23 @@ class DiabetesTracker:
             except Exception as e:
                 self.prediction_result.set(f"❌ Fout: {str(e)}")
         
-        ttk.Button(prediction_frame, text="🔮 Maak Voorspelling", 
-                  command=make_prediction, style='primary.TButton').pack(pady=10)
+        def show_forecast(hours):
+            try:
+                if not self.ai_analytics.is_trained:
+                    self.prediction_result.set("❌ AI model niet getraind")
+                    return
+                self.show_forecast_chart(pd.to_datetime(pred_date.get()), hours)
+            except Exception as e:
+                self.prediction_result.set(f"❌ Fout: {str(e)}")
+        
+        prediction_buttons = ttk.Frame(prediction_frame)
+        prediction_buttons.pack(pady=10)
+        ttk.Button(prediction_buttons, text="🔮 Maak Voorspelling", 
+                  command=make_prediction, style='primary.TButton').pack(side=tk.LEFT, padx=(0, 15))
+        ttk.Button(prediction_buttons, text="📈 Curve 24 uur", 
+                  command=lambda: show_forecast(24), style='secondary.TButton').pack(side=tk.LEFT, padx=(0, 15))
+        ttk.Button(prediction_buttons, text="📈 Curve 7 dagen", 
+                  command=lambda: show_forecast(24 * 7), style='secondary.TButton').pack(side=tk.LEFT)
         
         # Notificaties sectie
         notifications_frame = ttk.LabelFrame(main_frame, text="🔔 Notificaties & Herinneringen", padding="15")
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Glykemische Metrieken voor Diabetes Tracker
+Standaard maten voor glucosecontrole, gevectoriseerd met numpy zodat ook reeksen van meer
+dan een miljoen CGM punten in minder dan een seconde verwerkt worden:
+tijd in bereik per band (internationale consensus), GMI, variatiecoëfficiënt, MAGE,
+LBGI/HBGI (Kovatchev) en J-index. Alle waarden in mg/dL; percentages zijn aandelen van
+de metingen (bij vingerprikken zijn dat geen gelijke tijdsintervallen).
+"""
+
+import numpy as np
+
+# Consensus banden (mg/dL), van laag naar hoog
+BANDS = {
+    'very_low': "Zeer laag (<54)",
+    'low': "Laag (54-69)",
+    'in_range': "In bereik (70-180)",
+    'high': "Hoog (181-250)",
+    'very_high': "Zeer hoog (>250)",
+}
+
+STABLE_CV = 36.0  # variatiecoëfficiënt (%) waaronder glucose als stabiel geldt
+DAY = 86400
+
+
+def _clean(values):
+    """float64 array zonder NaN en niet-positieve waarden"""
+    values = np.asarray(values, dtype=float).ravel()
+    return values[np.isfinite(values) & (values > 0)]
+
+
+def band_index(values):
+    """Band per meting als index in BANDS: <54, 54-69, 70-180, 181-250, >250"""
+    return (values >= 54).astype(np.intp) + (values >= 70) + (values > 180) + (values > 250)
+
+
+def risk_values(values):
+    """(laag, hoog) risico per meting volgens Kovatchev: r = 10 * f(g)^2"""
+    f = 1.509 * (np.log(values) ** 1.084 - 5.381)
+    risk = 10 * f ** 2
+    return np.where(f < 0, risk, 0.0), np.where(f > 0, risk, 0.0)
+
+
+def mage(values, sd=None):
+    """Mean Amplitude of Glycemic Excursions over een tijdsgeordende reeks
+
+    Een schommeling telt als die minstens één standaardafwijking groot is; kleinere
+    schommelingen splitsen een grote stijging of daling niet. De voorbewerking (herhaalde
+    waarden samenvoegen, keerpunten zoeken) is gevectoriseerd; alleen de keerpunten worden
+    daarna één keer doorlopen.
+    """
+    values = _clean(values)
+    if len(values) < 3:
+        return float('nan')
+    sd = values.std(ddof=1) if sd is None else sd
+    if not sd > 0:
+        return 0.0
+
+    # Herhaalde waarden samenvoegen en alleen lokale pieken en dalen (plus de uiteinden) houden
+    values = values[np.concatenate(([True], np.diff(values) != 0))]
+    if len(values) < 2:
+        return float('nan')
+    direction = np.sign(np.diff(values))
+    turning = np.concatenate(([True], direction[1:] != direction[:-1], [True]))
+    points = values[turning].tolist()
+
+    # Zigzag met drempel sd: een nieuwe richting geldt pas na een beweging van minstens sd
+    swings = []
+    lowest = highest = anchor = extreme = points[0]
+    rising = None
+    for value in points[1:]:
+        if rising is None:
+            # Eerste richting: zodra hoogste en laagste waarde sd uit elkaar liggen
+            lowest, highest = min(lowest, value), max(highest, value)
+            if highest - lowest >= sd:
+                rising = value == highest
+                anchor, extreme = (lowest, highest) if rising else (highest, lowest)
+        elif rising:
+            if value > extreme:
+                extreme = value
+            elif extreme - value >= sd:
+                swings.append(extreme - anchor)
+                anchor, extreme, rising = extreme, value, False
+        else:
+            if value < extreme:
+                extreme = value
+            elif value - extreme >= sd:
+                swings.append(anchor - extreme)
+                anchor, extreme, rising = extreme, value, True
+    if rising is not None and abs(extreme - anchor) >= sd:
+        swings.append(abs(extreme - anchor))
+    return float(np.mean(swings)) if swings else float('nan')
+
+
+def glycemic_metrics(values):
+    """Alle metrieken van één (tijdsgeordende) reeks bloedwaarden als dictionary
+
+    Sleutels: count, mean, sd, cv, gmi, mage, lbgi, hbgi, j_index en per band uit BANDS
+    het percentage metingen; leeg als er geen geldige waarden zijn.
+    """
+    values = _clean(values)
+    count = len(values)
+    if not count:
+        return {}
+
+    mean = values.mean()
+    sd = values.std(ddof=1) if count > 1 else 0.0
+    low_risk, high_risk = risk_values(values)
+    band_counts = np.bincount(band_index(values), minlength=len(BANDS))
+
+    metrics = {
+        'count': count,
+        'mean': float(mean),
+        'sd': float(sd),
+        'cv': float(sd / mean * 100),
+        'gmi': float(3.31 + 0.02392 * mean),
+        'mage': mage(values, sd),
+        'lbgi': float(low_risk.mean()),
+        'hbgi': float(high_risk.mean()),
+        'j_index': float(0.001 * (mean + sd) ** 2),
+    }
+    for band, band_count in zip(BANDS, band_counts):
+        metrics[band] = float(band_count / count * 100)
+    return metrics
+
+
+def window_metrics(ts, values, start_ts, end_ts):
+    """Metrieken van de metingen met start_ts <= ts < end_ts (ts oplopend gesorteerd)"""
+    ts = np.asarray(ts)
+    first, last = np.searchsorted(ts, [start_ts, end_ts])
+    return glycemic_metrics(np.asarray(values, dtype=float)[first:last])
+
+
+def metrics_per_window(ts, values, window_seconds=DAY, origin=None, with_mage=True):
+    """Metrieken per aaneengesloten venster van window_seconds (standaard per dag)
+
+    ts zijn oplopende ts waarden (wandklok als UTC, dus dagvensters vallen op middernacht).
+    Tellers, gemiddelden, spreiding, banden en risico's worden voor alle vensters tegelijk
+    berekend met bincount; MAGE per venster op de bijbehorende slice.
+    Geeft een dictionary van numpy arrays, met 'start' de ts waar elk venster begint;
+    vensters zonder metingen worden overgeslagen.
+    """
+    ts = np.asarray(ts, dtype='int64')
+    values = np.asarray(values, dtype=float)
+    valid = np.isfinite(values) & (values > 0)
+    ts, values = ts[valid], values[valid]
+    if not len(values):
+        return {}
+
+    origin = (ts[0] // window_seconds) * window_seconds if origin is None else origin
+    window = (ts - origin) // window_seconds
+    starts, inverse, counts = np.unique(window, return_inverse=True, return_counts=True)
+    n = len(starts)
+
+    sums = np.bincount(inverse, values, n)
+    mean = sums / counts
+    squares = np.bincount(inverse, (values - mean[inverse]) ** 2, n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sd = np.where(counts > 1, np.sqrt(squares / (counts - 1)), 0.0)
+    low_risk, high_risk = risk_values(values)
+    band = band_index(values)
+    band_counts = np.bincount(inverse * len(BANDS) + band, minlength=n * len(BANDS)).reshape(n, len(BANDS))
+
+    result = {
+        'start': origin + starts * window_seconds,
+        'count': counts,
+        'mean': mean,
+        'sd': sd,
+        'cv': sd / mean * 100,
+        'gmi': 3.31 + 0.02392 * mean,
+        'lbgi': np.bincount(inverse, low_risk, n) / counts,
+        'hbgi': np.bincount(inverse, high_risk, n) / counts,
+        'j_index': 0.001 * (mean + sd) ** 2,
+    }
+    for column, name in enumerate(BANDS):
+        result[name] = band_counts[:, column] / counts * 100
+    if with_mage:
+        # Metingen zijn op ts gesorteerd, dus elk venster is een aaneengesloten slice
+        bounds = np.concatenate(([0], np.cumsum(counts)))
+        result['mage'] = np.array([mage(values[bounds[i]:bounds[i + 1]], sd[i]) if counts[i] >= 3 else np.nan
+                                   for i in range(n)])
+    return result
+
+
+def format_metrics(metrics):
+    """Korte tekstregels voor weergave in de analyse schermen"""
+    if not metrics:
+        return []
+    mage_text = "n.v.t." if np.isnan(metrics['mage']) else f"{metrics['mage']:.1f} mg/dL"
+    return [
+        f"🎯 {BANDS['in_range']}: {metrics['in_range']:.1f}% | "
+        f"onder: {metrics['low'] + metrics['very_low']:.1f}% (<54: {metrics['very_low']:.1f}%) | "
+        f"boven: {metrics['high'] + metrics['very_high']:.1f}% (>250: {metrics['very_high']:.1f}%)",
+        f"🧪 GMI: {metrics['gmi']:.1f}% | CV: {metrics['cv']:.1f}% | MAGE: {mage_text}",
+        f"⚖️ LBGI: {metrics['lbgi']:.2f} | HBGI: {metrics['hbgi']:.2f} | J-index: {metrics['j_index']:.1f}",
+    ]
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Virtuele Geschiedenis Weergave voor Diabetes Tracker
+Laadt metingen pagina voor pagina tijdens het scrollen (keyset paginering op ts, id)
+en houdt alleen een begrensd venster van rijen in de Treeview
+"""
+
+from archive import page_before, page_after
+from timestamps import TS_MAX
+
+HISTORY_COLUMNS = '''id, ts, datum, tijd, bloedwaarde, medicatie, activiteit, gewicht, opmerkingen,
+                     medicatie_hoeveelheid, insuline_ingenomen, insuline_vergeten'''
+
+
+class VirtualHistoryView:
+    """Koppelt een Treeview aan de bloedwaarden tabel via de database worker
+
+    De rijen staan van nieuw naar oud. Item ids in de Treeview zijn de rowids.
+    """
+
+    def __init__(self, tree, scrollbar, db_worker, page_size=100, window_pages=3,
+                 format_row=None, error_callback=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.db_worker = db_worker
+        self.page_size = page_size
+        self.window_pages = window_pages
+        self.format_row = format_row or (lambda row: row[2:])
+        self.error_callback = error_callback
+
+        self.keys = []  # (ts, id) van de geladen rijen, zelfde volgorde als de Treeview
+        self.at_newest = True  # venster begint bij de nieuwste meting
+        self.at_oldest = False  # venster eindigt bij de oudste meting
+        self.loading = False
+        self.generation = 0  # verhoogd bij reload zodat late pagina's genegeerd worden
+
+        self.tree.configure(yscrollcommand=self.on_scroll)
+
+    @property
+    def max_rows(self):
+        return self.page_size * self.window_pages
+
+    def set_page_size(self, page_size):
+        """Pas de paginagrootte aan (max_records_display); geldt vanaf de volgende reload"""
+        self.page_size = max(10, page_size)
+
+    def reload(self):
+        """Begin opnieuw bij de nieuwste metingen"""
+        self.generation += 1
+        self.loading = True
+        generation = self.generation
+        self.db_worker.submit(lambda conn: page_before(conn, HISTORY_COLUMNS, (TS_MAX, 0), self.page_size),
+                              callback=lambda rows: self._on_first_page(rows, generation),
+                              error_callback=self._on_error, label="history_first_page", kind='read')
+
+    def on_scroll(self, first, last):
+        """yscrollcommand: update de scrollbar en laad een pagina als de rand in zicht komt"""
+        self.scrollbar.set(first, last)
+        if self.loading or not self.keys:
+            return
+        first, last = float(first), float(last)
+        if last >= 0.9 and not self.at_oldest:
+            self._load_older()
+        elif first <= 0.1 and not self.at_newest:
+            self._load_newer()
+
+    def _load_older(self):
+        key = self.keys[-1]
+        self.loading = True
+        generation = self.generation
+        # Keyset pagina over diabetes_data.db en de jaararchieven die voor key liggen
+        self.db_worker.submit(lambda conn: page_before(conn, HISTORY_COLUMNS, key, self.page_size),
+                              callback=lambda rows: self._on_older_page(rows, generation),
+                              error_callback=self._on_error, label="history_older_page", kind='read')
+
+    def _load_newer(self):
+        key = self.keys[0]
+        self.loading = True
+        generation = self.generation
+        self.db_worker.submit(lambda conn: page_after(conn, HISTORY_COLUMNS, key, self.page_size),
+                              callback=lambda rows: self._on_newer_page(rows, generation),
+                              error_callback=self._on_error, label="history_newer_page", kind='read')
+
+    def _on_first_page(self, rows, generation):
+        if generation != self.generation:
+            return
+        self.tree.delete(*self.tree.get_children())
+        self.keys = []
+        self.at_newest = True
+        self.at_oldest = len(rows) < self.page_size
+        for row in rows:
+            self._insert(row, 'end')
+        self.loading = False
+
+    def _on_older_page(self, rows, generation):
+        if generation != self.generation:
+            return
+        self.at_oldest = len(rows) < self.page_size
+        if rows:
+            anchor = self._first_visible()
+            for row in rows:
+                self._insert(row, 'end')
+            # Venster begrenzen: rijen bovenaan vallen weg
+            excess = len(self.keys) - self.max_rows
+            if excess > 0:
+                self._trim(0, excess)
+                self.at_newest = False
+            self._restore_view(anchor)
+        self.loading = False
+
+    def _on_newer_page(self, rows, generation):
+        if generation != self.generation:
+            return
+        self.at_newest = len(rows) < self.page_size
+        if rows:
+            anchor = self._first_visible()
+            for row in rows:
+                self._insert(row, 0)
+            excess = len(self.keys) - self.max_rows
+            if excess > 0:
+                self._trim(len(self.keys) - excess, excess)
+                self.at_oldest = False
+            self._restore_view(anchor)
+        self.loading = False
+
+    def add_row(self, row):
+        """Voeg een nieuw opgeslagen meting op de juiste gesorteerde positie toe
+
+        Rijen die buiten het geladen venster vallen worden overgeslagen; die komen
+        vanzelf binnen bij het scrollen.
+        """
+        if row[1] is None or self.tree.exists(str(row[0])):
+            return False
+        key = (row[1], row[0])
+        index = self._position(key)
+        if (index == 0 and not self.at_newest) or (index == len(self.keys) and not self.at_oldest):
+            return False
+
+        self._insert(row, index if index < len(self.keys) else 'end')
+        excess = len(self.keys) - self.max_rows
+        if excess > 0:
+            self._trim(len(self.keys) - excess, excess)
+            self.at_oldest = False
+        return True
+
+    def remove_row(self, row_id):
+        """Verwijder een meting uit de weergave als die geladen is"""
+        iid = str(row_id)
+        if not self.tree.exists(iid):
+            return False
+        del self.keys[self.tree.index(iid)]
+        self.tree.delete(iid)
+        return True
+
+    def update_row(self, row):
+        """Vervang een bewerkte meting; de positie kan veranderen als datum of tijd gewijzigd is"""
+        iid = str(row[0])
+        if self.tree.exists(iid) and self.keys[self.tree.index(iid)] == (row[1], row[0]):
+            self.tree.item(iid, values=self.format_row(row))
+            return True
+        self.remove_row(row[0])
+        return self.add_row(row)
+
+    def selected_ids(self):
+        """Rowids van de geselecteerde rijen"""
+        return [int(iid) for iid in self.tree.selection()]
+
+    def _position(self, key):
+        """Index waar key hoort in de aflopend gesorteerde sleutellijst (binair zoeken)"""
+        low, high = 0, len(self.keys)
+        while low < high:
+            middle = (low + high) // 2
+            if self.keys[middle] > key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _insert(self, row, index):
+        """Voeg één rij toe aan de Treeview en de sleutellijst"""
+        key = (row[1], row[0])
+        self.tree.insert('', index, iid=str(row[0]), values=self.format_row(row))
+        if index == 'end':
+            self.keys.append(key)
+        else:
+            self.keys.insert(index, key)
+
+    def _trim(self, start, count):
+        """Verwijder count rijen vanaf positie start"""
+        removed = self.keys[start:start + count]
+        self.tree.delete(*[str(row_id) for ts, row_id in removed])
+        del self.keys[start:start + count]
+
+    def _first_visible(self):
+        """Item dat nu bovenaan in beeld staat"""
+        if not self.keys:
+            return None
+        index = min(len(self.keys) - 1, int(self.tree.yview()[0] * len(self.keys)))
+        return str(self.keys[index][1])
+
+    def _restore_view(self, anchor):
+        """Houd hetzelfde item bovenaan na het toevoegen of weghalen van rijen"""
+        if anchor and self.tree.exists(anchor):
+            index = self.tree.index(anchor)
+            self.tree.yview_moveto(index / max(1, len(self.keys)))
+
+    def _on_error(self, error):
+        self.loading = False
+        if self.error_callback:
+            self.error_callback(error)
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Database Onderhoud voor Diabetes Tracker
+Voert PRAGMA optimize, ANALYZE, quick_check en incremental vacuum uit in kleine stappen op de
+database worker, alleen als de applicatie stil staat. Oudere databases zonder
+auto_vacuum=INCREMENTAL worden daarbij één keer omgezet. Of een taak nodig is hangt af van het
+aantal gewijzigde rijen sinds de vorige keer (volgnummer van het wijzigingsjournaal) en van
+de tijd sinds de laatste uitvoering. Elke stap komt in maintenance_log.
+"""
+
+import time
+import sqlite3
+from datetime import datetime, timedelta
+
+from change_journal import has_change_journal, current_seq, prune_journal
+
+MAINTENANCE_LOG_TABLE = '''
+    CREATE TABLE IF NOT EXISTS maintenance_log (
+        id INTEGER PRIMARY KEY,
+        gestart TEXT NOT NULL,
+        taak TEXT NOT NULL,
+        object TEXT,
+        duur_ms REAL,
+        resultaat TEXT,
+        seq INTEGER
+    )
+'''
+
+MAINTENANCE_LOG_INDEX = '''
+    CREATE INDEX IF NOT EXISTS idx_maintenance_log_taak ON maintenance_log(taak, id)
+'''
+
+# Een taak is nodig na 'churn' gewijzigde rijen of als de laatste uitvoering 'days' geleden is
+MAINTENANCE_THRESHOLDS = {
+    'optimize': {'churn': 1000, 'days': 1},
+    'analyze': {'churn': 5000, 'days': 7},
+    'quick_check': {'churn': 20000, 'days': 7},
+    'incremental_vacuum': {'free_pages': 256},
+}
+
+ANALYSIS_LIMIT = 1000  # rijen per index die ANALYZE bekijkt, houdt elke stap kort
+VACUUM_PAGES = 128  # pagina's per incremental_vacuum aanroep
+LOG_RETENTION_DAYS = 90
+
+
+def ensure_maintenance_log(conn):
+    """Maak de onderhoudslog aan"""
+    conn.execute(MAINTENANCE_LOG_TABLE)
+    conn.execute(MAINTENANCE_LOG_INDEX)
+    conn.commit()
+
+
+def _journal_seq(conn):
+    """Huidig volgnummer van het wijzigingsjournaal, of None zonder journaal"""
+    if not has_change_journal(conn):
+        return None
+    return current_seq(conn)
+
+
+def _tables(conn):
+    """Gewone tabellen in main (geen virtuele tabellen en geen sqlite_ interne tabellen)"""
+    return [row[0] for row in conn.execute('''
+        SELECT name FROM main.sqlite_master
+        WHERE type = 'table' AND name NOT LIKE 'sqlite_%' AND sql NOT LIKE 'CREATE VIRTUAL%'
+        ORDER BY name
+    ''')]
+
+
+def last_run(conn, task):
+    """(gestart, seq) van de laatste uitvoering van een taak, of (None, None)"""
+    row = conn.execute('''
+        SELECT gestart, seq FROM maintenance_log WHERE taak = ? ORDER BY id DESC LIMIT 1
+    ''', (task,)).fetchone()
+    return row if row else (None, None)
+
+
+def is_due(conn, task, seq, now=None):
+    """Controleer of een taak nodig is op basis van gewijzigde rijen en tijd sinds de laatste keer
+
+    Geeft (nodig, churn) met churn = gewijzigde rijen sinds de laatste uitvoering (None zonder journaal).
+    """
+    now = now or datetime.now()
+    threshold = MAINTENANCE_THRESHOLDS[task]
+    started, last_seq = last_run(conn, task)
+    churn = seq - (last_seq or 0) if seq is not None else None
+    if started is None:
+        return True, churn
+    if churn is not None and churn >= threshold['churn']:
+        return True, churn
+    age = now - datetime.strptime(started, '%Y-%m-%d %H:%M:%S')
+    return age >= timedelta(days=threshold['days']), churn
+
+
+def plan_maintenance(conn, now=None):
+    """Stel de lijst onderhoudsstappen (taak, object) samen die nu nodig zijn
+
+    ANALYZE en quick_check gaan per tabel, incremental vacuum per VACUUM_PAGES pagina's,
+    zodat elke stap op de worker kort blijft.
+    """
+    seq = _journal_seq(conn)
+    steps = []
+
+    for task in ('optimize', 'analyze', 'quick_check'):
+        if not is_due(conn, task, seq, now)[0]:
+            continue
+        if task == 'optimize':
+            steps.append(('optimize', None))
+        else:
+            steps.extend((task, table) for table in _tables(conn))
+
+    auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if auto_vacuum == 0:
+        # Databases van voor auto_vacuum=INCREMENTAL: één keer omzetten, daarna kan vrije
+        # ruimte in kleine stappen teruggegeven worden
+        steps.append(('convert_auto_vacuum', None))
+    elif auto_vacuum == 2 and free_pages >= MAINTENANCE_THRESHOLDS['incremental_vacuum']['free_pages']:
+        steps.append(('incremental_vacuum', free_pages))
+    return steps
+
+
+def run_step(conn, task, target, budget_ms=50):
+    """Voer één onderhoudsstap uit en log die
+
+    Geeft (resultaat, vervolgstap): incremental vacuum stopt na budget_ms en geeft dan
+    een vervolgstap met de resterende pagina's terug, andere stappen geven None.
+    """
+    started = time.perf_counter()
+    gestart = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    next_step = None
+
+    if task == 'optimize':
+        conn.execute("PRAGMA optimize")
+        result = "ok"
+    elif task == 'analyze':
+        conn.execute(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
+        conn.execute(f'ANALYZE main."{target}"')
+        result = "ok"
+    elif task == 'quick_check':
+        try:
+            rows = conn.execute(f'PRAGMA main.quick_check("{target}")').fetchall()
+        except sqlite3.OperationalError:
+            # SQLite ouder dan 3.33 kent geen quick_check per tabel
+            rows = conn.execute("PRAGMA main.quick_check").fetchall()
+        result = "; ".join(row[0] for row in rows[:10])
+    elif task == 'convert_auto_vacuum':
+        # auto_vacuum wijzigen vraagt een volledige VACUUM; niet te splitsen, dus alleen als
+        # de applicatie stil staat en nooit op de Tk thread
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        result = "ok" if mode == 2 else f"auto_vacuum={mode}"
+    elif task == 'incremental_vacuum':
+        freed = 0
+        while (time.perf_counter() - started) * 1000 < budget_ms:
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not before:
+                break
+            conn.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES})").fetchall()
+            freed += before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        result = f"{freed} pagina's vrijgegeven, {remaining} vrij"
+        if remaining and freed:
+            next_step = ('incremental_vacuum', remaining)
+    else:
+        raise ValueError(f"Onbekende onderhoudstaak: {task}")
+
+    duration_ms = (time.perf_counter() - started) * 1000
+    log_step(conn, gestart, task, target, duration_ms, result)
+    if task == 'quick_check' and result != 'ok':
+        print(f"❌ Integriteitscontrole {target}: {result}")
+    return result, next_step
+
+
+def log_step(conn, gestart, task, target, duration_ms, result):
+    """Schrijf een stap in maintenance_log, met het journaal volgnummer voor de churn meting"""
+    conn.execute('''
+        INSERT INTO maintenance_log (gestart, taak, object, duur_ms, resultaat, seq)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (gestart, task, None if target is None else str(target), round(duration_ms, 2), result,
+          _journal_seq(conn)))
+    conn.commit()
+
+
+def prune_maintenance_log(conn, days=LOG_RETENTION_DAYS):
+    """Verwijder logregels ouder dan days, behalve de laatste per taak (nodig voor is_due)"""
+    cutoff = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+    removed = conn.execute('''
+        DELETE FROM maintenance_log
+        WHERE gestart < ? AND id NOT IN (SELECT MAX(id) FROM maintenance_log GROUP BY taak)
+    ''', (cutoff,)).rowcount
+    conn.commit()
+    return removed
+
+
+def recent_log(conn, limit=200):
+    """(gestart, taak, object, duur_ms, resultaat) van de laatste stappen, nieuwste eerst"""
+    return conn.execute('''
+        SELECT gestart, taak, object, duur_ms, resultaat FROM maintenance_log ORDER BY id DESC LIMIT ?
+    ''', (limit,)).fetchall()
+
+
+class MaintenanceScheduler:
+    """Plant onderhoudsstappen op de database worker tijdens stille periodes
+
+    Stil betekent: geen toetsaanslag of klik sinds idle_seconds en een lege worker wachtrij.
+    Elke controle (check_interval_ms) stelt zo nodig een plan op; daarna gaat er per
+    step_gap_ms één stap naar de worker zolang de applicatie stil blijft.
+    """
+
+    def __init__(self, root, db_worker, idle_seconds=30, check_interval_ms=5 * 60 * 1000,
+                 step_gap_ms=250, budget_ms=50):
+        self.root = root
+        self.db_worker = db_worker
+        self.idle_seconds = idle_seconds
+        self.check_interval_ms = check_interval_ms
+        self.step_gap_ms = step_gap_ms
+        self.budget_ms = budget_ms
+        self.last_activity = time.monotonic()
+        self.steps = []
+        self.busy = False
+        self.enabled = True
+
+    def start(self):
+        """Volg gebruikersactiviteit en start de periodieke controle"""
+        for sequence in ('<KeyPress>', '<ButtonPress>'):
+            self.root.bind_all(sequence, self.touch, add='+')
+        self.root.after(self.check_interval_ms, self._tick)
+
+    def touch(self, event=None):
+        """Registreer gebruikersactiviteit; lopend onderhoud pauzeert tot het weer stil is"""
+        self.last_activity = time.monotonic()
+
+    def is_idle(self):
+        return (time.monotonic() - self.last_activity >= self.idle_seconds
+                and self.db_worker.is_idle())
+
+    def _tick(self):
+        if self.busy:
+            return
+        if not self.enabled or not self.is_idle():
+            self.root.after(self.check_interval_ms if not self.steps else self.idle_seconds * 1000, self._tick)
+            return
+
+        self.busy = True
+        if self.steps:
+            task, target = self.steps.pop(0)
+            self.db_worker.submit(lambda conn: run_step(conn, task, target, self.budget_ms),
+                                  callback=lambda outcome: self._on_step(task, target, outcome),
+                                  error_callback=lambda e: self._on_error(task, target, e),
+                                  label=f"maintenance_{task}")
+        else:
+            def plan(conn):
+                prune_maintenance_log(conn)
+                if has_change_journal(conn):
+                    # Journaalregels die alle afnemers verwerkt hebben (laagste watermerk)
+                    removed = prune_journal(conn)
+                    if removed:
+                        print(f"🧹 {removed} journaalregels opgeruimd")
+                return plan_maintenance(conn)
+            self.db_worker.submit(plan, callback=self._on_plan,
+                                  error_callback=lambda e: self._on_error('plan', None, e),
+                                  label="maintenance_plan")
+
+    def _on_plan(self, steps):
+        self.busy = False
+        self.steps = list(steps)
+        if self.steps:
+            print(f"🧹 Onderhoud gepland: {len(self.steps)} stappen")
+            self.root.after(self.step_gap_ms, self._tick)
+        else:
+            self.root.after(self.check_interval_ms, self._tick)
+
+    def _on_step(self, task, target, outcome):
+        self.busy = False
+        result, next_step = outcome
+        if next_step:
+            self.steps.insert(0, next_step)
+        if not self.steps:
+            print("🧹 Onderhoud voltooid")
+        self.root.after(self.step_gap_ms if self.steps else self.check_interval_ms, self._tick)
+
+    def _on_error(self, task, target, error):
+        self.busy = False
+        print(f"⚠️ Onderhoud {task} {target or ''} mislukt: {error}")
+        self.steps = []
+        self.root.after(self.check_interval_ms, self._tick)
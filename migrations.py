@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Database Migraties voor Diabetes Tracker
+Versioned migraties met een schema_version tabel. Schema migraties en hun versie regel
+worden in één transactie vastgelegd; gebatchte backfills committen per batch en gaan na een
+onderbreking verder waar ze gebleven waren.
+"""
+
+from datetime import datetime
+
+from timestamps import ensure_timestamp_column
+from rollups import ensure_daily_rollup, ensure_archived_extremes
+from archive import archived_day_extremes
+from reading_medications import ensure_reading_medications, backfill_reading_medications
+from search import ensure_search_index
+from compliance import ensure_schedule_indexes, ensure_compliance_rollup
+from change_journal import ensure_change_journal, refresh_update_trigger
+from maintenance import ensure_maintenance_log
+
+
+def batched(migration):
+    """Markeer een migratie die zelf per batch commit en bij een herstart verder gaat
+
+    De migratie moet idempotent zijn: schema stappen met IF NOT EXISTS en backfills die
+    alleen nog niet verwerkte rijen oppakken (bijv. WHERE ts IS NULL of na het laatste id).
+    """
+    migration.batched = True
+    return migration
+
+
+class _MigrationConnection:
+    """Connectie tijdens één migratie: commit() wacht tot ook de schema_version regel er is"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def commit(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class MigrationEngine:
+    """Voert genummerde migraties uit en houdt de schema versie bij"""
+
+    def __init__(self, conn, batch_size=5000, progress=None):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.progress = progress or self.print_progress
+
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TEXT NOT NULL
+            )
+        ''')
+        self.conn.commit()
+
+    def current_version(self):
+        """Hoogste toegepaste migratie versie (0 als er nog niets is toegepast)"""
+        result = self.conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+        return result[0] or 0
+
+    def pending(self, migrations):
+        """Migraties die nog niet zijn toegepast, in volgorde"""
+        applied = {row[0] for row in self.conn.execute("SELECT version FROM schema_version")}
+        return [m for m in sorted(migrations, key=lambda m: m[0]) if m[0] not in applied]
+
+    def migrate(self, migrations):
+        """Voer alle openstaande migraties uit en geef het aantal toegepaste migraties terug
+
+        Een migratie draait met zijn schema_version regel in één transactie: een fout
+        rolt de hele migratie terug, zodat hij bij de volgende start opnieuw begint.
+        Een @batched migratie commit per batch; een fout rolt alleen de lopende batch terug
+        en de volgende start hervat vanaf de laatste commit. De fout blijft bewaard in self.error.
+        """
+        applied = 0
+        self.error = None
+        for version, name, migration in self.pending(migrations):
+            print(f"🔄 Migratie {version}: {name}")
+            conn = self.conn
+            conn.commit()
+            if not getattr(migration, 'batched', False):
+                conn.execute("BEGIN")
+                self.conn = _MigrationConnection(conn)
+            try:
+                migration(self)
+                conn.execute('''
+                    INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)
+                ''', (version, name, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+                conn.commit()
+                applied += 1
+                print(f"✅ Migratie {version} voltooid")
+            except Exception as e:
+                conn.rollback()
+                # Stop hier: latere migraties kunnen van deze afhangen
+                print(f"❌ Migratie {version} mislukt: {e}")
+                self.error = e
+                break
+            finally:
+                self.conn = conn
+        return applied
+
+    def columns(self, table):
+        """Kolomnamen van een tabel"""
+        return [column[1] for column in self.conn.execute(f"PRAGMA table_info({table})")]
+
+    def table_exists(self, table):
+        """Controleer of een tabel bestaat"""
+        return self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone() is not None
+
+    def add_column(self, table, column_name, column_type):
+        """Voeg een kolom toe als die nog niet bestaat
+
+        ALTER TABLE ADD COLUMN past alleen het schema aan en raakt geen bestaande rijen,
+        dus hiervoor is geen rebuild nodig.
+        """
+        if column_name in self.columns(table):
+            print(f"ℹ️ Kolom '{column_name}' bestaat al")
+            return False
+        self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column_name} {column_type}")
+        print(f"✅ Kolom '{column_name}' succesvol toegevoegd")
+        return True
+
+    @staticmethod
+    def print_progress(table, done, total):
+        """Standaard voortgang: print percentage"""
+        percentage = (done / total * 100) if total else 100
+        print(f"📦 {table}: {done}/{total} rijen verwerkt ({percentage:.0f}%)")
+
+
+def migration_insulin_and_amount_columns(engine):
+    """Kolommen die in eerdere versies zijn toegevoegd"""
+    engine.add_column('bloedwaarden', 'insuline_ingenomen', 'INTEGER')
+    engine.add_column('bloedwaarden', 'insuline_vergeten', 'INTEGER')
+    engine.add_column('bloedwaarden', 'medicatie_hoeveelheid', 'TEXT')
+    engine.conn.commit()
+
+
+@batched
+def migration_timestamp_column(engine):
+    """Integer ts kolom, triggers en covering index"""
+    ensure_timestamp_column(engine.conn, chunk_size=engine.batch_size)
+
+
+def migration_history_keyset_index(engine):
+    """Index op ts (met rowid) voor keyset paginering op (ts, id) in de geschiedenis"""
+    engine.conn.execute("CREATE INDEX IF NOT EXISTS idx_ts_id ON bloedwaarden(ts)")
+    engine.conn.commit()
+
+
+def migration_daily_rollup(engine):
+    """daily_rollup tabel met triggers, gevuld vanuit de bestaande metingen"""
+    ensure_daily_rollup(engine.conn)
+
+
+@batched
+def migration_reading_medications(engine):
+    """reading_medications koppeltabel, gevuld door de bestaande medicatie tekst te ontleden"""
+    ensure_reading_medications(engine.conn)
+    backfill_reading_medications(engine.conn, chunk_size=engine.batch_size,
+                                 progress=lambda done, total: engine.progress('reading_medications', done, total))
+
+
+def migration_search_index(engine):
+    """FTS5 zoekindex over opmerkingen, medicatie en activiteit met sync triggers"""
+    ensure_search_index(engine.conn)
+
+
+def migration_reading_journal(engine):
+    """change_journal met triggers op bloedwaarden en sync_watermarks voor afnemers"""
+    ensure_change_journal(engine.conn, 'bloedwaarden')
+
+
+def migration_maintenance_log(engine):
+    """Log van de geplande onderhoudsstappen"""
+    ensure_maintenance_log(engine.conn)
+
+
+def migration_rollup_archived_extremes(engine):
+    """Min/max van gearchiveerde metingen in daily_rollup, zodat een delete ze niet kwijtraakt"""
+    ensure_archived_extremes(engine.conn, archived_day_extremes())
+    engine.conn.commit()
+
+
+def migration_journal_update_columns(engine):
+    """Journaal update trigger alleen voor echte kolommen, niet voor de ts fix-up"""
+    refresh_update_trigger(engine.conn, 'bloedwaarden')
+    engine.conn.commit()
+
+
+# Migraties voor diabetes_data.db: (versie, naam, functie)
+BLOEDWAARDEN_MIGRATIONS = [
+    (1, "insuline en medicatie hoeveelheid kolommen", migration_insulin_and_amount_columns),
+    (2, "ts kolom met covering index", migration_timestamp_column),
+    (3, "index voor keyset paginering van de geschiedenis", migration_history_keyset_index),
+    (4, "dagelijkse rollup tabel met triggers", migration_daily_rollup),
+    (5, "genormaliseerde medicatie per meting", migration_reading_medications),
+    (6, "FTS5 zoekindex op notities, medicatie en activiteit", migration_search_index),
+    (7, "wijzigingsjournaal voor bloedwaarden", migration_reading_journal),
+    (8, "onderhoudslog", migration_maintenance_log),
+    (9, "min/max van gearchiveerde metingen in de dagelijkse rollup", migration_rollup_archived_extremes),
+    (10, "journaal update trigger zonder ts fix-up", migration_journal_update_columns),
+]
+
+
+def migration_schedule_indexes(engine):
+    """Unieke sleutel per dosis en index op medicatie in medication_schedule"""
+    ensure_schedule_indexes(engine.conn)
+
+
+def migration_compliance_rollup(engine):
+    """compliance_rollup tabel met triggers, gevuld vanuit medication_schedule"""
+    ensure_compliance_rollup(engine.conn)
+
+
+def migration_schedule_journal(engine):
+    """change_journal met triggers op medication_schedule"""
+    ensure_change_journal(engine.conn, 'medication_schedule')
+
+
+# Migraties voor patient_data.db: (versie, naam, functie)
+PATIENT_MIGRATIONS = [
+    (1, "unieke sleutel en indexen voor medication_schedule", migration_schedule_indexes),
+    (2, "compliance rollup per dag en medicatie", migration_compliance_rollup),
+    (3, "wijzigingsjournaal voor medication_schedule", migration_schedule_journal),
+]
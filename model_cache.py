@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Model Cache voor Diabetes Tracker
+Getrainde modellen worden als JSON in models/ bewaard, samen met een vingerafdruk van de data
+(hoogste id, aantal metingen, volgnummer van het wijzigingsjournaal). Bij het opstarten wordt een
+model met dezelfde vingerafdruk direct geladen in plaats van opnieuw getraind. model_registry.json
+houdt per model de versies bij.
+"""
+
+import os
+import json
+import sqlite3
+from datetime import datetime
+
+from online_model import IncrementalLinearModel
+from change_journal import has_change_journal, current_seq
+
+MODEL_DIR = 'models'
+REGISTRY_FILE = 'model_registry.json'
+MODEL_FORMAT = 1  # verhogen als de opslag van de statistieken verandert
+KEEP_VERSIONS = 5
+
+
+def data_fingerprint(conn):
+    """Vingerafdruk van bloedwaarden: hoogste id, aantal rijen en volgnummer van het journaal
+
+    Het volgnummer komt uit sqlite_sequence en daalt dus niet als prune_journal oude
+    journaalregels opruimt; een bewerking gevolgd door een prune blijft zichtbaar.
+    """
+    max_id, count = conn.execute("SELECT COALESCE(MAX(id), 0), COUNT(*) FROM main.bloedwaarden").fetchone()
+    try:
+        seq = current_seq(conn) if has_change_journal(conn) else None
+    except sqlite3.OperationalError:
+        seq = None  # zonder journaal vallen bewerkingen niet op; id en aantal blijven wel gelden
+    return {'max_id': max_id, 'count': count, 'seq': seq}
+
+
+def load_registry(directory=MODEL_DIR):
+    """{modelnaam: [versies, oudste eerst]} uit het register"""
+    path = os.path.join(directory, REGISTRY_FILE)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json(path, data):
+    """Schrijf via een tijdelijk bestand, zodat een afgebroken schrijfactie geen half bestand achterlaat"""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def save_model(name, model, fingerprint, features, directory=MODEL_DIR):
+    """Bewaar een model als nieuwe versie en ruim versies boven KEEP_VERSIONS op; geeft het versienummer"""
+    os.makedirs(directory, exist_ok=True)
+    registry = load_registry(directory)
+    versions = registry.get(name, [])
+    version = versions[-1]['version'] + 1 if versions else 1
+
+    filename = f"{name}_v{version}.json"
+    _write_json(os.path.join(directory, filename), {
+        'format': MODEL_FORMAT,
+        'features': list(features),
+        'state': model.to_state(),
+    })
+
+    versions.append({
+        'version': version,
+        'file': filename,
+        'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'format': MODEL_FORMAT,
+        'features': list(features),
+        'fingerprint': fingerprint,
+        'readings': model.n,
+    })
+    for old in versions[:-KEEP_VERSIONS]:
+        try:
+            os.remove(os.path.join(directory, old['file']))
+        except OSError:
+            pass
+    registry[name] = versions[-KEEP_VERSIONS:]
+    _write_json(os.path.join(directory, REGISTRY_FILE), registry)
+    print(f"💾 Model {name} v{version} opgeslagen ({model.n:.0f} metingen)")
+    return version
+
+
+def load_model(name, fingerprint, features, directory=MODEL_DIR):
+    """Nieuwste versie van een model met dezelfde vingerafdruk en features, of None"""
+    for entry in reversed(load_registry(directory).get(name, [])):
+        if (entry.get('format') != MODEL_FORMAT or entry.get('features') != list(features)
+                or entry.get('fingerprint') != fingerprint):
+            continue
+        try:
+            with open(os.path.join(directory, entry['file']), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            model = IncrementalLinearModel.from_state(data['state'])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Model {name} v{entry['version']} kon niet geladen worden: {e}")
+            continue
+        print(f"⚡ Model {name} v{entry['version']} uit de cache geladen")
+        return model
+    return None
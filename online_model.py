@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Incrementeel Lineair Model voor Diabetes Tracker
+Houdt de voldoende statistieken van een kleinste kwadraten regressie bij (aantal, sommen,
+X'X en X'y). Een meting toevoegen of verwijderen kost O(k²) voor k features, ongeacht de
+lengte van de geschiedenis; de coëfficiënten worden pas bij een voorspelling opgelost.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def time_features(ts):
+    """Features (dag van week, dag van maand, maand, uur, minuten) van ts waarden (wandklok als UTC)"""
+    return moment_features(pd.to_datetime(np.atleast_1d(np.asarray(ts, dtype='int64')), unit='s'))
+
+
+def moment_features(moments):
+    """Zelfde features voor een DatetimeIndex, in één gevectoriseerde stap"""
+    return np.column_stack([moments.dayofweek, moments.day, moments.month,
+                            moments.hour, moments.minute]).astype(float)
+
+
+class IncrementalLinearModel:
+    """Lineaire regressie met intercept op basis van bijgehouden X'X en X'y
+
+    Voorspellingen zijn gelijk aan StandardScaler + LinearRegression op dezelfde data:
+    het stelsel wordt gecentreerd opgelost, zodat features zonder variatie geen gewicht krijgen.
+    """
+
+    def __init__(self, n_features):
+        self.n_features = n_features
+        self.reset()
+
+    def reset(self):
+        """Wis alle statistieken"""
+        self.n = 0
+        self.sum_x = np.zeros(self.n_features)
+        self.sum_y = 0.0
+        self.xtx = np.zeros((self.n_features, self.n_features))
+        self.xty = np.zeros(self.n_features)
+        self.updates_since_fit = 0  # incrementele wijzigingen sinds de laatste exacte fit
+        self._solution = None
+
+    def fit(self, X, y):
+        """Exacte fit: statistieken opnieuw opbouwen uit alle data"""
+        self.reset()
+        self._accumulate(X, y, 1.0)
+        self.updates_since_fit = 0
+
+    def add(self, X, y):
+        """Voeg één of meer metingen toe"""
+        self._accumulate(X, y, 1.0)
+        self.updates_since_fit += len(np.atleast_1d(y))
+
+    def remove(self, X, y):
+        """Verwijder eerder toegevoegde metingen (bijvoorbeeld na een delete)"""
+        self._accumulate(X, y, -1.0)
+        self.updates_since_fit += len(np.atleast_1d(y))
+
+    def _accumulate(self, X, y, sign):
+        X = np.asarray(X, dtype=float).reshape(-1, self.n_features)
+        y = np.asarray(y, dtype=float).reshape(-1)
+        self.n += sign * len(y)
+        self.sum_x += sign * X.sum(axis=0)
+        self.sum_y += sign * y.sum()
+        self.xtx += sign * (X.T @ X)
+        self.xty += sign * (X.T @ y)
+        self._solution = None
+
+    def solve(self):
+        """(coëfficiënten, intercept) uit de gecentreerde normaalvergelijkingen"""
+        if self._solution is None:
+            if self.n < 1:
+                return None
+            mean_x = self.sum_x / self.n
+            mean_y = self.sum_y / self.n
+            covariance = self.xtx - self.n * np.outer(mean_x, mean_x)
+            cross = self.xty - self.n * mean_x * mean_y
+            coef = np.linalg.lstsq(covariance, cross, rcond=None)[0]
+            self._solution = (coef, mean_y - mean_x @ coef)
+        return self._solution
+
+    def predict(self, X):
+        """Voorspellingen voor een matrix met features"""
+        coef, intercept = self.solve()
+        return np.asarray(X, dtype=float).reshape(-1, self.n_features) @ coef + intercept
+
+    def to_state(self):
+        """Statistieken als JSON-geschikte dictionary"""
+        return {
+            'n_features': self.n_features,
+            'n': self.n,
+            'sum_x': self.sum_x.tolist(),
+            'sum_y': self.sum_y,
+            'xtx': self.xtx.tolist(),
+            'xty': self.xty.tolist(),
+            'updates_since_fit': self.updates_since_fit,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Model uit een dictionary van to_state"""
+        model = cls(state['n_features'])
+        model.n = state['n']
+        model.sum_x = np.array(state['sum_x'], dtype=float)
+        model.sum_y = float(state['sum_y'])
+        model.xtx = np.array(state['xtx'], dtype=float).reshape(model.n_features, model.n_features)
+        model.xty = np.array(state['xty'], dtype=float)
+        model.updates_since_fit = state.get('updates_since_fit', 0)
+        return model
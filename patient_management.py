@@ -5,6 +5,8 @@ from datetime import datetime, timedelta
 import json
 from tkcalendar import DateEntry
 import ttkbootstrap as tb
+from connection_manager import get_connection, PATIENT_DB
+from migrations import MigrationEngine, PATIENT_MIGRATIONS
 
 # EID functionaliteit volledig verwijderd in v1.6.0
 
@@ -37,7 +39,8 @@ class PatientProfile:
     def init_patient_database(self):
         """Initialiseer patiënten database"""
         try:
-            self.patient_conn = sqlite3.connect('patient_data.db')
+            # Gedeelde, langlevende connectie uit de connection manager
+            self.patient_conn = get_connection(PATIENT_DB)
             self.patient_cursor = self.patient_conn.cursor()
             
             # Patiënten tabel (vereenvoudigd - zonder EID velden)
@@ -112,6 +115,12 @@ class PatientProfile:
             
             self.patient_conn.commit()
             
+            # Indexen en compliance rollup (versioned migraties in schema_version)
+            engine = MigrationEngine(self.patient_conn)
+            engine.migrate(PATIENT_MIGRATIONS)
+            if engine.error is not None:
+                raise engine.error
+            
         except Exception as e:
             messagebox.showerror("Database Fout", f"Kon patiënten database niet initialiseren: {str(e)}")
 
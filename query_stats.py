@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Query Statistieken voor Diabetes Tracker
+Geïnstrumenteerde sqlite3 connectie en cursor die per statement het aantal uitvoeringen,
+p50/p95 latency (uitvoeren plus ophalen) en het aantal rijen bijhouden. Mislukte statements
+tellen apart als fout en niet mee in de latency. Statements boven een drempel komen met hun
+EXPLAIN QUERY PLAN in een trage query log.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# Statements waarvoor EXPLAIN QUERY PLAN zinvol is (geen DDL, PRAGMA of transactie beheer)
+_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+def normalize(sql):
+    """Statement tekst zonder overbodige witruimte, als sleutel voor de statistieken"""
+    return " ".join(sql.split())
+
+
+def _percentile(values, fraction):
+    """Waarde op fraction (0..1) van een gesorteerde lijst"""
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class QueryStats:
+    """Verzamelt latency en rijen per statement en een begrensde log van trage queries"""
+
+    def __init__(self, slow_query_ms=50, max_samples=500, max_slow=100):
+        self.slow_query_ms = slow_query_ms
+        self.max_samples = max_samples  # latency metingen per statement voor p50/p95
+        self.lock = threading.Lock()
+        self.statements = {}  # genormaliseerde sql -> tellers en recente latencies
+        self.slow_log = deque(maxlen=max_slow)
+        self.keys = {}  # ruwe sql -> genormaliseerde sql (de sqlite3 cache hergebruikt dezelfde strings)
+        self.enabled = True
+
+    def _key(self, sql):
+        key = self.keys.get(sql)
+        if key is None:
+            if len(self.keys) > 2048:
+                self.keys.clear()
+            key = self.keys[sql] = normalize(sql)
+        return key
+
+    def _entry(self, key):
+        """Tellers van een statement (aanroepen met self.lock)"""
+        entry = self.statements.get(key)
+        if entry is None:
+            entry = self.statements[key] = {
+                'count': 0, 'errors': 0, 'rows': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                'samples': deque(maxlen=self.max_samples),
+            }
+        return entry
+
+    def record(self, conn, sql, parameters, elapsed_ms, rows, explain=True):
+        """Leg één geslaagde uitvoering vast; trage statements krijgen hun query plan in de log"""
+        key = self._key(sql)
+        with self.lock:
+            entry = self._entry(key)
+            entry['count'] += 1
+            entry['rows'] += rows
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            entry['samples'].append(elapsed_ms)
+
+        if elapsed_ms >= self.slow_query_ms:
+            plan = explain_plan(conn, sql, parameters) if explain else []
+            with self.lock:
+                self.slow_log.append({
+                    'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    'sql': key,
+                    'ms': round(elapsed_ms, 2),
+                    'rows': rows,
+                    'plan': plan,
+                })
+            print(f"🐢 Trage query ({elapsed_ms:.1f} ms, {rows} rijen): {key[:120]}")
+            for line in plan:
+                print(f"   {line}")
+
+    def record_error(self, sql):
+        """Tel een mislukte uitvoering, los van de latency van de geslaagde"""
+        key = self._key(sql)
+        with self.lock:
+            self._entry(key)['errors'] += 1
+
+    def get_stats(self, order_by='total_ms'):
+        """Per statement: sql, count, errors, rows, total_ms, avg_ms, p50_ms, p95_ms, max_ms; duurste eerst"""
+        with self.lock:
+            items = [(key, dict(entry, samples=sorted(entry['samples']))) for key, entry in self.statements.items()]
+
+        result = []
+        for key, entry in items:
+            samples = entry['samples']
+            result.append({
+                'sql': key,
+                'count': entry['count'],
+                'errors': entry['errors'],
+                'rows': entry['rows'],
+                'total_ms': round(entry['total_ms'], 2),
+                'avg_ms': round(entry['total_ms'] / entry['count'], 3) if entry['count'] else 0.0,
+                'p50_ms': round(_percentile(samples, 0.5), 3) if samples else 0.0,
+                'p95_ms': round(_percentile(samples, 0.95), 3) if samples else 0.0,
+                'max_ms': round(entry['max_ms'], 3),
+            })
+        result.sort(key=lambda stat: stat[order_by], reverse=True)
+        return result
+
+    def get_slow_log(self):
+        """Trage queries, nieuwste laatst"""
+        with self.lock:
+            return list(self.slow_log)
+
+    def dump_json(self, path):
+        """Schrijf statistieken en de trage query log naar een JSON bestand"""
+        data = {
+            'generated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'slow_query_ms': self.slow_query_ms,
+            'statements': self.get_stats(),
+            'slow_queries': self.get_slow_log(),
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        return path
+
+    def reset(self):
+        """Wis alle statistieken en de trage query log"""
+        with self.lock:
+            self.statements.clear()
+            self.slow_log.clear()
+
+
+# Gedeelde statistieken voor alle geïnstrumenteerde connecties
+query_stats = QueryStats()
+
+
+def explain_plan(conn, sql, parameters=()):
+    """EXPLAIN QUERY PLAN regels van een statement (leeg als dat niet kan)"""
+    if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return []
+    try:
+        # Gewone sqlite3 cursor, zodat de EXPLAIN zelf niet gemeten wordt
+        rows = sqlite3.Cursor(conn).execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+    except (sqlite3.Error, ValueError):
+        return []
+    return [row[-1] for row in rows]
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor die de tijd van uitvoeren en ophalen per statement meet
+
+    Een meting wordt afgesloten als alle rijen opgehaald zijn, bij de volgende execute,
+    bij close of als de cursor opgeruimd wordt. Een statement dat een fout geeft telt
+    alleen als fout.
+    """
+
+    _current = None  # [sql, parameters, ms, rijen, explain]
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            cursor = super().execute(sql, parameters)
+        except Exception:
+            self._failed(sql)
+            raise
+        self._current = [sql, parameters, (time.perf_counter() - started) * 1000, 0, True]
+        return cursor
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            cursor = super().executemany(sql, seq_of_parameters)
+        except Exception:
+            self._failed(sql)
+            raise
+        self._current = [sql, (), (time.perf_counter() - started) * 1000, 0, False]
+        self._finish()
+        return cursor
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, 0 if row is None else 1, done=row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(started, len(rows), done=not rows)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows), done=True)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(started, 0, done=True)
+            raise
+        self._fetched(started, 1, done=False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+    def _fetched(self, started, rows, done):
+        current = self._current
+        if current is not None:
+            current[2] += (time.perf_counter() - started) * 1000
+            current[3] += rows
+            if done:
+                self._finish()
+
+    def _failed(self, sql):
+        if query_stats.enabled:
+            query_stats.record_error(sql)
+
+    def _finish(self):
+        current, self._current = self._current, None
+        if current is None or not query_stats.enabled:
+            return
+        sql, parameters, elapsed_ms, rows, explain = current
+        if not rows and self.rowcount > 0:
+            rows = self.rowcount  # INSERT/UPDATE/DELETE
+        query_stats.record(self.connection, sql, parameters, elapsed_ms, rows, explain)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connectie waarvan cursors en execute snelkoppelingen gemeten worden"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Genormaliseerde Medicatie per Meting voor Diabetes Tracker
+De tabel reading_medications koppelt elke meting aan de genomen medicatie (met hoeveelheid en
+eenheid) via een medication_names opzoektabel, in plaats van komma gescheiden tekst in
+bloedwaarden.medicatie en "med: hoeveelheid; ..." in medicatie_hoeveelheid
+"""
+
+import re
+
+from timestamps import TS_MAX
+
+MEDICATION_NAMES_TABLE = '''
+    CREATE TABLE IF NOT EXISTS medication_names (
+        id INTEGER PRIMARY KEY,
+        naam TEXT NOT NULL UNIQUE COLLATE NOCASE
+    )
+'''
+
+READING_MEDICATIONS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS reading_medications (
+        reading_id INTEGER NOT NULL,
+        medication_id INTEGER NOT NULL,
+        amount REAL,
+        unit TEXT,
+        PRIMARY KEY (reading_id, medication_id)
+    ) WITHOUT ROWID
+'''
+
+# Opzoeken van metingen per medicatie (de primary key dient voor opzoeken per meting)
+READING_MEDICATIONS_INDEX = '''
+    CREATE INDEX IF NOT EXISTS idx_reading_medications_medication
+    ON reading_medications(medication_id, reading_id)
+'''
+
+# Verwijderde metingen nemen hun medicatie regels mee
+READING_MEDICATIONS_DELETE_TRIGGER = '''
+    CREATE TRIGGER IF NOT EXISTS reading_medications_delete
+    AFTER DELETE ON bloedwaarden
+    BEGIN
+        DELETE FROM reading_medications WHERE reading_id = OLD.id;
+    END
+'''
+
+# "2", "2,5 tabletten", "10 E", "500mg"
+_AMOUNT = re.compile(r'^\s*(\d+(?:[.,]\d+)?)\s*(.*?)\s*$')
+
+
+def ensure_reading_medications(conn):
+    """Maak de opzoektabel, de koppeltabel, de index en de delete trigger aan"""
+    conn.execute(MEDICATION_NAMES_TABLE)
+    conn.execute(READING_MEDICATIONS_TABLE)
+    conn.execute(READING_MEDICATIONS_INDEX)
+    conn.execute(READING_MEDICATIONS_DELETE_TRIGGER)
+    conn.commit()
+
+
+def parse_amount(text):
+    """Splits een hoeveelheid in (getal, eenheid); zonder getal wordt de tekst de eenheid"""
+    text = (text or "").strip()
+    if not text:
+        return None, None
+    match = _AMOUNT.match(text)
+    if match:
+        return float(match.group(1).replace(',', '.')), match.group(2) or None
+    return None, text
+
+
+def parse_medications(medicatie, medicatie_hoeveelheid):
+    """Zet de tekstvelden van een meting om naar [(naam, hoeveelheid, eenheid)]
+
+    medicatie is "A, B"; medicatie_hoeveelheid is "A: 2 tabletten; B: 10 E".
+    Namen die alleen in de hoeveelheden staan worden ook meegenomen.
+    """
+    amounts = {}
+    order = []
+    for part in (medicatie_hoeveelheid or "").split(';'):
+        name, separator, amount = part.rpartition(':')
+        if not separator:
+            name, amount = amount, ""
+        name = name.strip()
+        if name:
+            amounts[name.lower()] = parse_amount(amount)
+            order.append(name)
+
+    names = [name.strip() for name in (medicatie or "").split(',') if name.strip()]
+    seen = set()
+    result = []
+    for name in names + order:
+        key = name.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        amount, unit = amounts.get(key, (None, None))
+        result.append((name, amount, unit))
+    return result
+
+
+def medication_id(conn, name):
+    """Id van een medicatie naam, aangemaakt als die nog niet bestaat"""
+    conn.execute("INSERT INTO medication_names (naam) VALUES (?) ON CONFLICT(naam) DO NOTHING", (name,))
+    return conn.execute("SELECT id FROM medication_names WHERE naam = ?", (name,)).fetchone()[0]
+
+
+def store_reading_medications(conn, reading_id, medicatie, medicatie_hoeveelheid):
+    """Vervang de medicatie regels van één meting (commit gebeurt door de aanroeper)"""
+    conn.execute("DELETE FROM reading_medications WHERE reading_id = ?", (reading_id,))
+    rows = [(reading_id, medication_id(conn, name), amount, unit)
+            for name, amount, unit in parse_medications(medicatie, medicatie_hoeveelheid)]
+    conn.executemany('''
+        INSERT INTO reading_medications (reading_id, medication_id, amount, unit) VALUES (?, ?, ?, ?)
+    ''', rows)
+    return len(rows)
+
+
+def backfill_reading_medications(conn, chunk_size=5000, progress=None):
+    """Vul reading_medications vanuit de bestaande tekstvelden, in chunks met een commit per chunk
+
+    Hervat na de hoogste al gekoppelde meting. progress krijgt (verwerkt_tot_id, max_id).
+    """
+    last_id = conn.execute("SELECT COALESCE(MAX(reading_id), 0) FROM reading_medications").fetchone()[0]
+    max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM bloedwaarden").fetchone()[0]
+    linked = 0
+
+    while True:
+        rows = conn.execute('''
+            SELECT id, medicatie, medicatie_hoeveelheid
+            FROM bloedwaarden
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+        ''', (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+        for reading_id, medicatie, medicatie_hoeveelheid in rows:
+            if medicatie or medicatie_hoeveelheid:
+                linked += store_reading_medications(conn, reading_id, medicatie, medicatie_hoeveelheid)
+        last_id = rows[-1][0]
+        conn.commit()
+        if progress:
+            progress(last_id, max_id)
+
+    print(f"💊 {linked} medicatie regels gekoppeld aan metingen")
+    return linked
+
+
+def readings_with_medication(conn, name, start_ts=0, end_ts=TS_MAX):
+    """(id, ts, datum, tijd, bloedwaarde, hoeveelheid, eenheid) van metingen met deze medicatie"""
+    return conn.execute('''
+        SELECT b.id, b.ts, b.datum, b.tijd, b.bloedwaarde, rm.amount, rm.unit
+        FROM medication_names n
+        JOIN reading_medications rm ON rm.medication_id = n.id
+        JOIN bloedwaarden b ON b.id = rm.reading_id
+        WHERE n.naam = ? AND b.ts BETWEEN ? AND ?
+        ORDER BY b.ts
+    ''', (name, start_ts, end_ts)).fetchall()
+
+
+def readings_after_medication(conn, name, hours=4):
+    """(inname ts, ts, bloedwaarde) van alle metingen in de uren na een inname van deze medicatie
+
+    Een inname is een meting waarbij de medicatie geregistreerd is; de metingen erna
+    worden per inname met een range scan op idx_ts_covering gevonden.
+    """
+    return conn.execute('''
+        SELECT dose.ts, b.ts, b.bloedwaarde
+        FROM medication_names n
+        JOIN reading_medications rm ON rm.medication_id = n.id
+        JOIN bloedwaarden dose ON dose.id = rm.reading_id
+        JOIN bloedwaarden b ON b.ts > dose.ts AND b.ts <= dose.ts + ?
+        WHERE n.naam = ?
+        ORDER BY dose.ts, b.ts
+    ''', (hours * 3600, name)).fetchall()
+
+
+def medication_summary(conn):
+    """Per medicatie: (naam, aantal metingen, gemiddelde bloedwaarde, totale hoeveelheid), meest gebruikt eerst"""
+    return conn.execute('''
+        SELECT n.naam, COUNT(*), AVG(b.bloedwaarde), TOTAL(rm.amount)
+        FROM reading_medications rm
+        JOIN medication_names n ON n.id = rm.medication_id
+        JOIN bloedwaarden b ON b.id = rm.reading_id
+        GROUP BY rm.medication_id
+        ORDER BY COUNT(*) DESC, n.naam
+    ''').fetchall()
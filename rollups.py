@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Dagelijkse Rollups voor Diabetes Tracker
+De daily_rollup tabel bevat per dag aantal, som, kwadratensom, min, max en gewicht sommen.
+SQLite triggers houden de tabel actueel bij elke insert, update en delete op bloedwaarden,
+zodat overzichten uit hooguit enkele tientallen rollup rijen berekend worden.
+"""
+
+import math
+
+ROLLUP_TABLE = '''
+    CREATE TABLE IF NOT EXISTS daily_rollup (
+        dag TEXT PRIMARY KEY,
+        aantal INTEGER NOT NULL,
+        som REAL NOT NULL,
+        som_kwadraat REAL NOT NULL,
+        min_waarde REAL,
+        max_waarde REAL,
+        gewicht_aantal INTEGER NOT NULL,
+        gewicht_som REAL NOT NULL
+    ) WITHOUT ROWID
+'''
+
+# Een nieuwe rij optellen bij zijn dag (upsert)
+_ADD_ROW = '''
+    INSERT INTO daily_rollup (dag, aantal, som, som_kwadraat, min_waarde, max_waarde, gewicht_aantal, gewicht_som)
+    VALUES (NEW.datum, 1, NEW.bloedwaarde, NEW.bloedwaarde * NEW.bloedwaarde, NEW.bloedwaarde, NEW.bloedwaarde,
+            NEW.gewicht IS NOT NULL, COALESCE(NEW.gewicht, 0))
+    ON CONFLICT(dag) DO UPDATE SET
+        aantal = aantal + 1,
+        som = som + excluded.som,
+        som_kwadraat = som_kwadraat + excluded.som_kwadraat,
+        min_waarde = MIN(min_waarde, excluded.min_waarde),
+        max_waarde = MAX(max_waarde, excluded.max_waarde),
+        gewicht_aantal = gewicht_aantal + excluded.gewicht_aantal,
+        gewicht_som = gewicht_som + excluded.gewicht_som;
+'''
+
+# Een oude rij aftrekken; min/max worden opnieuw bepaald uit de metingen van die ene dag (idx_datum)
+# plus de extremen van de gearchiveerde metingen van die dag (archief_min/archief_max)
+_REMOVE_ROW = '''
+    UPDATE daily_rollup SET
+        aantal = aantal - 1,
+        som = som - OLD.bloedwaarde,
+        som_kwadraat = som_kwadraat - OLD.bloedwaarde * OLD.bloedwaarde,
+        min_waarde = (SELECT MIN(waarde) FROM (SELECT bloedwaarde AS waarde FROM bloedwaarden WHERE datum = OLD.datum
+                                               UNION ALL SELECT daily_rollup.archief_min)),
+        max_waarde = (SELECT MAX(waarde) FROM (SELECT bloedwaarde AS waarde FROM bloedwaarden WHERE datum = OLD.datum
+                                               UNION ALL SELECT daily_rollup.archief_max)),
+        gewicht_aantal = gewicht_aantal - (OLD.gewicht IS NOT NULL),
+        gewicht_som = gewicht_som - COALESCE(OLD.gewicht, 0)
+    WHERE dag = OLD.datum;
+    DELETE FROM daily_rollup WHERE dag = OLD.datum AND aantal <= 0;
+'''
+
+ROLLUP_INSERT_TRIGGER = f'''
+    CREATE TRIGGER IF NOT EXISTS daily_rollup_insert
+    AFTER INSERT ON bloedwaarden
+    BEGIN
+        {_ADD_ROW}
+    END
+'''
+
+ROLLUP_DELETE_TRIGGER = f'''
+    CREATE TRIGGER IF NOT EXISTS daily_rollup_delete
+    AFTER DELETE ON bloedwaarden
+    BEGIN
+        {_REMOVE_ROW}
+    END
+'''
+
+ROLLUP_UPDATE_TRIGGER = f'''
+    CREATE TRIGGER IF NOT EXISTS daily_rollup_update
+    AFTER UPDATE OF datum, bloedwaarde, gewicht ON bloedwaarden
+    BEGIN
+        {_REMOVE_ROW}
+        {_ADD_ROW}
+    END
+'''
+
+ROLLUP_TRIGGERS = [ROLLUP_INSERT_TRIGGER, ROLLUP_DELETE_TRIGGER, ROLLUP_UPDATE_TRIGGER]
+
+# Aggregaten over een datumbereik: (aantal, gemiddelde, min, max, gemiddeld gewicht)
+SUMMARY_SQL = '''
+    SELECT COALESCE(SUM(aantal), 0), SUM(som) / SUM(aantal), MIN(min_waarde), MAX(max_waarde),
+           SUM(gewicht_som) / NULLIF(SUM(gewicht_aantal), 0)
+    FROM daily_rollup
+    WHERE dag BETWEEN ? AND ?
+'''
+
+LAST_DAY = '9999-12-31'  # bovengrens voor open datumbereiken
+
+
+def ensure_daily_rollup(conn):
+    """Maak de rollup tabel en triggers aan en vul de tabel vanuit bestaande metingen"""
+    conn.execute(ROLLUP_TABLE)
+    _ensure_archive_columns(conn)
+    for trigger in ROLLUP_TRIGGERS:
+        conn.execute(trigger)
+    rebuild_daily_rollup(conn)
+
+
+def rebuild_daily_rollup(conn):
+    """Bereken alle rollup rijen opnieuw uit de ruwe metingen (herstelt ook afrondingsdrift)"""
+    conn.execute("DELETE FROM daily_rollup")
+    conn.execute('''
+        INSERT INTO daily_rollup (dag, aantal, som, som_kwadraat, min_waarde, max_waarde, gewicht_aantal, gewicht_som)
+        SELECT datum, COUNT(*), SUM(bloedwaarde), SUM(bloedwaarde * bloedwaarde), MIN(bloedwaarde), MAX(bloedwaarde),
+               COUNT(gewicht), TOTAL(gewicht)
+        FROM bloedwaarden
+        GROUP BY datum
+    ''')
+    conn.commit()
+    days = conn.execute("SELECT COUNT(*) FROM daily_rollup").fetchone()[0]
+    print(f"📊 Dagelijkse rollup opgebouwd voor {days} dagen")
+
+
+def _ensure_archive_columns(conn):
+    """archief_min/archief_max kolommen: extremen van de gearchiveerde metingen per dag"""
+    existing = {row[1] for row in conn.execute("PRAGMA main.table_info(daily_rollup)")}
+    for column in ('archief_min', 'archief_max'):
+        if column not in existing:
+            conn.execute(f"ALTER TABLE main.daily_rollup ADD COLUMN {column} REAL")
+
+
+def ensure_archived_extremes(conn, extremes=()):
+    """Voeg de archief kolommen toe, vernieuw de delete/update triggers en vul de kolommen
+
+    extremes zijn (dag, min, max) rijen uit bestaande jaararchieven (zie archive.archived_day_extremes).
+    """
+    _ensure_archive_columns(conn)
+    conn.execute("DROP TRIGGER IF EXISTS main.daily_rollup_delete")
+    conn.execute("DROP TRIGGER IF EXISTS main.daily_rollup_update")
+    conn.execute(ROLLUP_DELETE_TRIGGER)
+    conn.execute(ROLLUP_UPDATE_TRIGGER)
+    conn.executemany('''
+        UPDATE main.daily_rollup SET
+            archief_min = MIN(COALESCE(archief_min, ?1), ?1),
+            archief_max = MAX(COALESCE(archief_max, ?2), ?2)
+        WHERE dag = ?3
+    ''', [(minimum, maximum, day) for day, minimum, maximum in extremes])
+
+
+def record_archived_extremes(conn, where, params=()):
+    """Leg per dag min en max vast van de metingen in main die aan where voldoen (vóór archiveren)"""
+    conn.execute(f'''
+        UPDATE main.daily_rollup SET
+            archief_min = MIN(COALESCE(archief_min, gearchiveerd.laagste), gearchiveerd.laagste),
+            archief_max = MAX(COALESCE(archief_max, gearchiveerd.hoogste), gearchiveerd.hoogste)
+        FROM (SELECT datum, MIN(bloedwaarde) AS laagste, MAX(bloedwaarde) AS hoogste
+              FROM main.bloedwaarden WHERE {where} GROUP BY datum) AS gearchiveerd
+        WHERE daily_rollup.dag = gearchiveerd.datum
+    ''', params)
+
+
+def has_rollup_triggers(conn):
+    """Controleer of de insert trigger van de rollup bestaat"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'daily_rollup_insert'"
+    ).fetchone() is not None
+
+
+def suspend_insert_trigger(conn):
+    """Verwijder de insert trigger voor een bulk insert (alleen binnen een transactie gebruiken)"""
+    conn.execute("DROP TRIGGER IF EXISTS daily_rollup_insert")
+
+
+def resume_insert_trigger(conn, after_id):
+    """Tel alle rijen met id > after_id in één keer op bij de rollup en herstel de insert trigger"""
+    conn.execute('''
+        INSERT INTO daily_rollup (dag, aantal, som, som_kwadraat, min_waarde, max_waarde, gewicht_aantal, gewicht_som)
+        SELECT datum, COUNT(*), SUM(bloedwaarde), SUM(bloedwaarde * bloedwaarde), MIN(bloedwaarde), MAX(bloedwaarde),
+               COUNT(gewicht), TOTAL(gewicht)
+        FROM bloedwaarden
+        WHERE id > ?
+        GROUP BY datum
+        ON CONFLICT(dag) DO UPDATE SET
+            aantal = aantal + excluded.aantal,
+            som = som + excluded.som,
+            som_kwadraat = som_kwadraat + excluded.som_kwadraat,
+            min_waarde = MIN(min_waarde, excluded.min_waarde),
+            max_waarde = MAX(max_waarde, excluded.max_waarde),
+            gewicht_aantal = gewicht_aantal + excluded.gewicht_aantal,
+            gewicht_som = gewicht_som + excluded.gewicht_som
+    ''', (after_id,))
+    conn.execute(ROLLUP_INSERT_TRIGGER)
+
+
+def suspend_delete_trigger(conn):
+    """Verwijder de delete trigger zodat verwijderde rijen in de rollup blijven (archiveren)"""
+    conn.execute("DROP TRIGGER IF EXISTS main.daily_rollup_delete")
+
+
+def resume_delete_trigger(conn):
+    """Herstel de delete trigger"""
+    conn.execute(ROLLUP_DELETE_TRIGGER)
+
+
+def summarize(conn, start_date, end_date=LAST_DAY):
+    """Geef (aantal, gemiddelde, min, max, gemiddeld gewicht) voor een datumbereik"""
+    return conn.execute(SUMMARY_SQL, (start_date, end_date)).fetchone()
+
+
+def summarize_detailed(conn, start_date='0000-01-01', end_date=LAST_DAY):
+    """Uitgebreide samenvatting met standaardafwijking, periode en aantal dagen"""
+    row = conn.execute('''
+        SELECT SUM(aantal), SUM(som), SUM(som_kwadraat), MIN(min_waarde), MAX(max_waarde),
+               SUM(gewicht_som), SUM(gewicht_aantal), MIN(dag), MAX(dag), COUNT(*)
+        FROM daily_rollup
+        WHERE dag BETWEEN ? AND ?
+    ''', (start_date, end_date)).fetchone()
+
+    count, total, total_squares, minimum, maximum, weight_total, weight_count, first_day, last_day, days = row
+    if not count:
+        return None
+
+    mean = total / count
+    # Steekproef standaardafwijking (zoals pandas .std()) uit som en kwadratensom
+    variance = (total_squares - count * mean * mean) / (count - 1) if count > 1 else 0.0
+    return {
+        'count': count,
+        'mean': mean,
+        'std': math.sqrt(max(variance, 0.0)),
+        'min': minimum,
+        'max': maximum,
+        'avg_weight': (weight_total / weight_count) if weight_count else None,
+        'first_day': first_day,
+        'last_day': last_day,
+        'days': days,
+    }
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Zoeken in Metingen voor Diabetes Tracker
+FTS5 index over opmerkingen, medicatie en activiteit van bloedwaarden, bijgehouden door
+triggers. Zoekopdrachten gebruiken de FTS5 syntax ("hypo AND sport", "sport*", "\"na het eten\"")
+en worden gerangschikt op relevantie (bm25).
+"""
+
+import re
+import sqlite3
+
+FTS_TABLE = 'bloedwaarden_fts'
+
+# External content tabel: de tekst staat alleen in bloedwaarden, de index verwijst via rowid = id
+FTS_CREATE = f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        opmerkingen, medicatie, activiteit,
+        content='bloedwaarden', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+'''
+
+FTS_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS bloedwaarden_fts_insert
+    AFTER INSERT ON bloedwaarden
+    BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, opmerkingen, medicatie, activiteit)
+        VALUES (NEW.id, NEW.opmerkingen, NEW.medicatie, NEW.activiteit);
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS bloedwaarden_fts_delete
+    AFTER DELETE ON bloedwaarden
+    BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, opmerkingen, medicatie, activiteit)
+        VALUES ('delete', OLD.id, OLD.opmerkingen, OLD.medicatie, OLD.activiteit);
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS bloedwaarden_fts_update
+    AFTER UPDATE OF opmerkingen, medicatie, activiteit ON bloedwaarden
+    BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, opmerkingen, medicatie, activiteit)
+        VALUES ('delete', OLD.id, OLD.opmerkingen, OLD.medicatie, OLD.activiteit);
+        INSERT INTO {FTS_TABLE} (rowid, opmerkingen, medicatie, activiteit)
+        VALUES (NEW.id, NEW.opmerkingen, NEW.medicatie, NEW.activiteit);
+    END
+    ''',
+]
+
+# Resultaat kolommen: id, ts, datum, tijd, bloedwaarde, medicatie, activiteit, opmerkingen, fragment
+SEARCH_SQL = f'''
+    SELECT b.id, b.ts, b.datum, b.tijd, b.bloedwaarde, b.medicatie, b.activiteit, b.opmerkingen,
+           snippet({FTS_TABLE}, -1, '[', ']', '…', 10)
+    FROM {FTS_TABLE}
+    JOIN bloedwaarden b ON b.id = {FTS_TABLE}.rowid
+    WHERE {FTS_TABLE} MATCH ?
+    ORDER BY rank
+    LIMIT ?
+'''
+
+# Zonder FTS5 (oude SQLite builds): LIKE op alle woorden, nieuwste eerst
+_LIKE_SQL = '''
+    SELECT id, ts, datum, tijd, bloedwaarde, medicatie, activiteit, opmerkingen, opmerkingen
+    FROM bloedwaarden
+    WHERE {conditions}
+    ORDER BY ts DESC
+    LIMIT ?
+'''
+
+
+def fts_available(conn):
+    """Controleer of deze SQLite build FTS5 ondersteunt"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_check USING fts5(x)")
+        conn.execute("DROP TABLE temp.fts5_check")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def has_search_index(conn):
+    """Controleer of de FTS index bestaat"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ).fetchone() is not None
+
+
+def ensure_search_index(conn):
+    """Maak de FTS5 index en triggers aan en vul de index vanuit bestaande metingen"""
+    if not fts_available(conn):
+        print("⚠️ FTS5 niet beschikbaar in deze SQLite versie, zoeken gebruikt LIKE")
+        return False
+    conn.execute(FTS_CREATE)
+    for trigger in FTS_TRIGGERS:
+        conn.execute(trigger)
+    rebuild_search_index(conn)
+    return True
+
+
+def rebuild_search_index(conn):
+    """Bouw de index opnieuw op uit de bloedwaarden tabel"""
+    conn.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+    conn.commit()
+    print("🔎 Zoekindex opgebouwd")
+
+
+def suspend_search_trigger(conn):
+    """Verwijder de insert trigger voor een bulk insert (alleen binnen een transactie gebruiken)"""
+    conn.execute("DROP TRIGGER IF EXISTS bloedwaarden_fts_insert")
+
+
+def resume_search_trigger(conn, after_id):
+    """Indexeer alle rijen met id > after_id in één INSERT ... SELECT en herstel de insert trigger"""
+    conn.execute(f'''
+        INSERT INTO {FTS_TABLE} (rowid, opmerkingen, medicatie, activiteit)
+        SELECT id, opmerkingen, medicatie, activiteit FROM bloedwaarden WHERE id > ?
+    ''', (after_id,))
+    conn.execute(FTS_TRIGGERS[0])
+
+
+def _quote_terms(query):
+    """Maak van vrije tekst een geldige FTS5 query: elk woord als letterlijke term"""
+    terms = [term for term in re.findall(r'\w+', query) if term not in ('AND', 'OR', 'NOT', 'NEAR')]
+    return " ".join(f'"{term}"' for term in terms)
+
+
+def search_readings(conn, query, limit=200):
+    """Zoek metingen op tekst, meest relevante eerst
+
+    Geeft (id, ts, datum, tijd, bloedwaarde, medicatie, activiteit, opmerkingen, fragment) rijen.
+    Een query die geen geldige FTS5 syntax is wordt als losse woorden gezocht.
+    """
+    query = (query or "").strip()
+    if not query:
+        return []
+
+    if not has_search_index(conn):
+        words = query.split()
+        conditions = " AND ".join(
+            "(opmerkingen LIKE ? OR medicatie LIKE ? OR activiteit LIKE ?)" for _ in words)
+        params = [f"%{word}%" for word in words for _ in range(3)]
+        return conn.execute(_LIKE_SQL.format(conditions=conditions), params + [limit]).fetchall()
+
+    try:
+        return conn.execute(SEARCH_SQL, (query, limit)).fetchall()
+    except sqlite3.OperationalError:
+        quoted = _quote_terms(query)
+        return conn.execute(SEARCH_SQL, (quoted, limit)).fetchall() if quoted else []
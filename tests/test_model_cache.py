@@ -0,0 +1,51 @@
+import sqlite3
+
+from change_journal import set_watermark, prune_journal
+from migrations import MigrationEngine, BLOEDWAARDEN_MIGRATIONS
+from model_cache import data_fingerprint
+
+
+def make_database(path):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE bloedwaarden (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            datum TEXT NOT NULL,
+            tijd TEXT NOT NULL,
+            bloedwaarde REAL NOT NULL,
+            medicatie TEXT,
+            activiteit TEXT,
+            gewicht REAL,
+            opmerkingen TEXT
+        )
+    ''')
+    conn.executemany(
+        "INSERT INTO bloedwaarden (datum, tijd, bloedwaarde) VALUES (?, ?, ?)",
+        [('2024-01-%02d' % day, '08:00', 100 + day) for day in range(1, 11)])
+    conn.commit()
+    MigrationEngine(conn).migrate(BLOEDWAARDEN_MIGRATIONS)
+    return conn
+
+
+def test_fingerprint_changes_after_edit_and_prune(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    conn = make_database(str(tmp_path / 'diabetes_data.db'))
+    before = data_fingerprint(conn)
+
+    conn.execute("UPDATE bloedwaarden SET bloedwaarde = 400 WHERE id = 5")
+    conn.commit()
+    edited = data_fingerprint(conn)
+    assert edited != before
+
+    set_watermark(conn, 'excel_export', edited['seq'])
+    assert prune_journal(conn) > 0
+    assert conn.execute("SELECT COUNT(*) FROM change_journal").fetchone()[0] == 0
+    assert data_fingerprint(conn) == edited
+    assert data_fingerprint(conn) != before
+
+
+def test_fingerprint_without_journal(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'plain.db'))
+    conn.execute("CREATE TABLE bloedwaarden (id INTEGER PRIMARY KEY, bloedwaarde REAL)")
+    conn.execute("INSERT INTO bloedwaarden (bloedwaarde) VALUES (120)")
+    assert data_fingerprint(conn) == {'max_id': 1, 'count': 1, 'seq': None}
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Integer tijdstempels voor bloedwaarden
+Een ts kolom (seconden sinds epoch) vervangt sorteren en filteren op de TEXT kolommen datum/tijd
+"""
+
+import calendar
+from datetime import datetime, timedelta
+
+# ts is de wandkloktijd van de meting uitgedrukt als UTC seconden, zodat SQLite
+# (strftime('%s')) en Python (calendar.timegm) exact dezelfde waarde berekenen
+TS_SQL = "CAST(strftime('%s', {datum} || ' ' || {tijd}) AS INTEGER)"
+
+SECONDS_PER_DAY = 24 * 60 * 60
+TS_MAX = 2 ** 63 - 1  # bovengrens voor open tijdvensters
+
+
+def to_ts(datum, tijd="00:00"):
+    """Zet datum (YYYY-MM-DD) en tijd (HH:MM) om naar een integer tijdstempel"""
+    return calendar.timegm(datetime.strptime(f"{datum} {tijd}", "%Y-%m-%d %H:%M").timetuple())
+
+
+def from_ts(ts):
+    """Zet een tijdstempel terug om naar een (naïeve) datetime"""
+    return datetime(1970, 1, 1) + timedelta(seconds=ts)
+
+
+def day_range(start_date, end_date=None):
+    """Geef (eerste, laatste) tijdstempel van een datumbereik, inclusief de einddag"""
+    end_date = end_date or start_date
+    return to_ts(start_date), to_ts(end_date) + SECONDS_PER_DAY - 1
+
+
+def ensure_timestamp_column(conn, chunk_size=5000, progress=None):
+    """Voeg de ts kolom, triggers en covering index toe en vul bestaande rijen in stukken
+
+    progress wordt aangeroepen met (verwerkt_tot_id, max_id) na elke chunk.
+    """
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(bloedwaarden)")
+    columns = [column[1] for column in cursor.fetchall()]
+
+    if 'ts' not in columns:
+        cursor.execute("ALTER TABLE bloedwaarden ADD COLUMN ts INTEGER")
+        print("✅ Kolom 'ts' toegevoegd")
+
+    # Triggers houden ts bij voor schrijvers die de kolom niet zelf invullen
+    row_ts = TS_SQL.format(datum='NEW.datum', tijd='NEW.tijd')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS bloedwaarden_ts_insert
+        AFTER INSERT ON bloedwaarden
+        WHEN NEW.ts IS NULL
+        BEGIN
+            UPDATE bloedwaarden SET ts = {row_ts} WHERE id = NEW.id;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS bloedwaarden_ts_update
+        AFTER UPDATE OF datum, tijd ON bloedwaarden
+        BEGIN
+            UPDATE bloedwaarden SET ts = {row_ts} WHERE id = NEW.id;
+        END
+    ''')
+    conn.commit()
+
+    backfill_timestamps(conn, chunk_size, progress)
+
+    # Covering index: tijdvenster scans en aggregaten lezen alleen de index
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_ts_covering ON bloedwaarden(ts, bloedwaarde, gewicht)')
+    conn.commit()
+
+
+def backfill_timestamps(conn, chunk_size=5000, progress=None):
+    """Vul ontbrekende ts waarden in per id bereik, met een commit per chunk"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT MIN(id), MAX(id) FROM bloedwaarden WHERE ts IS NULL")
+    min_id, max_id = cursor.fetchone()
+    if min_id is None:
+        return 0
+
+    updated = 0
+    start = min_id - 1
+    while start < max_id:
+        end = start + chunk_size
+        cursor.execute(f'''
+            UPDATE bloedwaarden SET ts = {TS_SQL.format(datum='datum', tijd='tijd')}
+            WHERE id > ? AND id <= ? AND ts IS NULL
+        ''', (start, end))
+        updated += cursor.rowcount
+        conn.commit()
+        start = end
+        if progress:
+            progress(min(start, max_id), max_id)
+
+    print(f"🔄 Tijdstempels ingevuld voor {updated} metingen")
+    return updated
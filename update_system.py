@@ -551,7 +551,14 @@ class UpdateSystem:
                     for file in important_files:
                         if os.path.exists(file):
                             shutil.copy2(file, backup_dir)
-                    
+
+                    # Databases via de SQLite backup API: veilig terwijl de applicatie nog schrijft
+                    from backup_manager import online_backup
+                    for database in ['diabetes_data.db', 'patient_data.db']:
+                        if os.path.exists(database):
+                            online_backup(database, os.path.join(backup_dir, database))
+                            update_status(f"💾 Database backup gemaakt: {database}")
+
                     update_status("💾 Backup gemaakt van huidige versie")
                     
                     # Extract nieuwe versie